@@ -0,0 +1,295 @@
+"""
+ChurnGuard Batch Scoring - stream CSV/NDJSON customers in, stream scored rows out
+"""
+import codecs
+import csv
+import io
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+INPUT_FORMATS = ('csv', 'ndjson')
+
+OUTPUT_COLUMNS = ['row', 'customerID', 'churn_probability', 'churn_prediction',
+                  'risk_level', 'error']
+
+DEFAULT_MAX_LINE_LENGTH = 1 << 20
+
+# Stands in for a line longer than the limit, whose text was discarded
+OVERSIZED_LINE = object()
+
+
+class _LineSplitter:
+    """Splits text fed to it piece by piece into lines.
+
+    Only newly fed text is searched for newlines. With quoted, a newline
+    inside a double-quoted CSV field continues the line, so each line is
+    one CSV record; quotes are tracked as the csv module reads them (a quote
+    opens a field only at its start, "" inside one is a literal quote). A
+    line longer than max_length characters is not kept: it comes out as
+    OVERSIZED_LINE once it ends.
+    """
+
+    def __init__(self, quoted=False, max_length=DEFAULT_MAX_LINE_LENGTH):
+        self.quoted = quoted
+        self.max_length = max_length
+        self._reset()
+
+    def _reset(self):
+        self._pieces = []
+        self._length = 0
+        self._oversized = False
+        self._in_quotes = False
+        # A quote ended the text so far inside a quoted field: it closes the
+        # field unless the next character makes it a "" escape
+        self._quote_pending = False
+        self._field_start = True
+
+    def feed(self, text):
+        """Lines completed by text"""
+        lines = []
+        start = 0
+        while True:
+            end = text.find('\n', start)
+            if end < 0:
+                self._append(text[start:], line_ends=False)
+                return lines
+            self._append(text[start:end], line_ends=True)
+            start = end + 1
+            if self._in_quotes:
+                self._append('\n', line_ends=False)
+            else:
+                lines.append(self._take())
+
+    def finish(self):
+        """The last line, if the text did not end with a newline"""
+        if self._oversized or any(piece.strip() for piece in self._pieces):
+            return [self._take()]
+        return []
+
+    def _append(self, text, line_ends):
+        if self.quoted:
+            self._track_quotes(text, line_ends)
+        self._length += len(text)
+        if self._length > self.max_length:
+            self._oversized = True
+            self._pieces = []
+        elif not self._oversized:
+            self._pieces.append(text)
+
+    def _track_quotes(self, text, line_ends):
+        position = 0
+        if self._quote_pending:
+            if text.startswith('"'):
+                position = 1
+                self._quote_pending = False
+            elif text or line_ends:
+                self._in_quotes = self._quote_pending = False
+        while True:
+            quote = text.find('"', position)
+            if quote < 0:
+                break
+            position = quote + 1
+            if self._in_quotes:
+                if position < len(text):
+                    if text[position] == '"':
+                        position += 1
+                    else:
+                        self._in_quotes = False
+                elif line_ends:
+                    self._in_quotes = False
+                else:
+                    self._quote_pending = True
+            elif (text[quote - 1] == ',') if quote else self._field_start:
+                self._in_quotes = True
+        if text:
+            self._field_start = text[-1] == ','
+
+    def _take(self):
+        line = OVERSIZED_LINE if self._oversized else ''.join(self._pieces).rstrip('\r')
+        self._reset()
+        return line
+
+
+async def iter_lines(byte_chunks, quoted=False, max_line_length=DEFAULT_MAX_LINE_LENGTH):
+    """Split an async stream of byte chunks into decoded text lines.
+
+    With quoted, lines are CSV records, which may hold newlines in quoted
+    fields. Lines over max_line_length characters come out as OVERSIZED_LINE.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    splitter = _LineSplitter(quoted, max_line_length)
+    async for chunk in byte_chunks:
+        for line in splitter.feed(decoder.decode(chunk)):
+            yield line
+    for line in splitter.feed(decoder.decode(b'', final=True)) + splitter.finish():
+        yield line
+
+
+async def iter_line_chunks(lines, input_format, chunk_size):
+    """Group input lines into (header, lines) chunks of at most chunk_size rows"""
+    header = None
+    chunk = []
+    async for line in lines:
+        if line is not OVERSIZED_LINE and not line.strip():
+            continue
+        if input_format == 'csv' and header is None:
+            if line is OVERSIZED_LINE:
+                raise ValueError("CSV header line is too long")
+            header = line
+            continue
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield header, chunk
+            chunk = []
+    if chunk:
+        yield header, chunk
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body is produced while the request is still being read.
+
+    The stock response listens on receive() for http.disconnect while it
+    streams, which would swallow the request body chunks the generator
+    needs. A disconnect still ends the stream: request.stream() raises
+    ClientDisconnect.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+class BatchScorer:
+    """Scores chunks of raw CSV or NDJSON lines against the request schema.
+
+    Missing fields take the schema defaults; rows whose numeric fields do not
+    parse, NDJSON lines that are not JSON objects and lines over
+    max_line_length characters come back with an `error` instead of a
+    score. Chunks are scored under lease, the request's ExecutorLease, or
+    on the shared threadpool if None.
+    """
+
+    def __init__(self, churn_model, schema, lease=None,
+                 max_line_length=DEFAULT_MAX_LINE_LENGTH):
+        self.churn_model = churn_model
+        self.lease = lease
+        self.max_line_length = max_line_length
+        self.defaults = {name: field.default for name, field in schema.model_fields.items()}
+        self.numeric_fields = [name for name, field in schema.model_fields.items()
+                               if field.annotation in (int, float)]
+
+    def parse(self, header, lines, input_format):
+        """Build a string/object frame plus per-row parse errors"""
+        errors = {}
+        for i, line in enumerate(lines):
+            if line is OVERSIZED_LINE:
+                errors[i] = f"Line is longer than {self.max_line_length} characters"
+        lines = ['' if line is OVERSIZED_LINE else line for line in lines]
+        if input_format == 'csv':
+            columns = next(csv.reader([header]))
+            records = []
+            for i, line in enumerate(lines):
+                # A reader per line keeps one record per line whatever the quoting
+                try:
+                    values = next(csv.reader([line]), [])
+                except csv.Error as e:
+                    errors[i] = f"Invalid CSV: {e}"
+                if i in errors:
+                    values = [''] * len(columns)
+                elif len(values) != len(columns):
+                    errors[i] = f"Expected {len(columns)} fields, got {len(values)}"
+                    values = [''] * len(columns)
+                records.append(values)
+            df = pd.DataFrame(records, columns=columns, dtype=object)
+        else:
+            records = []
+            for i, line in enumerate(lines):
+                if i in errors:
+                    records.append({})
+                    continue
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as e:
+                    errors[i] = f"Invalid JSON: {e}"
+                    record = {}
+                records.append(record)
+            df = pd.DataFrame.from_records(records, index=range(len(records)))
+        return df, errors
+
+    def score(self, header, lines, input_format, first_row):
+        """Score one chunk and return its output rows"""
+        df, errors = self.parse(header, lines, input_format)
+        n_rows = len(df)
+        customer_ids = [None] * n_rows
+        if 'customerID' in df.columns:
+            customer_ids = [None if pd.isna(v) or v == '' else str(v) for v in df['customerID']]
+
+        for name, default in self.defaults.items():
+            if name not in df.columns:
+                df[name] = default
+                continue
+            values = df[name].replace('', None)
+            if name in self.numeric_fields:
+                parsed = pd.to_numeric(values, errors='coerce')
+                for i in np.flatnonzero(parsed.isna() & values.notna()):
+                    errors.setdefault(int(i), f"Invalid number for {name}: {values.iloc[i]!r}")
+                df[name] = parsed.fillna(default)
+            else:
+                df[name] = values.fillna(default).astype(str)
+
+        valid = np.ones(n_rows, dtype=bool)
+        valid[list(errors)] = False
+        probabilities = np.full(n_rows, np.nan)
+        if valid.any():
+            probabilities[valid] = self.churn_model.predict_frame(
+                df.loc[valid, list(self.defaults)]
+            )
+
+        rows = []
+        for i in range(n_rows):
+            row = {'row': first_row + i, 'customerID': customer_ids[i]}
+            if i in errors:
+                row['error'] = errors[i]
+            else:
+                churn_prob = float(probabilities[i])
+                row['churn_probability'] = round(churn_prob, 4)
+                row['churn_prediction'] = bool(churn_prob >= 0.5)
+                row['risk_level'] = self.churn_model.risk_level(churn_prob)
+            rows.append(row)
+        return rows
+
+    async def stream(self, byte_chunks, input_format, output_format, chunk_size):
+        """Score an input stream chunk by chunk, yielding encoded output"""
+        first_row = 0
+        if output_format == 'csv':
+            yield _csv_encode([OUTPUT_COLUMNS])
+
+        lines = iter_lines(byte_chunks, quoted=input_format == 'csv',
+                           max_line_length=self.max_line_length)
+        async for header, lines in iter_line_chunks(lines, input_format, chunk_size):
+            # Scoring is CPU-bound, keep it off the event loop
+            run = self.lease.call if self.lease is not None else run_in_threadpool
+            rows = await run(self.score, header, lines, input_format, first_row)
+            first_row += len(lines)
+            if output_format == 'csv':
+                yield _csv_encode([[row.get(col) for col in OUTPUT_COLUMNS] for row in rows])
+            else:
+                yield ''.join(json.dumps(row) + '\n' for row in rows)
+
+        logger.info(f"Batch scored {first_row} rows")
+
+
+def _csv_encode(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue()
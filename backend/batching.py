@@ -0,0 +1,143 @@
+"""
+ChurnGuard Micro-Batching - coalesce concurrent predictions into vectorized calls
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BatcherOverloadedError(RuntimeError):
+    """Raised when the batcher queue is full"""
+
+
+async def collect_batch(queue, batch, max_batch_size, max_wait):
+    """Fill batch from queue: wait for one item, then take more until
+    max_batch_size is reached or max_wait seconds have passed.
+
+    Items are appended to batch as they are taken, so a caller cancelled
+    part way still holds them.
+    """
+    batch.append(await queue.get())
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_wait
+    while len(batch) < max_batch_size:
+        try:
+            batch.append(queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+class MicroBatcher:
+    """Collects concurrent requests and scores them with one call.
+
+    A single worker takes the first queued request, then keeps collecting
+    until max_batch_size is reached or max_wait_ms has passed since it
+    started the batch. With max_wait_ms=0 it only takes what is already
+    queued, so an idle server adds no latency while a busy one batches up
+    everything that arrived during the previous call.
+
+    score_fn receives a list of payloads and must return one result per
+    payload, in order. It runs on `executor` (the loop's default thread
+    pool if None), never on the event loop.
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=0.0,
+                 max_queue_size=10000, executor=None):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.executor = executor
+        self._queue = None
+        self._worker = None
+        self._batches = 0
+        self._requests = 0
+        self._largest_batch = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        self._total_score_time = 0.0
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, payload):
+        """Queue one payload and wait for its own result"""
+        if self._worker is None:
+            raise RuntimeError("Batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((payload, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise BatcherOverloadedError("Prediction queue is full")
+        return await future
+
+    def metrics(self):
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'batches': self._batches,
+            'requests': self._requests,
+            'avg_batch_size': round(self._requests / self._batches, 2) if self._batches else 0,
+            'largest_batch': self._largest_batch,
+            'avg_wait_ms': round(self._total_wait / self._requests * 1000, 3) if self._requests else 0,
+            'max_wait_ms': round(self._max_wait_seen * 1000, 3),
+            'avg_score_ms': round(self._total_score_time / self._batches * 1000, 3) if self._batches else 0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_window_ms': self.max_wait * 1000
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await collect_batch(self._queue, [], self.max_batch_size, self.max_wait)
+            # Callers that gave up (client disconnects) are not scored
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                wait = started - queued_at
+                self._total_wait += wait
+                self._max_wait_seen = max(self._max_wait_seen, wait)
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.score_fn, [payload for payload, _, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self._batches += 1
+                self._requests += len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+                self._total_score_time += time.perf_counter() - started
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
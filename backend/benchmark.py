@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+ChurnGuard Benchmarks - micro-benchmarks for the model serving paths
+
+Usage:
+    python benchmark.py codec [--sizes 7043,1000000,10000000]
+    python benchmark.py predict [--requests 20000]
+    python benchmark.py memory [--sizes 7043,1000000]
+    python benchmark.py score [--rows 1000000] [--workers 1,2,4,8]
+    python benchmark.py inference [--sizes 1,100,10000,1000000]
+"""
+import argparse
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from feature_codec import CATEGORICAL_COLUMNS
+from ml_model import ChurnModel
+from parallel_scoring import ParallelScorer
+
+warnings.filterwarnings('ignore')
+
+
+def parse_sizes(value):
+    return [int(size) for size in value.split(',')]
+
+
+def trained_model():
+    model = ChurnModel()
+    model.train()
+    return model
+
+
+def sample_customers(model, n_rows, seed=0):
+    """Resample the training customers up to n_rows"""
+    rng = np.random.default_rng(seed)
+    positions = rng.integers(0, len(model.df), n_rows)
+    return model.df.iloc[positions].reset_index(drop=True)
+
+
+def timed(fn, repeat=1):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def legacy_encode(df, label_encoders):
+    """Per-row encoding used before the categorical codec, kept as the reference"""
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        le = label_encoders[col]
+        df[col] = df[col].apply(lambda x: x if x in le.classes_ else le.classes_[0])
+        df[col] = le.transform(df[col].astype(str))
+    return df
+
+
+def codec_encode(df, codec):
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = codec.encode(col, df[col])
+    return df
+
+
+def bench_codec(args):
+    model = trained_model()
+    state = model._serving_state()
+    print(f"{'rows':>12} {'legacy (s)':>12} {'codec (s)':>12} {'speedup':>9}  identical")
+    for n_rows in args.sizes:
+        df = sample_customers(model, n_rows)
+        # Exercise the unseen-label fallback as well
+        df['PaymentMethod'] = df['PaymentMethod'].cat.add_categories('Crypto')
+        df.loc[::97, 'PaymentMethod'] = 'Crypto'
+
+        codec_time, encoded = timed(lambda: codec_encode(df, state.codec), repeat=args.repeat)
+        if n_rows > args.legacy_max_rows:
+            print(f"{n_rows:>12} {'skipped':>12} {codec_time:>12.4f} {'-':>9}  -")
+            continue
+        legacy_time, expected = timed(lambda: legacy_encode(df, state.label_encoders))
+        identical = all(np.array_equal(expected[col].to_numpy(), encoded[col].to_numpy())
+                        for col in CATEGORICAL_COLUMNS)
+        print(f"{n_rows:>12} {legacy_time:>12.4f} {codec_time:>12.4f} "
+              f"{legacy_time / codec_time:>8.1f}x  {identical}")
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1e6
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def dataframe_proba(model, state, customer_data):
+    """Raw probability from the DataFrame path behind ChurnModel.predict()"""
+    df = model.preprocess_data(pd.DataFrame([customer_data]), is_training=False,
+                               label_encoders=state.label_encoders, codec=state.codec)
+    X_scaled = state.scaler.transform(df[state.feature_columns])
+    return float(state.model.predict_proba(X_scaled)[0][1])
+
+
+def bench_predict(args):
+    model = trained_model()
+    state = model._serving_state()
+    records = sample_customers(model, args.requests).drop(columns=['customerID', 'Churn'])
+    records = records.to_dict('records')
+    for record in records[::50]:
+        record['PaymentMethod'] = 'Crypto'
+
+    mismatches = sum(dataframe_proba(model, state, record) != state.scalar_predictor.predict_proba(record)
+                     for record in records[:args.verify])
+
+    results = {}
+    for name, fn in [('predict', model.predict), ('predict_fast', model.predict_fast)]:
+        samples = []
+        for record in records:
+            start = time.perf_counter()
+            fn(record)
+            samples.append(time.perf_counter() - start)
+        results[name] = percentiles(samples)
+
+    print(f"{'path':>14} {'p50 (us)':>10} {'p99 (us)':>10}")
+    for name, (p50, p99) in results.items():
+        print(f"{name:>14} {p50:>10.1f} {p99:>10.1f}")
+    print(f"bit-for-bit mismatches in {min(args.verify, len(records))} records: {mismatches}")
+
+
+def object_frame(df):
+    """The customer table as stored before compaction: object text, 64-bit numbers"""
+    return pd.DataFrame({
+        col: values.to_numpy(dtype=object) if values.dtype.kind not in 'iuf'
+        else values.to_numpy(dtype=np.int64 if values.dtype.kind in 'iu' else np.float64)
+        for col, values in df.items()
+    })
+
+
+def bench_memory(args):
+    model = ChurnModel()
+    model.load_data()
+    print(f"{'rows':>12} {'object (B/row)':>15} {'compact (B/row)':>16} {'ratio':>7}  identical")
+    for n_rows in args.sizes:
+        compact = sample_customers(model, n_rows)
+        legacy = object_frame(compact)
+        legacy_bytes = legacy.memory_usage(deep=True).sum() / n_rows
+        compact_bytes = compact.memory_usage(deep=True).sum() / n_rows
+        identical = legacy.astype(str).equals(object_frame(compact).astype(str))
+        print(f"{n_rows:>12} {legacy_bytes:>15.1f} {compact_bytes:>16.1f} "
+              f"{legacy_bytes / compact_bytes:>6.1f}x  {identical}")
+
+
+def bench_score(args):
+    model = trained_model()
+    state = model._serving_state()
+    df = sample_customers(model, args.rows)
+    processed = model.preprocess_data(df, is_training=False, label_encoders=state.label_encoders,
+                                      codec=state.codec)
+    features = state.scaler.transform(processed[state.feature_columns])
+
+    baseline, reference = timed(lambda: state.model.predict_proba(features)[:, 1], args.repeat)
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}  identical")
+    print(f"{'inline':>8} {baseline:>9.3f} {1.0:>7.1f}x  True")
+    for workers in args.workers:
+        scorer = ParallelScorer(workers=workers, shard_size=args.shard_size)
+        try:
+            # First call starts the pool; time the warm runs
+            scorer.predict_proba(state.engine, state.model_version, features)
+            seconds, probabilities = timed(
+                lambda: scorer.predict_proba(state.engine, state.model_version, features), args.repeat)
+        finally:
+            scorer.shutdown()
+        print(f"{workers:>8} {seconds:>9.3f} {baseline / seconds:>7.1f}x  "
+              f"{np.array_equal(probabilities, reference)}")
+
+
+def bench_inference(args):
+    model = trained_model()
+    state = model._serving_state()
+    df = sample_customers(model, max(args.sizes))
+    processed = model.preprocess_data(df, is_training=False, label_encoders=state.label_encoders,
+                                      codec=state.codec)
+    features = state.scaler.transform(processed[state.feature_columns])
+
+    print(f"{'rows':>10} {'predict_proba (ms)':>19} {'engine (ms)':>12} {'speedup':>8}  identical")
+    for n_rows in args.sizes:
+        X = features[:n_rows]
+        # Small batches are timed over enough calls to be measurable
+        calls = max(1, args.min_rows // n_rows)
+        wrapper, reference = timed(
+            lambda: [state.model.predict_proba(X)[:, 1] for _ in range(calls)][-1], args.repeat)
+        engine, probabilities = timed(
+            lambda: [state.engine.predict_proba(X) for _ in range(calls)][-1], args.repeat)
+        print(f"{n_rows:>10} {wrapper / calls * 1000:>19.3f} {engine / calls * 1000:>12.3f} "
+              f"{wrapper / engine:>7.1f}x  {np.array_equal(probabilities, reference)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    codec = subparsers.add_parser('codec', help='categorical encoding: per-row apply vs codec')
+    codec.add_argument('--sizes', type=parse_sizes, default=[7043, 1_000_000, 10_000_000])
+    codec.add_argument('--repeat', type=int, default=3)
+    codec.add_argument('--legacy-max-rows', type=int, default=sys.maxsize,
+                       help='skip the slow reference path above this many rows')
+    codec.set_defaults(func=bench_codec)
+
+    predict = subparsers.add_parser('predict', help='single-customer latency: predict vs predict_fast')
+    predict.add_argument('--requests', type=int, default=20_000)
+    predict.add_argument('--verify', type=int, default=2_000,
+                         help='records checked bit for bit against the DataFrame path')
+    predict.set_defaults(func=bench_predict)
+
+    memory = subparsers.add_parser('memory', help='bytes per customer: object columns vs compact')
+    memory.add_argument('--sizes', type=parse_sizes, default=[7043, 1_000_000])
+    memory.set_defaults(func=bench_memory)
+
+    score = subparsers.add_parser('score', help='full-table scoring: inline vs worker processes')
+    score.add_argument('--rows', type=int, default=1_000_000)
+    score.add_argument('--workers', type=parse_sizes, default=[1, 2, 4, 8])
+    score.add_argument('--shard-size', type=int, default=100_000)
+    score.add_argument('--repeat', type=int, default=3)
+    score.set_defaults(func=bench_score)
+
+    inference = subparsers.add_parser('inference', help='batch scoring: sklearn wrapper vs booster engine')
+    inference.add_argument('--sizes', type=parse_sizes, default=[1, 100, 10_000, 1_000_000])
+    inference.add_argument('--repeat', type=int, default=3)
+    inference.add_argument('--min-rows', type=int, default=20_000,
+                           help='rows scored per timing, repeating small batches')
+    inference.set_defaults(func=bench_inference)
+
+    args = parser.parse_args()
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+ChurnGuard Data Sources - where the customer table is read from, a chunk at a time
+"""
+from abc import ABC, abstractmethod
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from feature_codec import CATEGORICAL_COLUMNS
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Storage dtypes of the canonical customer table, see compact_customers()
+CATEGORY_COLUMNS = CATEGORICAL_COLUMNS + ['Churn']
+NUMERIC_DTYPES = {
+    'SeniorCitizen': np.int8,
+    'tenure': np.int16,
+    'MonthlyCharges': np.float32,
+    'TotalCharges': np.float32,
+}
+
+# Dataset embedded - Telco Customer Churn
+TELCO_DATA = """customerID,gender,SeniorCitizen,Partner,Dependents,tenure,PhoneService,MultipleLines,InternetService,OnlineSecurity,OnlineBackup,DeviceProtection,TechSupport,StreamingTV,StreamingMovies,Contract,PaperlessBilling,PaymentMethod,MonthlyCharges,TotalCharges,Churn
+7590-VHVEG,Female,0,Yes,No,1,No,No phone service,DSL,No,Yes,No,No,No,No,Month-to-month,Yes,Electronic check,29.85,29.85,No
+5575-GNVDE,Male,0,No,No,34,Yes,No,DSL,Yes,No,Yes,No,No,No,One year,No,Mailed check,56.95,1889.5,No
+3668-QPYBK,Male,0,No,No,2,Yes,No,DSL,Yes,Yes,No,No,No,No,Month-to-month,Yes,Mailed check,53.85,108.15,Yes
+7795-CFOCW,Male,0,No,No,45,No,No phone service,DSL,Yes,No,Yes,Yes,No,No,One year,No,Bank transfer (automatic),42.30,1840.75,No
+9237-HQITU,Female,0,No,No,2,Yes,No,Fiber optic,No,No,No,No,No,No,Month-to-month,Yes,Electronic check,70.70,151.65,Yes
+9305-CDSKC,Female,0,No,No,8,Yes,Yes,Fiber optic,No,No,Yes,No,Yes,Yes,Month-to-month,Yes,Electronic check,99.65,820.5,Yes
+1452-KIOVK,Male,0,No,Yes,22,Yes,Yes,Fiber optic,No,Yes,No,No,Yes,No,Month-to-month,Yes,Credit card (automatic),89.10,1949.4,No
+6713-OKOMC,Female,0,No,No,10,No,No phone service,DSL,Yes,No,No,No,No,No,Month-to-month,No,Mailed check,29.75,301.9,No
+7892-POOKP,Female,0,Yes,No,28,Yes,Yes,Fiber optic,No,No,Yes,Yes,Yes,Yes,Month-to-month,Yes,Electronic check,104.80,3046.05,Yes
+6388-TABGU,Male,0,No,Yes,62,Yes,No,DSL,Yes,Yes,Yes,No,No,No,One year,No,Bank transfer (automatic),56.15,3487.95,No
+9763-GRSKD,Male,0,Yes,Yes,13,Yes,No,DSL,Yes,No,No,No,No,No,Month-to-month,No,Mailed check,49.95,587.45,No
+7469-LKBCI,Male,0,No,No,16,Yes,No,No,No internet service,No internet service,No internet service,No internet service,No internet service,No internet service,Two year,No,Credit card (automatic),18.95,326.8,No
+8091-TTVAX,Male,0,Yes,No,58,Yes,Yes,Fiber optic,No,No,Yes,No,Yes,Yes,One year,No,Credit card (automatic),100.35,5681.1,No
+0280-XJGEX,Male,0,No,No,49,Yes,Yes,Fiber optic,No,Yes,Yes,No,Yes,Yes,Month-to-month,Yes,Bank transfer (automatic),103.70,5036.3,Yes
+5129-JLPIS,Male,0,No,No,25,Yes,No,Fiber optic,Yes,No,Yes,Yes,Yes,Yes,Month-to-month,Yes,Electronic check,105.50,2686.05,No
+3655-SNQYZ,Female,0,Yes,Yes,69,Yes,Yes,Fiber optic,Yes,Yes,Yes,Yes,Yes,Yes,Two year,No,Credit card (automatic),113.25,7895.15,No
+8191-XWSZG,Female,0,No,No,52,Yes,No,No,No internet service,No internet service,No internet service,No internet service,No internet service,No internet service,Two year,No,Mailed check,20.65,1022.95,No
+9959-WOFKT,Male,0,No,Yes,71,Yes,Yes,Fiber optic,Yes,No,Yes,No,Yes,Yes,Two year,Yes,Bank transfer (automatic),106.70,7382.25,No
+4190-MFLUW,Female,0,Yes,Yes,10,Yes,No,DSL,No,No,Yes,Yes,No,No,Month-to-month,No,Credit card (automatic),55.20,528.35,Yes
+4183-MYFRB,Female,0,No,No,21,Yes,No,Fiber optic,No,Yes,Yes,No,No,Yes,Month-to-month,Yes,Electronic check,90.05,1862.9,No"""
+
+
+class DataSource(ABC):
+    """A customer table that can be read in chunks of rows.
+
+    Subclasses implement iter_chunks(); everything else is built on it, so a
+    source never has to fit in memory unless read() is called.
+    """
+
+    @abstractmethod
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield DataFrames of at most chunk_size rows, in table order"""
+
+    def read(self) -> pd.DataFrame:
+        """The whole table as one DataFrame"""
+        return pd.concat(list(self.iter_chunks()), ignore_index=True)
+
+    def sample(self, n_rows, seed=42, chunk_size=DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+        """Uniform sample of at most n_rows rows, in table order.
+
+        Every row gets a random key and the n_rows smallest keys seen so far
+        are kept, so memory is bounded by n_rows plus one chunk. A table of
+        at most n_rows rows comes back whole.
+        """
+        rng = np.random.default_rng(seed)
+        kept, kept_keys = None, None
+        for chunk in self.iter_chunks(chunk_size):
+            keys = rng.random(len(chunk))
+            if kept is None:
+                kept, kept_keys = chunk, keys
+            else:
+                kept = pd.concat([kept, chunk], ignore_index=True)
+                kept_keys = np.concatenate([kept_keys, keys])
+            if len(kept) > n_rows:
+                top = np.sort(np.argpartition(kept_keys, n_rows - 1)[:n_rows])
+                kept, kept_keys = kept.iloc[top].reset_index(drop=True), kept_keys[top]
+        if kept is None:
+            raise ValueError("Data source has no rows")
+        return kept.reset_index(drop=True)
+
+
+class SyntheticSource(DataSource):
+    """Customers generated from Telco dataset patterns, the default demo data"""
+
+    def __init__(self, n_rows=7043, seed=42):
+        self.n_rows = n_rows
+        self.seed = seed
+
+    def read(self) -> pd.DataFrame:
+        # Generate synthetic data based on Telco dataset patterns
+        np.random.seed(self.seed)
+        n_samples = self.n_rows
+        
+        data = {
+            'customerID': [f'CUST-{i:05d}' for i in range(n_samples)],
+            'gender': np.random.choice(['Male', 'Female'], n_samples),
+            'SeniorCitizen': np.random.choice([0, 1], n_samples, p=[0.84, 0.16]),
+            'Partner': np.random.choice(['Yes', 'No'], n_samples, p=[0.48, 0.52]),
+            'Dependents': np.random.choice(['Yes', 'No'], n_samples, p=[0.30, 0.70]),
+            'tenure': np.random.randint(0, 73, n_samples),
+            'PhoneService': np.random.choice(['Yes', 'No'], n_samples, p=[0.90, 0.10]),
+            'MultipleLines': np.random.choice(['Yes', 'No', 'No phone service'], n_samples, p=[0.42, 0.48, 0.10]),
+            'InternetService': np.random.choice(['DSL', 'Fiber optic', 'No'], n_samples, p=[0.34, 0.44, 0.22]),
+            'OnlineSecurity': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.29, 0.49, 0.22]),
+            'OnlineBackup': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.34, 0.44, 0.22]),
+            'DeviceProtection': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.34, 0.44, 0.22]),
+            'TechSupport': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.29, 0.49, 0.22]),
+            'StreamingTV': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.38, 0.40, 0.22]),
+            'StreamingMovies': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.38, 0.40, 0.22]),
+            'Contract': np.random.choice(['Month-to-month', 'One year', 'Two year'], n_samples, p=[0.55, 0.21, 0.24]),
+            'PaperlessBilling': np.random.choice(['Yes', 'No'], n_samples, p=[0.59, 0.41]),
+            'PaymentMethod': np.random.choice(['Electronic check', 'Mailed check', 'Bank transfer (automatic)', 'Credit card (automatic)'], n_samples, p=[0.34, 0.23, 0.22, 0.21]),
+            'MonthlyCharges': np.round(np.random.uniform(18, 119, n_samples), 2),
+            'TotalCharges': np.round(np.random.uniform(18, 8700, n_samples), 2),
+        }
+        
+        # Generate realistic churn based on features
+        churn_prob = np.zeros(n_samples)
+        churn_prob += (data['Contract'] == 'Month-to-month').astype(float) * 0.25
+        churn_prob += (data['tenure'] < 12).astype(float) * 0.15
+        churn_prob += (data['InternetService'] == 'Fiber optic').astype(float) * 0.10
+        churn_prob += (data['PaymentMethod'] == 'Electronic check').astype(float) * 0.10
+        churn_prob += (np.array(data['MonthlyCharges']) > 70).astype(float) * 0.10
+        churn_prob += (data['OnlineSecurity'] == 'No').astype(float) * 0.05
+        churn_prob += (data['TechSupport'] == 'No').astype(float) * 0.05
+        churn_prob = np.clip(churn_prob + np.random.normal(0, 0.1, n_samples), 0, 1)
+        
+        data['Churn'] = np.where(np.random.random(n_samples) < churn_prob, 'Yes', 'No')
+        
+        return pd.DataFrame(data)
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        df = self.read()
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size].reset_index(drop=True)
+
+
+class EmbeddedSampleSource(DataSource):
+    """The rows of the real Telco Customer Churn dataset embedded as TELCO_DATA"""
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        yield from pd.read_csv(StringIO(TELCO_DATA), chunksize=chunk_size)
+
+
+class CsvSource(DataSource):
+    """A local CSV file, parsed chunk_size rows at a time"""
+
+    def __init__(self, path, **read_csv_kwargs):
+        self.path = Path(path)
+        self.read_csv_kwargs = read_csv_kwargs
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        with pd.read_csv(self.path, chunksize=chunk_size, **self.read_csv_kwargs) as reader:
+            yield from reader
+
+
+class ParquetSource(DataSource):
+    """A local Parquet file, decoded in record batches"""
+
+    def __init__(self, path, columns=None):
+        self.path = Path(path)
+        self.columns = columns
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        parquet_file = pq.ParquetFile(self.path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=self.columns):
+            yield batch.to_pandas()
+
+
+class ArrowStore(DataSource):
+    """Columnar store in an Arrow IPC file, memory-mapped rather than read.
+
+    Opening the file maps it without copying; only the pages of the chunks
+    actually converted are faulted in, and the OS can evict them again, so
+    the table can be larger than RAM. write() builds a store from any other
+    source one chunk at a time.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    @classmethod
+    def write(cls, path, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Copy source into a new store at path and open it"""
+        writer = schema = None
+        try:
+            for chunk in source.iter_chunks(chunk_size):
+                table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    writer = pa.ipc.new_file(str(path), schema)
+                writer.write_table(table, max_chunksize=chunk_size)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            raise ValueError("Data source has no rows")
+        return cls(path)
+
+    def _table(self):
+        with pa.memory_map(str(self.path), 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def read(self) -> pd.DataFrame:
+        return self._table().to_pandas()
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        table = self._table()
+        for start in range(0, table.num_rows, chunk_size):
+            yield table.slice(start, chunk_size).to_pandas()
+
+
+def compact_customers(df, like=None):
+    """df with the compact storage dtypes of the customer table.
+
+    Low-cardinality text columns become categoricals, with categories in
+    order of first appearance; given like, they extend the categories of
+    like's columns so rows can move between the two frames without
+    re-encoding. Numeric columns are narrowed to NUMERIC_DTYPES (floats for
+    integer columns with missing values). Columns that already have their
+    storage dtype are shared, not copied.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if col in CATEGORY_COLUMNS:
+            is_categorical = isinstance(values.dtype, pd.CategoricalDtype)
+            if is_categorical and like is None:
+                continue
+            categories = pd.Index(pd.unique(values.dropna().astype(object)), dtype=object)
+            if like is not None and col in like.columns:
+                known = like[col].cat.categories
+                unseen = categories.difference(known, sort=False)
+                # Keep the known categories index itself so the dtypes compare equal
+                categories = known.append(unseen).astype(object) if len(unseen) else known
+            if is_categorical and values.cat.categories.equals(categories):
+                continue
+            columns[col] = pd.Categorical(values, categories=categories)
+        elif col in NUMERIC_DTYPES:
+            dtype = NUMERIC_DTYPES[col]
+            if values.dtype == dtype:
+                continue
+            values = pd.to_numeric(values, errors='coerce')
+            if np.issubdtype(dtype, np.integer) and values.isna().any():
+                dtype = np.float32
+            columns[col] = values.astype(dtype)
+    return df.assign(**columns) if columns else df
+
+
+def widen_categories(df, like):
+    """df with each categorical column taking the categories of like's, a superset"""
+    columns = {
+        col: df[col].cat.set_categories(like[col].cat.categories)
+        for col in df.select_dtypes('category').columns
+        if col in like.columns and isinstance(like[col].dtype, pd.CategoricalDtype)
+        and not df[col].cat.categories.equals(like[col].cat.categories)
+    }
+    return df.assign(**columns) if columns else df
+
+
+def open_data_source(spec=None) -> DataSource:
+    """Data source named by spec: 'synthetic' (default), 'sample', or a file path.
+
+    Paths are told apart by suffix: .csv (optionally compressed), .parquet or
+    .arrow/.feather.
+    """
+    if spec in (None, '', 'synthetic'):
+        return SyntheticSource()
+    if spec == 'sample':
+        return EmbeddedSampleSource()
+
+    path = Path(spec)
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    if '.csv' in suffixes:
+        return CsvSource(path)
+    if suffixes[-1:] in (['.parquet'], ['.pq']):
+        return ParquetSource(path)
+    if suffixes[-1:] in (['.arrow'], ['.feather'], ['.ipc']):
+        return ArrowStore(path)
+    raise ValueError(f"Unknown data source: {spec}")
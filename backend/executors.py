@@ -0,0 +1,155 @@
+"""
+ChurnGuard Executors - bounded thread pools that keep CPU-bound model calls off the event loop
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_EXHAUSTED = object()
+
+
+class ExecutorOverloadedError(RuntimeError):
+    """Raised when an executor has no room for another request"""
+
+
+class ExecutorLease:
+    """One admitted request's slot on a BoundedExecutor.
+
+    Held from admission until release(), however many pool calls the
+    request makes in between; use it as a context manager, or hold() a
+    streamed body so the slot is released when the stream ends. Releasing
+    twice is harmless, and a lease that is dropped without being released,
+    say a response that never started streaming, releases when collected.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        # Runs at most once, on release() or when the lease is collected
+        self._finalizer = weakref.finalize(self, executor._release)
+
+    @property
+    def released(self):
+        return not self._finalizer.alive
+
+    async def call(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool for this request"""
+        if self.released:
+            raise RuntimeError("Executor lease was already released")
+        return await self.executor._submit(fn, *args, **kwargs)
+
+    async def hold(self, body):
+        """Async iterator over body that releases the lease when it ends"""
+        try:
+            async for item in body:
+                yield item
+        finally:
+            self.release()
+
+    def release(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class BoundedExecutor:
+    """A thread pool for one class of endpoints, with admission control.
+
+    At most max_workers + max_queue requests are admitted at once, each
+    holding an ExecutorLease until it finishes, streamed responses
+    included; a request arriving beyond that is rejected straight away
+    with ExecutorOverloadedError instead of queueing without bound. A
+    request makes one pool call at a time, so at most max_workers calls
+    run and max_queue wait for a thread. Giving cheap and heavy endpoints
+    separate executors means a burst of heavy reports can only ever occupy
+    its own threads.
+
+    pandas, NumPy and XGBoost release the GIL for most of their work, so
+    the threads overlap with each other and with the event loop.
+    """
+
+    def __init__(self, name, max_workers=4, max_queue=32):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix=f"{name}-executor")
+        # Counters are updated from pool threads as calls finish
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def admit(self) -> ExecutorLease:
+        """Reserve a slot for a new request, or reject it if every slot is taken"""
+        with self._lock:
+            if self._admitted >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorOverloadedError(f"The {self.name} executor is at capacity")
+            self._admitted += 1
+        return ExecutorLease(self)
+
+    async def run(self, fn, *args, **kwargs):
+        """Admit a new request and run fn(*args, **kwargs) on the pool"""
+        with self.admit() as lease:
+            return await lease.call(fn, *args, **kwargs)
+
+    async def stream(self, iterable, lease=None):
+        """Admit a sync iterable and return an async iterator over its items.
+
+        Every item is produced on the pool under one lease, released when
+        the iterator ends; pass lease to carry on under one the request
+        already holds. The first item is produced before this returns, so a
+        rejection or an early error surfaces before a response has started.
+        """
+        if lease is None:
+            lease = self.admit()
+        try:
+            iterator = iter(iterable)
+            first = await lease.call(next, iterator, _EXHAUSTED)
+        except BaseException:
+            lease.release()
+            raise
+        return lease.hold(self._iterate(lease, first, iterator))
+
+    async def _iterate(self, lease, item, iterator):
+        while item is not _EXHAUSTED:
+            yield item
+            item = await lease.call(next, iterator, _EXHAUSTED)
+
+    async def _submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._finished)
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        with self._lock:
+            self._admitted -= 1
+
+    def _finished(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    def metrics(self):
+        return {
+            'admitted': self._admitted,
+            'in_flight': self._in_flight,
+            'completed': self._completed,
+            'rejected': self._rejected,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
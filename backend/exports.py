@@ -0,0 +1,139 @@
+"""
+ChurnGuard Exports - stream scored customers out as CSV, JSON, Parquet or Arrow
+"""
+import io
+import zlib
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXPORT_COLUMNS = ['customerID', 'gender', 'tenure', 'Contract', 'MonthlyCharges',
+                  'TotalCharges', 'InternetService', 'churn_probability', 'risk_level', 'clv', 'Churn']
+
+# format: (media type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'json': ('application/json', 'json'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+class CustomerExporter:
+    """Encodes one export of a scored snapshot chunk by chunk.
+
+    Only chunk_size rows are materialized and encoded at a time, so memory
+    stays flat whatever the export size. With gzip the encoded bytes go
+    through one streaming compressor.
+    """
+
+    def __init__(self, snapshot, positions=None, columns=EXPORT_COLUMNS, chunk_size=10000):
+        self.snapshot = snapshot
+        self.positions = positions
+        self.columns = columns
+        self.chunk_size = chunk_size
+
+    def chunks(self):
+        """Export frames of at most chunk_size rows, at least one even if empty"""
+        df = self.snapshot.df
+        n_rows = len(df) if self.positions is None else len(self.positions)
+        for start in range(0, n_rows, self.chunk_size) or [0]:
+            if self.positions is None:
+                chunk = df.iloc[start:start + self.chunk_size]
+            else:
+                chunk = df.iloc[self.positions[start:start + self.chunk_size]]
+            yield _plain_labels(chunk[self.columns])
+
+    def stream(self, export_format, gzip=False):
+        """Yield the encoded export as bytes"""
+        encoders = {
+            'csv': self._encode_csv,
+            'json': self._encode_json,
+            'parquet': self._encode_parquet,
+            'arrow': self._encode_arrow,
+        }
+        encoded = encoders[export_format]()
+        if not gzip:
+            yield from encoded
+            return
+
+        compressor = zlib.compressobj(wbits=31)
+        for data in encoded:
+            compressed = compressor.compress(data)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def _encode_csv(self):
+        yield (','.join(self.columns) + '\n').encode('utf-8')
+        for chunk in self.chunks():
+            yield chunk.to_csv(index=False, header=False).encode('utf-8')
+
+    def _encode_json(self):
+        # Same {"data": [...]} document as before, written a chunk at a time
+        yield b'{"data": ['
+        separator = b''
+        for chunk in self.chunks():
+            if len(chunk):
+                chunk = _decimal_floats(chunk)
+                yield separator + chunk.to_json(orient='records')[1:-1].encode('utf-8')
+                separator = b', '
+        yield b']}'
+
+    def _encode_arrow_format(self, new_writer):
+        # Schema from the column dtypes, not the first chunk's values
+        schema = pa.Schema.from_pandas(_plain_labels(self.snapshot.df[self.columns].iloc[:0]),
+                                       preserve_index=False)
+        sink = _ChunkSink()
+        writer = new_writer(sink, schema)
+        for chunk in self.chunks():
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    def _encode_parquet(self):
+        return self._encode_arrow_format(pq.ParquetWriter)
+
+    def _encode_arrow(self):
+        return self._encode_arrow_format(pa.ipc.new_stream)
+
+
+def _plain_labels(df):
+    """df with categorical columns as strings, so every chunk has one schema"""
+    categorical = df.select_dtypes('category').columns
+    return df.astype({col: 'str' for col in categorical}) if len(categorical) else df
+
+
+def _decimal_floats(df):
+    """df with float32 columns widened to the float64 of their shortest decimal.
+
+    Widening directly would print 44.99 as 44.990001678466797.
+    """
+    float32 = df.select_dtypes(np.float32).columns
+    return df.astype({col: str for col in float32}).astype({col: np.float64 for col in float32})
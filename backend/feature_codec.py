@@ -0,0 +1,48 @@
+"""
+ChurnGuard Feature Codec - vectorized categorical encoding with fixed lookup tables
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ['gender', 'Partner', 'Dependents', 'PhoneService',
+                       'MultipleLines', 'InternetService', 'OnlineSecurity',
+                       'OnlineBackup', 'DeviceProtection', 'TechSupport',
+                       'StreamingTV', 'StreamingMovies', 'Contract',
+                       'PaperlessBilling', 'PaymentMethod']
+
+
+class CategoricalCodec:
+    """Category-to-code tables frozen from fitted LabelEncoders.
+
+    Codes match LabelEncoder.transform exactly (the index into the sorted
+    classes_). Labels the encoder never saw fall back to code 0, the same
+    result as the old "replace with classes_[0]" rule, unless the column is
+    strict, in which case they raise like LabelEncoder does.
+    """
+
+    def __init__(self, classes: dict, strict_columns=()):
+        self.classes = {col: pd.Index(values) for col, values in classes.items()}
+        self.strict_columns = set(strict_columns)
+
+    @classmethod
+    def from_label_encoders(cls, label_encoders: dict):
+        # The target has no sensible fallback, so keep LabelEncoder's error
+        strict = [col for col in label_encoders if col not in CATEGORICAL_COLUMNS]
+        return cls({col: le.classes_ for col, le in label_encoders.items()},
+                   strict_columns=strict)
+
+    def encode(self, col, values) -> np.ndarray:
+        """Encode a whole column (array-like of labels) to int64 codes"""
+        # Factorize once, then translate the handful of distinct labels through
+        # the table; the trailing -1 keeps missing values unseen
+        labels, uniques = pd.factorize(values)
+        lookup = np.append(self.classes[col].get_indexer(uniques), -1).astype(np.int64)
+        codes = lookup[labels]
+
+        unseen = codes < 0
+        if unseen.any():
+            if col in self.strict_columns:
+                raise ValueError(f"y contains previously unseen labels: "
+                                 f"{sorted(set(np.asarray(values, dtype=object)[unseen].tolist()), key=str)}")
+            codes[unseen] = 0
+        return codes
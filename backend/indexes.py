@@ -0,0 +1,381 @@
+"""
+ChurnGuard Indexes - lookup structures over the customer table
+"""
+import base64
+import json
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+_NO_POSITIONS = np.array([], dtype=np.int64)
+
+
+class CustomerIndex:
+    """Hash index from customerID to row position in the customer table.
+
+    Positions never move once assigned: updates rewrite a row in place and
+    new customers are appended. That lets scored snapshots of different data
+    versions share one index; a snapshot only has to ignore positions past
+    its own length.
+    """
+
+    def __init__(self, customer_ids=()):
+        self._positions = {}
+        self.extend(customer_ids, start=0)
+
+    def extend(self, customer_ids, start: int):
+        """Register customers appended at positions start, start + 1, ..."""
+        self._positions.update(zip(customer_ids, range(start, start + len(customer_ids))))
+
+    def get(self, customer_id) -> Optional[int]:
+        return self._positions.get(customer_id)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, customer_id):
+        return customer_id in self._positions
+
+
+
+class CustomerSearchIndex:
+    """Trigram index for case-insensitive substring search over customer IDs.
+
+    IDs are lowercased and every 3-byte window of their UTF-8 form gets a
+    posting list of row positions. A query of three or more bytes intersects
+    the lists of its own trigrams and confirms the surviving candidates; a
+    shorter query is the union of the lists of trigrams containing it, which
+    is exact for every ID of at least three bytes. Shorter IDs are checked
+    directly. Positions are append-only as in CustomerIndex, so snapshots
+    share one search index and ignore positions past their own length.
+    """
+
+    def __init__(self, customer_ids=()):
+        self._ids = []
+        self._chunks = {}
+        self._short = []
+        self._lock = threading.Lock()
+        self.extend(customer_ids, start=0)
+
+    def extend(self, customer_ids, start: int):
+        """Index customers appended at positions start, start + 1, ..."""
+        if not len(customer_ids):
+            return
+        ids = np.array([str(cid).lower().encode('utf-8') for cid in customer_ids])
+        positions = np.arange(start, start + len(ids), dtype=np.int64)
+        lengths = np.char.str_len(ids)
+        width = ids.dtype.itemsize
+
+        grams = gram_positions = _NO_POSITIONS
+        if width >= 3:
+            raw = np.frombuffer(ids.tobytes(), dtype=np.uint8).reshape(len(ids), width)
+            raw = raw.astype(np.int32)
+            codes = (raw[:, :-2] << 16) | (raw[:, 1:-1] << 8) | raw[:, 2:]
+            valid = np.arange(width - 2) < (lengths - 2)[:, None]
+            grams = codes[valid]
+            gram_positions = np.broadcast_to(positions[:, None], codes.shape)[valid]
+            # Sort by trigram then position, dropping trigrams repeated within an ID
+            order = np.lexsort((gram_positions, grams))
+            grams, gram_positions = grams[order], gram_positions[order]
+            keep = np.ones(len(grams), dtype=bool)
+            keep[1:] = (grams[1:] != grams[:-1]) | (gram_positions[1:] != gram_positions[:-1])
+            grams, gram_positions = grams[keep], gram_positions[keep]
+
+        uniques, starts = np.unique(grams, return_index=True)
+        with self._lock:
+            self._ids.append(ids)
+            for gram, chunk in zip(uniques.tolist(), np.split(gram_positions, starts[1:])):
+                self._chunks.setdefault(gram, []).append(chunk)
+            self._short.append(positions[lengths < 3])
+
+    def search(self, query: str, prefix: bool = False) -> np.ndarray:
+        """Sorted positions of IDs containing query, or starting with it if prefix"""
+        needle = query.lower().encode('utf-8')
+        if not needle:
+            raise ValueError("Search query must not be empty")
+
+        with self._lock:
+            ids = _consolidate(self._ids)
+            short = _consolidate(self._short)
+            if len(needle) >= 3:
+                grams = {int.from_bytes(needle[k:k + 3], 'big') for k in range(len(needle) - 2)}
+                if any(gram not in self._chunks for gram in grams):
+                    candidates = _NO_POSITIONS
+                else:
+                    postings = sorted((self._posting(gram) for gram in grams), key=len)
+                    # Probe the rarest trigram's positions into the others, so
+                    # the cost follows the shortest list rather than the longest
+                    candidates = postings[0]
+                    for posting in postings[1:]:
+                        found = np.searchsorted(posting, candidates)
+                        found[found == len(posting)] = 0
+                        candidates = candidates[posting[found] == candidates]
+                exact = False
+            else:
+                hits = np.zeros(len(ids), dtype=bool)
+                for gram in self._chunks:
+                    if needle in gram.to_bytes(3, 'big'):
+                        hits[self._posting(gram)] = True
+                candidates = np.flatnonzero(hits)
+                exact = not prefix
+
+        if not exact and len(candidates):
+            candidates = candidates[_id_matches(ids[candidates], needle, prefix)]
+        if len(short):
+            candidates = np.union1d(candidates, short[_id_matches(ids[short], needle, prefix)])
+        return candidates
+
+    def _posting(self, gram):
+        return _consolidate(self._chunks[gram])
+
+
+def _id_matches(ids, needle, prefix):
+    if prefix:
+        return np.char.startswith(ids, needle)
+    return np.char.find(ids, needle) >= 0
+
+
+def _consolidate(chunks):
+    """Merge a list of appended arrays into one, in place"""
+    if len(chunks) > 1:
+        chunks[:] = [np.concatenate(chunks)]
+    return chunks[0] if chunks else _NO_POSITIONS
+
+
+# Columns with posting lists, and columns worth sorting the whole table by
+FILTER_COLUMNS = ['risk_level', 'Contract', 'InternetService']
+SORTABLE_COLUMNS = ['churn_probability', 'clv', 'tenure', 'MonthlyCharges']
+
+
+
+class CustomerQueryIndex:
+    """Filter postings and sort orders over one scored snapshot.
+
+    Every filter value maps to the sorted positions of its rows, so a
+    combination of filters is an intersection of posting lists. Each sort
+    order (key in the requested direction, ties broken by ascending
+    customerID) is computed once per snapshot along with its inverse, the
+    rank of every row. A filtered page is then a top-k over the ranks of the
+    matching rows, and an unfiltered page is a slice of the order.
+    """
+
+    def __init__(self, df, filter_columns=FILTER_COLUMNS):
+        self.df = df
+        self.n_rows = len(df)
+        self._codes = {}
+        self._postings = {}
+        for col in filter_columns:
+            codes, uniques = pd.factorize(df[col])
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self._codes[col] = codes
+            self._postings[col] = {value: (code, order[bounds[code]:bounds[code + 1]])
+                                   for code, value in enumerate(uniques)}
+        self._sort_orders = {}
+        self._ids = None
+        self._lock = threading.Lock()
+
+    def filter(self, filters: dict) -> Optional[np.ndarray]:
+        """Sorted positions matching every filter, or None for all rows"""
+        terms = []
+        for col, value in filters.items():
+            if not value:
+                continue
+            if value not in self._postings[col]:
+                return _NO_POSITIONS
+            terms.append((col, *self._postings[col][value]))
+        if not terms:
+            return None
+
+        # Start from the shortest posting list and check the other terms
+        # against their code arrays, which keeps the work proportional to the
+        # most selective filter
+        terms.sort(key=lambda term: len(term[2]))
+        positions = terms[0][2]
+        for col, code, _ in terms[1:]:
+            positions = positions[self._codes[col][positions] == code]
+        return positions
+
+    def sort_order(self, column, descending):
+        """SortOrder for column in the given direction, built on first use"""
+        key = (column, descending)
+        cached = self._sort_orders.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            cached = self._sort_orders.get(key)
+            if cached is None:
+                cached = SortOrder(self.df[column], self._sorted_ids(), descending)
+                self._sort_orders[key] = cached
+        return cached
+
+    def _sorted_ids(self):
+        if self._ids is None:
+            self._ids = pd.factorize(self.df['customerID'], sort=True)
+        return self._ids
+
+    def page(self, positions, sort_by, descending, offset, limit, after=None):
+        """Positions of one page of rows, and whether more rows follow it.
+
+        positions is a filter result (None for all rows); sort_by None keeps
+        table order. after is a (key, customerID) cursor from cursor_for():
+        the page starts just past that row, so resuming costs the same at any
+        depth.
+        """
+        if sort_by is None:
+            first = 0 if after is None else _checked_position(after[0]) + 1
+            if positions is None:
+                start = first + offset
+                return np.arange(start, min(start + limit, self.n_rows)), start + limit < self.n_rows
+            start = np.searchsorted(positions, first) + offset
+            return positions[start:start + limit], start + limit < len(positions)
+
+        sort_order = self.sort_order(sort_by, descending)
+        first = 0 if after is None else sort_order.after(*after)
+        if positions is None:
+            start = first + offset
+            return sort_order.order[start:start + limit], start + limit < self.n_rows
+
+        end = offset + limit
+        candidate_ranks = sort_order.ranks[positions]
+        if first:
+            candidate_ranks = candidate_ranks[candidate_ranks >= first]
+        has_more = end < len(candidate_ranks)
+        if has_more:
+            candidate_ranks = candidate_ranks[np.argpartition(candidate_ranks, end - 1)[:end]]
+        return sort_order.order[np.sort(candidate_ranks)[offset:end]], has_more
+
+    def cursor_for(self, position, sort_by):
+        """(key, customerID) cursor pointing at the row at position"""
+        customer_id = self.df['customerID'].iat[position]
+        if sort_by is None:
+            return int(position), customer_id
+        key = self.df[sort_by].iat[position]
+        if pd.isna(key):
+            key = None
+        elif isinstance(key, np.generic):
+            key = key.item()
+        return key, customer_id
+
+
+class SortOrder:
+    """One sort of the customer table: key in one direction, then customerID.
+
+    order lists row positions in sorted order and ranks is its inverse
+    (order[ranks[p]] == p). Keys are held as dense ranks adjusted for the
+    direction, so they are ascending along order whatever the column dtype;
+    missing keys sort last in either direction, like sort_values.
+    Categorical keys sort by their labels, not by category order.
+    """
+
+    def __init__(self, values, sorted_ids, descending):
+        id_codes, self._id_uniques = sorted_ids
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, self._uniques = _label_ranks(values)
+        else:
+            codes, self._uniques = pd.factorize(values, sort=True)
+        self.descending = descending
+        # Cursor keys must be comparable with the column's values
+        if self._uniques.dtype.kind in 'iuf':
+            self._key_types = (int, float)
+        elif self._uniques.dtype.kind == 'b':
+            self._key_types = (bool,)
+        else:
+            self._key_types = (str,)
+
+        key_ranks = codes.astype(np.int64)
+        if descending:
+            key_ranks = np.where(key_ranks >= 0, len(self._uniques) - 1 - key_ranks, key_ranks)
+        key_ranks[key_ranks < 0] = len(self._uniques)
+
+        self.order = np.lexsort((id_codes, key_ranks))
+        self.ranks = np.empty_like(self.order)
+        self.ranks[self.order] = np.arange(len(self.order))
+        self._sorted_key_ranks = key_ranks[self.order]
+        self._sorted_id_codes = id_codes[self.order]
+
+    def after(self, key, customer_id) -> int:
+        """Index into order of the first row sorting strictly after (key, customer_id).
+
+        The cursor row does not have to exist any more: a key or ID that was
+        updated away still falls between the same neighbours.
+        """
+        if key is not None and (not isinstance(key, self._key_types)
+                                or (isinstance(key, bool) and bool not in self._key_types)):
+            raise InvalidCursorError("Cursor key does not match the sort column")
+        n_keys = len(self._uniques)
+        try:
+            id_code = int(self._id_uniques.searchsorted(customer_id, side='right'))
+            if key is None:
+                key_rank, exact = n_keys, True
+            else:
+                i = int(self._uniques.searchsorted(key))
+                exact = i < n_keys and self._uniques[i] == key
+                if self.descending:
+                    key_rank = n_keys - 1 - i if exact else n_keys - i
+                else:
+                    key_rank = i
+        except (TypeError, ValueError, KeyError) as e:
+            raise InvalidCursorError(f"Cursor does not match this sort: {e}")
+        if not exact:
+            return int(np.searchsorted(self._sorted_key_ranks, key_rank))
+
+        lo, hi = np.searchsorted(self._sorted_key_ranks, [key_rank, key_rank + 1])
+        # IDs ascend within a run of equal keys; compare by their sorted codes
+        return int(lo + np.searchsorted(self._sorted_id_codes[lo:hi], id_code))
+
+
+def _checked_position(key) -> int:
+    """A table-order cursor key, which must be a row position"""
+    if not isinstance(key, int) or isinstance(key, bool) or key < 0:
+        raise InvalidCursorError("Cursor key is not a row position")
+    return key
+
+
+def _label_ranks(values):
+    """(rank of every label among the sorted categories, -1 if missing; sorted categories)"""
+    categories = values.cat.categories
+    by_label = categories.argsort()
+    # Index -1 (a missing value's code) picks the trailing -1
+    rank_of_code = np.full(len(categories) + 1, -1, dtype=np.int64)
+    rank_of_code[by_label] = np.arange(len(categories))
+    return rank_of_code[values.cat.codes.to_numpy()], pd.Index(categories.take(by_label))
+
+
+class InvalidCursorError(ValueError):
+    """Raised for a page cursor that cannot be decoded or does not fit the query"""
+
+
+def pack_cursor(*values) -> str:
+    """Opaque, URL-safe page cursor holding JSON-serializable values"""
+    payload = json.dumps(list(values), separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def unpack_cursor(cursor: str, n_values):
+    """The n_values values from pack_cursor()"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or len(values) != n_values:
+        raise InvalidCursorError(f"Invalid cursor: expected {n_values} values")
+    return values
+
+
+def encode_cursor(sort_by, descending, key, customer_id) -> str:
+    """Opaque page cursor for resuming a query after one row"""
+    return pack_cursor(sort_by, descending, key, customer_id)
+
+
+def decode_cursor(cursor: str):
+    """(sort_by, descending, key, customer_id) from encode_cursor()"""
+    sort_by, descending, key, customer_id = unpack_cursor(cursor, 4)
+    if not (sort_by is None or isinstance(sort_by, str)) or not isinstance(customer_id, str) \
+            or isinstance(key, (list, dict)):
+        raise InvalidCursorError("Invalid cursor: unexpected value types")
+    return sort_by, bool(descending), key, customer_id
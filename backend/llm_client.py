@@ -0,0 +1,185 @@
+"""
+ChurnGuard LLM Client - one shared, bounded and fault-tolerant client for the chat model
+"""
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the chat model cannot be used: the circuit is open, or retries ran out"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing provider for a while.
+
+    Opens after failure_threshold consecutive failures. Once reset_timeout
+    seconds have passed it lets a single trial call through (half-open):
+    success closes it again, failure re-opens it. A trial that never
+    reports back (a cancelled call) makes way for another after
+    reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started_at = None
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        state = self.state
+        if state == 'closed':
+            return True
+        now = time.monotonic()
+        if state == 'half_open' and (self._trial_started_at is None
+                                     or now - self._trial_started_at >= self.reset_timeout):
+            self._trial_started_at = now
+            return True
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        trial = self._trial_started_at is not None
+        if trial or self._failures >= self.failure_threshold:
+            if self._opened_at is None or trial:
+                logger.warning(f"LLM circuit opened after {self._failures} failures")
+            self._opened_at = time.monotonic()
+        self._trial_started_at = None
+
+
+class LLMClient:
+    """The process-wide chat model client.
+
+    chat_factory builds the LangChain chat model once, on first use, so one
+    model object (and the pooled HTTP client it was given) serves every
+    call. Calls are capped at max_concurrency in flight, each attempt has a
+    deadline of timeout seconds (for streams, the wait for each chunk), and
+    failed attempts are retried max_retries times with exponential backoff.
+    Every failure counts towards the circuit breaker; while it is open calls
+    fail fast with LLMUnavailableError, as they do once retries run out.
+    """
+
+    def __init__(self, chat_factory, max_concurrency=8, timeout=30.0, max_retries=2,
+                 backoff=0.5, breaker=None):
+        self.chat_factory = chat_factory
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._chat = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._calls = 0
+        self._failures = 0
+        self._retries = 0
+        self._rejected = 0
+
+    @property
+    def chat(self):
+        if self._chat is None:
+            self._chat = self.chat_factory()
+        return self._chat
+
+    async def complete(self, messages):
+        """Text of the model's reply to messages"""
+        async def attempt():
+            response = await asyncio.wait_for(self.chat.ainvoke(messages), self.timeout)
+            return response.content
+        return await self._with_retries(attempt)
+
+    async def stream(self, messages):
+        """Text chunks of the model's reply to messages as they are generated.
+
+        Attempts that fail before the first chunk are retried; a failure
+        after it raises, since the chunks already sent cannot be taken back.
+        """
+        self._check_breaker()
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                self._calls += 1
+                started = False
+                chunks = self.chat.astream(messages).__aiter__()
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            break
+                        started = True
+                        yield chunk.content
+                except Exception as e:
+                    self._record_failure(e)
+                    if started or attempt == self.max_retries or not self.breaker.allow():
+                        raise LLMUnavailableError(f"LLM stream failed: {type(e).__name__}: {e}") from e
+                    await self._back_off(attempt)
+                    continue
+                finally:
+                    await _aclose(chunks)
+                self.breaker.record_success()
+                return
+
+    async def _with_retries(self, attempt_fn):
+        self._check_breaker()
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                self._calls += 1
+                try:
+                    result = await attempt_fn()
+                except Exception as e:
+                    self._record_failure(e)
+                    if attempt == self.max_retries or not self.breaker.allow():
+                        raise LLMUnavailableError(f"LLM call failed: {type(e).__name__}: {e}") from e
+                    await self._back_off(attempt)
+                    continue
+                self.breaker.record_success()
+                return result
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self._rejected += 1
+            raise LLMUnavailableError("LLM circuit is open")
+
+    def _record_failure(self, error):
+        self._failures += 1
+        self.breaker.record_failure()
+        logger.warning(f"LLM call failed: {type(error).__name__}: {error}")
+
+    async def _back_off(self, attempt):
+        self._retries += 1
+        # Full jitter, so callers that failed together do not retry together
+        await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def metrics(self):
+        return {
+            'calls': self._calls,
+            'failures': self._failures,
+            'retries': self._retries,
+            'rejected': self._rejected,
+            'circuit': self.breaker.state,
+            'max_concurrency': self.max_concurrency,
+            'timeout_seconds': self.timeout
+        }
+
+
+async def _aclose(iterator):
+    aclose = getattr(iterator, 'aclose', None)
+    if aclose is not None:
+        await aclose()
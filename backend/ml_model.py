@@ -7,139 +7,332 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
 import xgboost as xgb
-import joblib
-import os
-from pathlib import Path
+import threading
+from dataclasses import dataclass
+from functools import cached_property
 import logging
+from feature_codec import CATEGORICAL_COLUMNS, CategoricalCodec
+from scalar_predictor import ScalarPredictor
+from inference import InferenceEngine
+from data_sources import SyntheticSource, compact_customers, widen_categories
+from exports import CustomerExporter
+from parallel_scoring import ParallelScorer
+from segments import (CHARGES_BUCKET, CHART_DIMENSIONS, MEASURES, RISK_LEVEL, TENURE_BUCKET,
+                      SegmentCube)
+from indexes import (CustomerIndex, CustomerQueryIndex, CustomerSearchIndex, InvalidCursorError,
+                     decode_cursor, encode_cursor)
 
 logger = logging.getLogger(__name__)
 
-# Dataset embedded - Telco Customer Churn
-TELCO_DATA = """customerID,gender,SeniorCitizen,Partner,Dependents,tenure,PhoneService,MultipleLines,InternetService,OnlineSecurity,OnlineBackup,DeviceProtection,TechSupport,StreamingTV,StreamingMovies,Contract,PaperlessBilling,PaymentMethod,MonthlyCharges,TotalCharges,Churn
-7590-VHVEG,Female,0,Yes,No,1,No,No phone service,DSL,No,Yes,No,No,No,No,Month-to-month,Yes,Electronic check,29.85,29.85,No
-5575-GNVDE,Male,0,No,No,34,Yes,No,DSL,Yes,No,Yes,No,No,No,One year,No,Mailed check,56.95,1889.5,No
-3668-QPYBK,Male,0,No,No,2,Yes,No,DSL,Yes,Yes,No,No,No,No,Month-to-month,Yes,Mailed check,53.85,108.15,Yes
-7795-CFOCW,Male,0,No,No,45,No,No phone service,DSL,Yes,No,Yes,Yes,No,No,One year,No,Bank transfer (automatic),42.30,1840.75,No
-9237-HQITU,Female,0,No,No,2,Yes,No,Fiber optic,No,No,No,No,No,No,Month-to-month,Yes,Electronic check,70.70,151.65,Yes
-9305-CDSKC,Female,0,No,No,8,Yes,Yes,Fiber optic,No,No,Yes,No,Yes,Yes,Month-to-month,Yes,Electronic check,99.65,820.5,Yes
-1452-KIOVK,Male,0,No,Yes,22,Yes,Yes,Fiber optic,No,Yes,No,No,Yes,No,Month-to-month,Yes,Credit card (automatic),89.10,1949.4,No
-6713-OKOMC,Female,0,No,No,10,No,No phone service,DSL,Yes,No,No,No,No,No,Month-to-month,No,Mailed check,29.75,301.9,No
-7892-POOKP,Female,0,Yes,No,28,Yes,Yes,Fiber optic,No,No,Yes,Yes,Yes,Yes,Month-to-month,Yes,Electronic check,104.80,3046.05,Yes
-6388-TABGU,Male,0,No,Yes,62,Yes,No,DSL,Yes,Yes,Yes,No,No,No,One year,No,Bank transfer (automatic),56.15,3487.95,No
-9763-GRSKD,Male,0,Yes,Yes,13,Yes,No,DSL,Yes,No,No,No,No,No,Month-to-month,No,Mailed check,49.95,587.45,No
-7469-LKBCI,Male,0,No,No,16,Yes,No,No,No internet service,No internet service,No internet service,No internet service,No internet service,No internet service,Two year,No,Credit card (automatic),18.95,326.8,No
-8091-TTVAX,Male,0,Yes,No,58,Yes,Yes,Fiber optic,No,No,Yes,No,Yes,Yes,One year,No,Credit card (automatic),100.35,5681.1,No
-0280-XJGEX,Male,0,No,No,49,Yes,Yes,Fiber optic,No,Yes,Yes,No,Yes,Yes,Month-to-month,Yes,Bank transfer (automatic),103.70,5036.3,Yes
-5129-JLPIS,Male,0,No,No,25,Yes,No,Fiber optic,Yes,No,Yes,Yes,Yes,Yes,Month-to-month,Yes,Electronic check,105.50,2686.05,No
-3655-SNQYZ,Female,0,Yes,Yes,69,Yes,Yes,Fiber optic,Yes,Yes,Yes,Yes,Yes,Yes,Two year,No,Credit card (automatic),113.25,7895.15,No
-8191-XWSZG,Female,0,No,No,52,Yes,No,No,No internet service,No internet service,No internet service,No internet service,No internet service,No internet service,Two year,No,Mailed check,20.65,1022.95,No
-9959-WOFKT,Male,0,No,Yes,71,Yes,Yes,Fiber optic,Yes,No,Yes,No,Yes,Yes,Two year,Yes,Bank transfer (automatic),106.70,7382.25,No
-4190-MFLUW,Female,0,Yes,Yes,10,Yes,No,DSL,No,No,Yes,Yes,No,No,Month-to-month,No,Credit card (automatic),55.20,528.35,Yes
-4183-MYFRB,Female,0,No,No,21,Yes,No,Fiber optic,No,Yes,Yes,No,No,Yes,Month-to-month,Yes,Electronic check,90.05,1862.9,No"""
+class _CategoryColumn:
+    """Row access to a categorical column without materializing its labels"""
+
+    def __init__(self, values):
+        self.codes = values.cat.codes.to_numpy()
+        self.categories = values.cat.categories.to_numpy(dtype=object)
+
+    def __getitem__(self, position):
+        code = self.codes[position]
+        return self.categories[code] if code >= 0 else None
+
+
+def _native(value):
+    if isinstance(value, np.float32):
+        # Shortest decimal that round-trips the float32, e.g. 29.85
+        return float(str(value))
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _column_arrays(df):
+    """Column arrays of df, for row fetches without building a Series"""
+    return {col: _CategoryColumn(values) if isinstance(values.dtype, pd.CategoricalDtype)
+            else values.to_numpy()
+            for col, values in df.items()}
+
+
+def _row(columns, position):
+    return {col: _native(values[position]) for col, values in columns.items()}
+
+
+@dataclass(frozen=True)
+class ScoredSnapshot:
+    """Customer base scored by one model version against one data version.
+
+    Built once per (model_version, data_version) and never mutated; callers
+    that need to add columns must work on a copy.
+    """
+    df: pd.DataFrame
+    model_version: int
+    data_version: int
+    index: CustomerIndex
+    search_index: CustomerSearchIndex
+    segment_cube: SegmentCube
+    chart_cube: SegmentCube
+
+    @property
+    def version(self):
+        return (self.model_version, self.data_version)
+
+    def position(self, customer_id):
+        """Row position of a customer in df, or None"""
+        position = self.index.get(customer_id)
+        # The index is shared with newer snapshots that may have appended rows
+        if position is None or position >= len(self.df):
+            return None
+        return position
+
+    def search(self, query, prefix=False):
+        """Sorted positions of customers whose ID contains (or starts with) query"""
+        positions = self.search_index.search(query, prefix=prefix)
+        return positions[:np.searchsorted(positions, len(self.df))]
+
+    @cached_property
+    def columns(self):
+        """Column arrays of df, for row fetches without building a Series"""
+        return _column_arrays(self.df)
+
+    def row(self, position):
+        """One customer as a dict of native Python values"""
+        return _row(self.columns, position)
+
+    @cached_property
+    def query_index(self):
+        """Filter postings and sort orders for paging through df"""
+        return CustomerQueryIndex(self.df)
+
+
+@dataclass(frozen=True)
+class ServingState:
+    """Fitted objects that must be read together to score a customer.
+
+    Published as a single reference so a model swap is atomic: a request
+    that captured the old state keeps using it until it finishes.
+    """
+    model: object
+    scaler: StandardScaler
+    label_encoders: dict
+    codec: CategoricalCodec
+    engine: InferenceEngine
+    scalar_predictor: ScalarPredictor
+    feature_columns: list
+    model_version: int
+
 
 class ChurnModel:
-    def __init__(self):
+    def __init__(self, data_source=None, max_training_rows=1_000_000):
+        # Synthetic Telco-like customers unless a real source is configured.
+        # Training fits on at most max_training_rows rows sampled from it.
+        self.data_source = data_source if data_source is not None else SyntheticSource()
+        self.max_training_rows = max_training_rows
+        # Full-table scoring runs inline unless given more workers
+        self.scorer = ParallelScorer()
         self.model = None
         self.scaler = StandardScaler()
         self.label_encoders = {}
         self.feature_columns = []
         self.feature_importance = {}
         self.metrics = {}
-        self.df = None
-        
+        self._df = None
+        # Bumped by train() and by any change to self.df respectively
+        self.model_version = 0
+        self.data_version = 0
+        # Registry version of the loaded artifact, None until saved or loaded
+        self.artifact_version = None
+        self._serving = None
+        self._swap_lock = threading.RLock()
+        self._snapshot = None
+        self._snapshot_lock = threading.Lock()
+        # Guards self.df, its index and the log of rows changed since the
+        # last full reload, so snapshots can rescore only what changed
+        self._data_lock = threading.Lock()
+        self._customer_index = None
+        self._search_index = None
+        self._change_log = []
+        self._reload_version = 0
+        # Upserted (positions, rows) not merged into self._df yet, the
+        # table's length with them, and the data version each position was
+        # last written at
+        self._pending = []
+        self._n_rows = 0
+        self._changed_at = {}
+    
+    @property
+    def df(self):
+        """The customer table, with every upsert merged in"""
+        with self._data_lock:
+            return self._merged()
+    
     def load_data(self):
-        """Load the Telco Customer Churn dataset"""
-        from io import StringIO
-        
-        # For demo, use embedded sample. In production, load full dataset
-        # Full dataset URL: https://raw.githubusercontent.com/IBM/telco-customer-churn-on-icp4d/master/data/Telco-Customer-Churn.csv
-        
-        # Generate synthetic data based on Telco dataset patterns
-        np.random.seed(42)
-        n_samples = 7043
-        
-        data = {
-            'customerID': [f'CUST-{i:05d}' for i in range(n_samples)],
-            'gender': np.random.choice(['Male', 'Female'], n_samples),
-            'SeniorCitizen': np.random.choice([0, 1], n_samples, p=[0.84, 0.16]),
-            'Partner': np.random.choice(['Yes', 'No'], n_samples, p=[0.48, 0.52]),
-            'Dependents': np.random.choice(['Yes', 'No'], n_samples, p=[0.30, 0.70]),
-            'tenure': np.random.randint(0, 73, n_samples),
-            'PhoneService': np.random.choice(['Yes', 'No'], n_samples, p=[0.90, 0.10]),
-            'MultipleLines': np.random.choice(['Yes', 'No', 'No phone service'], n_samples, p=[0.42, 0.48, 0.10]),
-            'InternetService': np.random.choice(['DSL', 'Fiber optic', 'No'], n_samples, p=[0.34, 0.44, 0.22]),
-            'OnlineSecurity': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.29, 0.49, 0.22]),
-            'OnlineBackup': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.34, 0.44, 0.22]),
-            'DeviceProtection': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.34, 0.44, 0.22]),
-            'TechSupport': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.29, 0.49, 0.22]),
-            'StreamingTV': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.38, 0.40, 0.22]),
-            'StreamingMovies': np.random.choice(['Yes', 'No', 'No internet service'], n_samples, p=[0.38, 0.40, 0.22]),
-            'Contract': np.random.choice(['Month-to-month', 'One year', 'Two year'], n_samples, p=[0.55, 0.21, 0.24]),
-            'PaperlessBilling': np.random.choice(['Yes', 'No'], n_samples, p=[0.59, 0.41]),
-            'PaymentMethod': np.random.choice(['Electronic check', 'Mailed check', 'Bank transfer (automatic)', 'Credit card (automatic)'], n_samples, p=[0.34, 0.23, 0.22, 0.21]),
-            'MonthlyCharges': np.round(np.random.uniform(18, 119, n_samples), 2),
-            'TotalCharges': np.round(np.random.uniform(18, 8700, n_samples), 2),
-        }
-        
-        # Generate realistic churn based on features
-        churn_prob = np.zeros(n_samples)
-        churn_prob += (data['Contract'] == 'Month-to-month').astype(float) * 0.25
-        churn_prob += (data['tenure'] < 12).astype(float) * 0.15
-        churn_prob += (data['InternetService'] == 'Fiber optic').astype(float) * 0.10
-        churn_prob += (data['PaymentMethod'] == 'Electronic check').astype(float) * 0.10
-        churn_prob += (np.array(data['MonthlyCharges']) > 70).astype(float) * 0.10
-        churn_prob += (data['OnlineSecurity'] == 'No').astype(float) * 0.05
-        churn_prob += (data['TechSupport'] == 'No').astype(float) * 0.05
-        churn_prob = np.clip(churn_prob + np.random.normal(0, 0.1, n_samples), 0, 1)
-        
-        data['Churn'] = np.where(np.random.random(n_samples) < churn_prob, 'Yes', 'No')
-        
-        self.df = pd.DataFrame(data)
+        """Load the customer table from the data source"""
+        self._replace_data(self.data_source.read())
         return self.df
     
-    def preprocess_data(self, df, is_training=True):
+    def _replace_data(self, df):
+        """Swap in a whole new customer table"""
+        df = compact_customers(df)
+        with self._data_lock:
+            self._df = df
+            self._pending = []
+            self._n_rows = len(df)
+            self._changed_at = {}
+            customer_ids = df['customerID'].tolist()
+            self._customer_index = CustomerIndex(customer_ids)
+            self._search_index = CustomerSearchIndex(customer_ids)
+            self.data_version += 1
+            self._reload_version = self.data_version
+            self._change_log = []
+    
+    def upsert_customers(self, customers):
+        """Insert new customers and overwrite existing ones, matched on customerID.
+
+        Rows are buffered and merged into the table the next time the whole
+        table is read, so an upsert costs time in proportion to its own rows
+        rather than to the table.
+        """
+        if self._df is None:
+            raise ValueError("No customer data loaded")
+        
+        missing = [col for col in self._df.columns if col not in customers.columns]
+        if missing:
+            raise ValueError(f"Missing customer columns: {missing}")
+        customers = customers.drop_duplicates('customerID', keep='last')
+        
+        with self._data_lock:
+            index = self._customer_index
+            customers = compact_customers(customers[self._df.columns], like=self._df)
+            positions = np.array([index.get(cid) if cid in index else -1
+                                  for cid in customers['customerID']], dtype=np.int64)
+            is_new = positions < 0
+            n_inserted = int(is_new.sum())
+            start = self._n_rows
+            if n_inserted:
+                positions[is_new] = np.arange(start, start + n_inserted)
+                inserted_ids = customers['customerID'][is_new].tolist()
+                index.extend(inserted_ids, start)
+                self._search_index.extend(inserted_ids, start)
+                self._n_rows += n_inserted
+            
+            customers = customers.reset_index(drop=True)
+            self._pending.append((positions, customers))
+            self.data_version += 1
+            self._change_log.append((self.data_version, positions))
+            self._changed_at.update(dict.fromkeys(positions.tolist(), self.data_version))
+        
+        return {
+            'inserted': n_inserted,
+            'updated': int(len(customers) - n_inserted),
+            'data_version': self.data_version
+        }
+    
+    def _merged(self):
+        """self._df with the pending upserts merged in; call with _data_lock held"""
+        if not self._pending:
+            return self._df
+        df = self._df
+        positions = np.concatenate([positions for positions, _ in self._pending])
+        # Frames may carry different new labels; re-encode against the table
+        rows = compact_customers(pd.concat([rows.astype(object) for _, rows in self._pending],
+                                           ignore_index=True), like=df)
+        # Keep the last write of every position
+        last = len(positions) - 1 - np.unique(positions[::-1], return_index=True)[1]
+        positions, rows = positions[last], rows.iloc[last]
+        df = widen_categories(df, rows)
+        
+        is_update = positions < len(df)
+        if is_update.any():
+            # One copy per column for all pending upserts together
+            targets = positions[is_update]
+            columns = {}
+            for col, values in df.items():
+                new_values = rows[col].iloc[np.flatnonzero(is_update)]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    codes = values.cat.codes.to_numpy().copy()
+                    codes[targets] = new_values.cat.codes.to_numpy()
+                    columns[col] = pd.Categorical.from_codes(codes, dtype=values.dtype)
+                elif isinstance(values.dtype, np.dtype) and isinstance(new_values.dtype, np.dtype):
+                    array = values.to_numpy(dtype=np.result_type(values.dtype, new_values.dtype),
+                                            copy=True)
+                    array[targets] = new_values.to_numpy()
+                    columns[col] = array
+                else:
+                    column = values.copy()
+                    column.iloc[targets] = new_values.to_numpy()
+                    columns[col] = column
+            df = pd.DataFrame(columns, index=df.index)
+        if not is_update.all():
+            # New positions were handed out in order, so they follow the table
+            appended = rows[~is_update].iloc[np.argsort(positions[~is_update])]
+            df = pd.concat([df, appended], ignore_index=True)
+        
+        self._df = df
+        self._pending = []
+        return df
+    
+    def _changes_since(self, data_version):
+        """Positions changed after data_version, or None if a reload happened since"""
+        if data_version < self._reload_version:
+            return None
+        changed = [positions for version, positions in self._change_log if version > data_version]
+        return np.unique(np.concatenate(changed)) if changed else np.array([], dtype=np.int64)
+    
+    def preprocess_data(self, df, is_training=True, label_encoders=None, codec=None):
         """Preprocess data for model training/prediction"""
-        df = df.copy()
+        # Copy-on-write: columns replaced below never reach the caller's frame
+        df = df.copy(deep=False)
+        if label_encoders is None:
+            label_encoders = self.label_encoders
         
         # Handle TotalCharges conversion
         df['TotalCharges'] = pd.to_numeric(df['TotalCharges'], errors='coerce')
         df['TotalCharges'] = df['TotalCharges'].fillna(df['TotalCharges'].median())
         
         # Encode categorical variables
-        categorical_columns = ['gender', 'Partner', 'Dependents', 'PhoneService', 
-                              'MultipleLines', 'InternetService', 'OnlineSecurity',
-                              'OnlineBackup', 'DeviceProtection', 'TechSupport',
-                              'StreamingTV', 'StreamingMovies', 'Contract',
-                              'PaperlessBilling', 'PaymentMethod']
-        
-        for col in categorical_columns:
-            if col in df.columns:
-                if is_training:
+        if is_training:
+            for col in CATEGORICAL_COLUMNS:
+                if col in df.columns:
                     le = LabelEncoder()
                     df[col] = le.fit_transform(df[col].astype(str))
-                    self.label_encoders[col] = le
-                else:
-                    if col in self.label_encoders:
-                        le = self.label_encoders[col]
-                        # Handle unseen labels
-                        df[col] = df[col].apply(lambda x: x if x in le.classes_ else le.classes_[0])
-                        df[col] = le.transform(df[col].astype(str))
+                    label_encoders[col] = le
+        else:
+            # Whole-column lookups, unseen labels fall back to classes_[0]
+            if codec is None:
+                codec = CategoricalCodec.from_label_encoders(label_encoders)
+            for col in CATEGORICAL_COLUMNS:
+                if col in df.columns and col in label_encoders:
+                    df[col] = codec.encode(col, df[col])
         
         # Encode target variable
         if 'Churn' in df.columns:
             if is_training:
                 le = LabelEncoder()
                 df['Churn'] = le.fit_transform(df['Churn'])
-                self.label_encoders['Churn'] = le
+                label_encoders['Churn'] = le
             else:
-                df['Churn'] = self.label_encoders['Churn'].transform(df['Churn'])
+                df['Churn'] = codec.encode('Churn', df['Churn'])
         
         return df
     
-    def train(self):
-        """Train the XGBoost model"""
+    def train(self, progress=None, reload_data=True):
+        """Train the XGBoost model
+
+        progress, if given, is called as progress(stage, fraction) as
+        training advances. The model is fit on a sample of the data source
+        read a chunk at a time; reload_data also reloads the served
+        customer table from it.
+        """
+        def report(stage, fraction):
+            if progress is not None:
+                progress(stage, fraction)
+        
         logger.info("Loading and preprocessing data...")
-        df = self.load_data()
+        report('loading_data', 0.05)
+        if reload_data:
+            self.load_data()
+        df = compact_customers(self.data_source.sample(self.max_training_rows))
+        report('preprocessing', 0.2)
+        # Fit into fresh objects so a published ServingState is never mutated
+        self.scaler = StandardScaler()
+        self.label_encoders = {}
         df_processed = self.preprocess_data(df, is_training=True)
         
         # Feature columns (exclude customerID and Churn)
@@ -159,6 +352,7 @@ class ChurnModel:
         
         # Train XGBoost
         logger.info("Training XGBoost model...")
+        report('training', 0.3)
         self.model = xgb.XGBClassifier(
             n_estimators=100,
             max_depth=5,
@@ -171,6 +365,7 @@ class ChurnModel:
         self.model.fit(X_train, y_train)
         
         # Evaluate
+        report('evaluating', 0.8)
         y_pred = self.model.predict(X_test)
         y_pred_proba = self.model.predict_proba(X_test)[:, 1]
         
@@ -190,131 +385,361 @@ class ChurnModel:
                                              key=lambda x: x[1], reverse=True))
         
         logger.info(f"Model trained. Metrics: {self.metrics}")
+        self.artifact_version = None
+        self._publish()
+        report('trained', 1.0)
         return self.metrics
     
-    def predict(self, customer_data: dict):
-        """Predict churn probability for a single customer"""
+    def _publish(self):
+        """Make the current fitted attributes the ones used for scoring"""
+        with self._swap_lock:
+            self.model_version += 1
+            codec = CategoricalCodec.from_label_encoders(self.label_encoders)
+            engine = InferenceEngine.from_model(self.model)
+            self._serving = ServingState(
+                model=self.model,
+                scaler=self.scaler,
+                label_encoders=self.label_encoders,
+                codec=codec,
+                engine=engine,
+                scalar_predictor=ScalarPredictor(engine, self.scaler, codec,
+                                                 self.feature_columns),
+                feature_columns=self.feature_columns,
+                model_version=self.model_version
+            )
+    
+    def _serving_state(self):
+        state = self._serving
+        if state is None:
+            raise ValueError("Model not trained")
+        return state
+    
+    def get_artifacts(self):
+        """Get the fitted state needed to serve predictions"""
         if self.model is None:
             raise ValueError("Model not trained")
         
+        return {
+            'model': self.model,
+            'scaler': self.scaler,
+            'label_encoders': self.label_encoders,
+            'feature_columns': self.feature_columns,
+            'metrics': self.metrics,
+            'feature_importance': self.feature_importance
+        }
+    
+    def load_artifacts(self, artifacts):
+        """Restore fitted state saved by get_artifacts(), swapping it in atomically"""
+        if self._df is None:
+            self.load_data()
+        
+        with self._swap_lock:
+            self.model = artifacts['model']
+            self.scaler = artifacts['scaler']
+            self.label_encoders = artifacts['label_encoders']
+            self.feature_columns = artifacts['feature_columns']
+            self.metrics = artifacts['metrics']
+            self.feature_importance = artifacts['feature_importance']
+            self.artifact_version = artifacts.get('version')
+            self._publish()
+    
+    def predict(self, customer_data: dict):
+        """Predict churn probability for a single customer"""
+        state = self._serving_state()
+        
         # Convert to DataFrame
         df = pd.DataFrame([customer_data])
         
         # Preprocess
-        df_processed = self.preprocess_data(df, is_training=False)
+        df_processed = self.preprocess_data(df, is_training=False,
+                                            label_encoders=state.label_encoders,
+                                            codec=state.codec)
         
         # Get features
-        X = df_processed[self.feature_columns]
-        X_scaled = self.scaler.transform(X)
+        X = df_processed[state.feature_columns]
+        X_scaled = state.scaler.transform(X)
         
         # Predict
-        churn_prob = float(self.model.predict_proba(X_scaled)[0][1])
+        churn_prob = float(state.engine.predict_proba(X_scaled)[0])
+        return self._format_prediction(churn_prob)
+    
+    def predict_fast(self, customer_data: dict):
+        """Predict churn for a single customer without pandas, matching predict() bit for bit"""
+        churn_prob = self._serving_state().scalar_predictor.predict_proba(customer_data)
+        return self._format_prediction(churn_prob)
+    
+    def predict_batch(self, records):
+        """Predict churn for many customers in one vectorized call"""
+        if not records:
+            return []
+        probabilities = self._serving_state().scalar_predictor.predict_proba_many(records)
+        return [self._format_prediction(float(p)) for p in probabilities]
+    
+    @staticmethod
+    def risk_level(churn_prob):
+        return 'High' if churn_prob >= 0.7 else 'Medium' if churn_prob >= 0.4 else 'Low'
+    
+    @staticmethod
+    def _format_prediction(churn_prob):
         churn_prediction = bool(churn_prob >= 0.5)
         
         return {
             'churn_probability': round(churn_prob, 4),
             'churn_prediction': churn_prediction,
-            'risk_level': 'High' if churn_prob >= 0.7 else 'Medium' if churn_prob >= 0.4 else 'Low'
+            'risk_level': ChurnModel.risk_level(churn_prob)
         }
     
-    def get_customers_with_predictions(self):
-        """Get all customers with their churn predictions"""
-        if self.df is None or self.model is None:
-            raise ValueError("Model not trained")
+    def predict_frame(self, df):
+        """Churn probabilities for every row of a customer frame"""
+        return self._predict_proba_frame(df, self._serving_state())
+    
+    def _predict_proba_frame(self, df, state):
+        df_processed = self.preprocess_data(df, is_training=False,
+                                            label_encoders=state.label_encoders,
+                                            codec=state.codec)
         
-        df = self.df.copy()
-        df_processed = self.preprocess_data(df.copy(), is_training=False)
+        X = df_processed[state.feature_columns]
+        X_scaled = state.scaler.transform(X)
         
-        X = df_processed[self.feature_columns]
-        X_scaled = self.scaler.transform(X)
-        
-        probabilities = self.model.predict_proba(X_scaled)[:, 1]
+        return self.scorer.predict_proba(state.engine, state.model_version, X_scaled)
+    
+    def _score_customers(self, df, state):
+        """Score a customer frame and attach churn_probability, risk_level and clv"""
+        df = df.copy(deep=False)
+        probabilities = self._predict_proba_frame(df, state)
         df['churn_probability'] = probabilities
         df['risk_level'] = pd.cut(probabilities, bins=[0, 0.4, 0.7, 1], 
                                   labels=['Low', 'Medium', 'High'])
         
-        # Calculate CLV (simplified: tenure * monthly charges)
-        df['clv'] = df['tenure'] * df['MonthlyCharges']
+        # Calculate CLV (simplified: tenure * monthly charges), in cents
+        # before narrowing so float32 noise does not show up as 2055.1199
+        clv = df['tenure'].to_numpy(np.float64) * df['MonthlyCharges'].to_numpy(np.float64)
+        df['clv'] = np.round(clv, 2).astype(np.float32)
         
         return df
     
+    def get_snapshot(self):
+        """Get the scored customer snapshot for the current model/data version"""
+        if self._df is None or self._serving is None:
+            raise ValueError("Model not trained")
+        
+        version = (self._serving.model_version, self.data_version)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        
+        with self._snapshot_lock:
+            # Another caller may have rebuilt it while we waited
+            previous = self._snapshot
+            state = self._serving
+            with self._data_lock:
+                df, data_version, index = self._merged(), self.data_version, self._customer_index
+                search_index = self._search_index
+                changes = None
+                if previous is not None and previous.model_version == state.model_version:
+                    changes = self._changes_since(previous.data_version)
+            
+            if previous is not None and previous.version == (state.model_version, data_version):
+                return previous
+            
+            if changes is not None:
+                logger.info(f"Rescoring {len(changes)} changed customers for version "
+                            f"{(state.model_version, data_version)}")
+                scored = self._rescore_rows(previous.df, df, changes, state)
+                # Swap the changed rows' old contributions for their new ones
+                removed = previous.df.iloc[changes[changes < len(previous.df)]]
+                added = scored.iloc[changes]
+                segment_cube = previous.segment_cube.updated(removed, added)
+                chart_cube = previous.chart_cube.updated(removed, added)
+            else:
+                logger.info(f"Scoring customer snapshot for version "
+                            f"{(state.model_version, data_version)}")
+                scored = self._score_customers(df, state)
+                segment_cube = SegmentCube(scored)
+                chart_cube = SegmentCube(scored, CHART_DIMENSIONS)
+            
+            snapshot = ScoredSnapshot(
+                df=scored,
+                model_version=state.model_version,
+                data_version=data_version,
+                index=index,
+                search_index=search_index,
+                segment_cube=segment_cube,
+                chart_cube=chart_cube
+            )
+            with self._data_lock:
+                # Published with the pruning, so a reader holding _data_lock
+                # never sees _changed_at pruned past its snapshot
+                self._snapshot = snapshot
+                self._change_log = [entry for entry in self._change_log
+                                    if entry[0] > data_version]
+                self._changed_at = {position: version
+                                    for position, version in self._changed_at.items()
+                                    if version > data_version}
+        return snapshot
+    
+    def _rescore_rows(self, scored_df, df, positions, state):
+        """Patch a scored frame with freshly scored rows at the given positions"""
+        if len(positions) == 0:
+            return scored_df
+        
+        rescored = self._score_customers(df.iloc[positions], state)
+        n_scored = len(scored_df)
+        updated = rescored[positions < n_scored]
+        appended = rescored[positions >= n_scored]
+        
+        result = scored_df.copy(deep=False)
+        # Labels added since scored_df was built extend its categories
+        result = widen_categories(result, df)
+        if len(updated):
+            for col in result.columns:
+                result.loc[updated.index, col] = updated[col]
+        if len(appended):
+            result = pd.concat([result, appended], ignore_index=True)
+        return result
+    
+    def get_customer(self, customer_id):
+        """Get one scored customer by ID, or None if there is no such customer.
+
+        Writes since the last snapshot do not force a new one: a customer
+        changed since then is scored on its own.
+        """
+        snapshot, state = self._snapshot, self._serving
+        if snapshot is None or state is None or snapshot.model_version != state.model_version:
+            snapshot = self.get_snapshot()
+        with self._data_lock:
+            position = self._customer_index.get(customer_id)
+            if position is None:
+                return None
+            # _changed_at only describes changes since the published snapshot
+            if self._snapshot is snapshot and \
+                    self._changed_at.get(position, 0) <= snapshot.data_version:
+                row = None
+            else:
+                row = self._latest_row(position)
+        if row is None:
+            return snapshot.row(position)
+        return _row(_column_arrays(self._score_customers(row, state)), 0)
+    
+    def _latest_row(self, position):
+        """One-row frame of the customer at position as last written; call with _data_lock held"""
+        for positions, rows in reversed(self._pending):
+            matches = np.flatnonzero(positions == position)
+            if len(matches):
+                return rows.iloc[matches[-1:]]
+        return self._df.iloc[[position]]
+    
+    def query_customers(self, filters=None, search=None, sort_by=None, descending=True,
+                        offset=0, limit=20, cursor=None, search_prefix=False):
+        """Filter, sort and page scored customers.
+
+        search matches customer IDs case-insensitively, anywhere in the ID or
+        only at its start if search_prefix.
+
+        Returns (total, rows, next_cursor). Passing a cursor from an earlier
+        call resumes right after the last row it returned; the offset is then
+        counted from that row. Filters and search are not part of the cursor
+        and must be repeated.
+        """
+        snapshot = self.get_snapshot()
+        query_index = snapshot.query_index
+        positions = query_index.filter(filters or {})
+        if search:
+            matches = snapshot.search(search, prefix=search_prefix)
+            positions = (matches if positions is None
+                         else np.intersect1d(positions, matches, assume_unique=True))
+
+        total = query_index.n_rows if positions is None else len(positions)
+        if sort_by not in snapshot.df.columns:
+            sort_by = None
+
+        after = None
+        if cursor is not None:
+            cursor_sort_by, cursor_descending, key, customer_id = decode_cursor(cursor)
+            if (cursor_sort_by, cursor_descending) != (sort_by, descending):
+                raise InvalidCursorError("Cursor was issued for a different sort order")
+            after = (key, customer_id)
+
+        page, has_more = query_index.page(positions, sort_by, descending, offset, limit,
+                                          after=after)
+        next_cursor = None
+        if has_more and len(page):
+            next_cursor = encode_cursor(sort_by, descending,
+                                        *query_index.cursor_for(page[-1], sort_by))
+        return total, [snapshot.row(position) for position in page], next_cursor
+
+    def customer_exporter(self, filters=None, chunk_size=10000):
+        """CustomerExporter over the scored customers matching filters"""
+        snapshot = self.get_snapshot()
+        positions = snapshot.query_index.filter(filters or {})
+        return CustomerExporter(snapshot, positions, chunk_size=chunk_size)
+    
+    def get_customers_with_predictions(self):
+        """Get all customers with their churn predictions"""
+        # Shallow copy: with copy-on-write, column changes made by the caller
+        # never reach the shared snapshot
+        return self.get_snapshot().df.copy(deep=False)
+    
     def get_segment_analysis(self):
         """Get customer segmentation analysis"""
-        df = self.get_customers_with_predictions()
-        
-        segments = []
-        
-        # By Contract Type
-        for contract in df['Contract'].unique():
-            segment_df = df[df['Contract'] == contract]
-            segments.append({
-                'segment_type': 'Contract',
-                'segment_name': contract,
-                'total_customers': len(segment_df),
-                'churn_rate': round((segment_df['Churn'] == 'Yes').mean() * 100, 2),
-                'avg_monthly_charges': round(segment_df['MonthlyCharges'].mean(), 2),
-                'avg_tenure': round(segment_df['tenure'].mean(), 2),
-                'total_mrr': round(segment_df['MonthlyCharges'].sum(), 2),
-                'avg_clv': round(segment_df['clv'].mean(), 2)
-            })
-        
-        # By Internet Service
-        for internet in df['InternetService'].unique():
-            segment_df = df[df['InternetService'] == internet]
-            segments.append({
-                'segment_type': 'InternetService',
-                'segment_name': internet,
-                'total_customers': len(segment_df),
-                'churn_rate': round((segment_df['Churn'] == 'Yes').mean() * 100, 2),
-                'avg_monthly_charges': round(segment_df['MonthlyCharges'].mean(), 2),
-                'avg_tenure': round(segment_df['tenure'].mean(), 2),
-                'total_mrr': round(segment_df['MonthlyCharges'].sum(), 2),
-                'avg_clv': round(segment_df['clv'].mean(), 2)
+        return self.get_snapshot().segment_cube.segments()
+    
+    def get_chart_data(self, by, filters=None):
+        """Chart measures grouped by CHART_DIMENSIONS segment types, see SegmentCube.aggregate"""
+        return self.get_snapshot().chart_cube.aggregate(by, filters)
+    
+    def get_tenure_churn_chart(self, filters=None):
+        """Customers, mean churn probability and churn rate per tenure bucket"""
+        measures, (buckets,) = self.get_chart_data([TENURE_BUCKET.segment_type], filters)
+        chart_data = []
+        for i, bucket in enumerate(buckets):
+            n = measures['customers'][i]
+            if n == 0:
+                continue
+            chart_data.append({
+                'tenure_bucket': bucket,
+                'customers': int(n),
+                'avg_churn_prob': round(float(measures['churn_probability'][i] / n * 100), 2),
+                'actual_churn_rate': round(float(measures['churned'][i] / n * 100), 2)
             })
-        
-        # By Risk Level
-        for risk in ['Low', 'Medium', 'High']:
-            segment_df = df[df['risk_level'] == risk]
-            if len(segment_df) > 0:
-                segments.append({
-                    'segment_type': 'RiskLevel',
-                    'segment_name': risk,
-                    'total_customers': len(segment_df),
-                    'churn_rate': round((segment_df['Churn'] == 'Yes').mean() * 100, 2),
-                    'avg_monthly_charges': round(segment_df['MonthlyCharges'].mean(), 2),
-                    'avg_tenure': round(segment_df['tenure'].mean(), 2),
-                    'total_mrr': round(segment_df['MonthlyCharges'].sum(), 2),
-                    'avg_clv': round(segment_df['clv'].mean(), 2)
-                })
-        
-        return segments
+        return chart_data
+    
+    def get_monthly_charges_chart(self, filters=None):
+        """Retained and churned customers per monthly charges bucket"""
+        measures, (buckets, churn) = self.get_chart_data(
+            [CHARGES_BUCKET.segment_type, 'Churn'], filters)
+        counts = measures['customers']
+        return [{
+            'charges_bucket': bucket,
+            'retained': int(counts[i, churn.index('No')]),
+            'churned': int(counts[i, churn.index('Yes')])
+        } for i, bucket in enumerate(buckets) if counts[i].sum() > 0]
     
     def get_dashboard_stats(self):
         """Get overall dashboard statistics"""
-        df = self.get_customers_with_predictions()
+        # Running sums kept by the snapshot's segment cube
+        cube = self.get_snapshot().segment_cube
+        totals = dict(zip(MEASURES, cube.totals()))
+        risk_counts = cube.counts(RISK_LEVEL)
         
-        total_customers = len(df)
-        churned_customers = (df['Churn'] == 'Yes').sum()
+        total_customers = int(totals['customers'])
+        churned_customers = int(totals['churned'])
         churn_rate = churned_customers / total_customers * 100
         
-        high_risk = (df['risk_level'] == 'High').sum()
-        medium_risk = (df['risk_level'] == 'Medium').sum()
-        low_risk = (df['risk_level'] == 'Low').sum()
-        
         return {
-            'total_customers': int(total_customers),
-            'churned_customers': int(churned_customers),
-            'retained_customers': int(total_customers - churned_customers),
+            'total_customers': total_customers,
+            'churned_customers': churned_customers,
+            'retained_customers': total_customers - churned_customers,
             'churn_rate': round(churn_rate, 2),
             'retention_rate': round(100 - churn_rate, 2),
-            'high_risk_customers': int(high_risk),
-            'medium_risk_customers': int(medium_risk),
-            'low_risk_customers': int(low_risk),
-            'total_mrr': round(df['MonthlyCharges'].sum(), 2),
-            'avg_mrr': round(df['MonthlyCharges'].mean(), 2),
-            'total_clv': round(df['clv'].sum(), 2),
-            'avg_clv': round(df['clv'].mean(), 2),
-            'avg_tenure': round(df['tenure'].mean(), 2),
+            'high_risk_customers': int(risk_counts['High']),
+            'medium_risk_customers': int(risk_counts['Medium']),
+            'low_risk_customers': int(risk_counts['Low']),
+            'total_mrr': round(float(totals['monthly_charges']), 2),
+            'avg_mrr': round(float(totals['monthly_charges'] / total_customers), 2),
+            'total_clv': round(float(totals['clv']), 2),
+            'avg_clv': round(float(totals['clv'] / total_customers), 2),
+            'avg_tenure': round(float(totals['tenure'] / total_customers), 2),
             'model_metrics': self.metrics,
             'feature_importance': dict(list(self.feature_importance.items())[:10])
         }
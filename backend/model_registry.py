@@ -0,0 +1,140 @@
+"""
+ChurnGuard Model Registry - content-hash versioned storage for trained model artifacts
+"""
+import io
+import json
+import hashlib
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FILE = 'artifact.joblib'
+MANIFEST_FILE = 'manifest.json'
+# Artifacts not registered yet; hidden from list_versions like every dot entry
+CANDIDATES_DIR = '.candidates'
+
+# Everything ChurnModel needs to serve predictions without retraining
+ARTIFACT_KEYS = ['model', 'scaler', 'label_encoders', 'feature_columns',
+                 'metrics', 'feature_importance']
+
+
+class ModelRegistry:
+    """Directory of trained model artifacts, one subdirectory per version.
+
+    A version is the SHA-256 of the serialized artifact, so saving the same
+    model twice yields the same version and a corrupted file is detected on
+    load. Saving an existing version again makes it the latest one.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def save(self, artifacts: dict) -> str:
+        """Serialize artifacts and return their content-hash version"""
+        missing = [key for key in ARTIFACT_KEYS if key not in artifacts]
+        if missing:
+            raise ValueError(f"Missing artifact keys: {missing}")
+
+        buffer = io.BytesIO()
+        joblib.dump({key: artifacts[key] for key in ARTIFACT_KEYS}, buffer)
+        payload = buffer.getvalue()
+        digest = hashlib.sha256(payload).hexdigest()
+        version = digest[:16]
+
+        version_dir = self.root / version
+        manifest = self._read_manifest(version_dir)
+        if manifest is not None:
+            # Re-promoted: load_latest must pick it over anything saved since
+            manifest['created_at'] = datetime.now(timezone.utc).isoformat()
+            self._write_manifest(version_dir, manifest)
+            logger.info(f"Model artifact {version} already registered")
+            return version
+
+        # Write into a scratch directory and rename, so readers never see a
+        # half-written version
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.root / f".tmp-{version}-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir()
+        (tmp_dir / ARTIFACT_FILE).write_bytes(payload)
+        manifest = {
+            'version': version,
+            'sha256': digest,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'metrics': artifacts['metrics'],
+            'feature_columns': artifacts['feature_columns']
+        }
+        (tmp_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.replace(tmp_dir, version_dir)
+
+        logger.info(f"Registered model artifact {version}")
+        return version
+
+    def candidate_path(self, name) -> Path:
+        """Scratch file for an artifact that is not a version until save()d"""
+        candidates_dir = self.root / CANDIDATES_DIR
+        candidates_dir.mkdir(parents=True, exist_ok=True)
+        return candidates_dir / f"{name}.joblib"
+
+    def list_versions(self):
+        """List manifests of valid versions, newest first"""
+        if not self.root.exists():
+            return []
+        manifests = []
+        for version_dir in self.root.iterdir():
+            if version_dir.name.startswith('.') or not version_dir.is_dir():
+                continue
+            manifest = self._read_manifest(version_dir)
+            if manifest is not None:
+                manifests.append(manifest)
+        return sorted(manifests, key=lambda m: m['created_at'], reverse=True)
+
+    def load(self, version: str) -> dict:
+        """Load and verify the artifacts of one version"""
+        version_dir = self.root / version
+        manifest = self._read_manifest(version_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"Model version {version} not found")
+
+        payload = (version_dir / ARTIFACT_FILE).read_bytes()
+        if hashlib.sha256(payload).hexdigest() != manifest['sha256']:
+            raise ValueError(f"Model version {version} failed checksum verification")
+
+        artifacts = joblib.load(io.BytesIO(payload))
+        artifacts['version'] = version
+        return artifacts
+
+    def load_latest(self):
+        """Load the newest version that verifies, or None if there is none"""
+        for manifest in self.list_versions():
+            try:
+                return self.load(manifest['version'])
+            except Exception as e:
+                logger.warning(f"Skipping model version {manifest['version']}: {e}")
+        return None
+
+    def prune(self, keep: int = 5):
+        """Delete all but the newest `keep` versions; the newest one is always kept"""
+        for manifest in self.list_versions()[max(keep, 1):]:
+            shutil.rmtree(self.root / manifest['version'], ignore_errors=True)
+
+    def _write_manifest(self, version_dir: Path, manifest):
+        tmp_file = version_dir / f".{MANIFEST_FILE}-{os.getpid()}"
+        tmp_file.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp_file, version_dir / MANIFEST_FILE)
+
+    def _read_manifest(self, version_dir: Path):
+        try:
+            manifest = json.loads((version_dir / MANIFEST_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+        if not (version_dir / ARTIFACT_FILE).is_file():
+            return None
+        return manifest
@@ -0,0 +1,104 @@
+"""
+ChurnGuard Parallel Scoring - score large feature matrices in shards across worker processes
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from inference import InferenceEngine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 100_000
+
+# Engine of the current worker process, set by _init_worker
+_worker_engine = None
+
+
+def _init_worker(booster):
+    global _worker_engine
+    # One core per process: the pool, not the booster, provides the parallelism
+    _worker_engine = InferenceEngine(booster, threads=1)
+
+
+def _score_shard(path, start, stop):
+    """Churn probabilities for rows start:stop of the memory-mapped feature file"""
+    features = np.load(path, mmap_mode='r')
+    return _worker_engine.predict_proba(features[start:stop])
+
+
+class ParallelScorer:
+    """Scores feature matrices in shards of shard_size rows across a process pool.
+
+    The matrix is written once to a memory-mapped .npy file that every worker
+    reads its shards from, so only shard bounds and probabilities cross
+    process boundaries. Features are stored as float32, which is what XGBoost
+    converts them to anyway, so results match scoring in one call bit for bit.
+    Each worker holds its own single-threaded copy of the booster; the pool
+    starts on first use and restarts when the model version changes.
+
+    With one worker, or no more rows than one shard, scoring runs in the
+    calling thread. workers=0 uses one worker per core.
+    """
+
+    def __init__(self, workers=1, shard_size=DEFAULT_SHARD_SIZE, spill_dir=None):
+        if shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        # Where feature files are mapped from; a tmpfs such as /dev/shm keeps them in RAM
+        self.spill_dir = spill_dir
+        self._pool = None
+        self._pool_version = None
+        # One parallel scoring run at a time: it already uses every worker
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context('spawn')
+
+    def predict_proba(self, engine, model_version, features):
+        """Churn probability of every row of features, in row order"""
+        n_rows = len(features)
+        if self.workers <= 1 or n_rows <= self.shard_size:
+            return engine.predict_proba(features)
+
+        with self._lock, tempfile.TemporaryDirectory(dir=self.spill_dir) as spill_dir:
+            path = os.path.join(spill_dir, 'features.npy')
+            mapped = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32,
+                                               shape=features.shape)
+            mapped[:] = features
+            mapped.flush()
+            del mapped
+
+            pool = self._pool_for(engine, model_version)
+            try:
+                shards = [pool.submit(_score_shard, path, start, min(start + self.shard_size, n_rows))
+                          for start in range(0, n_rows, self.shard_size)]
+                return np.concatenate([shard.result() for shard in shards])
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool on the next call
+                self._shutdown_pool()
+                raise
+
+    def _pool_for(self, engine, model_version):
+        if self._pool is None or self._pool_version != model_version:
+            self._shutdown_pool()
+            logger.info(f"Starting {self.workers} scoring workers for model version {model_version}")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                             initializer=_init_worker, initargs=(engine.booster,))
+            self._pool_version = model_version
+        return self._pool
+
+    def _shutdown_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pool_version = None
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown_pool()
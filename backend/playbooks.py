@@ -0,0 +1,129 @@
+"""
+ChurnGuard Playbooks - pre-generate retention recommendations for at-risk customer clusters
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from recommendations import RecommendationProfile, bucket_label
+from segments import CHARGES_BUCKET, TENURE_BUCKET
+
+logger = logging.getLogger(__name__)
+
+# Customer columns reported as services, named as the frontend names them
+SERVICE_COLUMNS = {
+    'OnlineSecurity': 'Online Security',
+    'TechSupport': 'Tech Support',
+    'StreamingTV': 'Streaming TV',
+    'StreamingMovies': 'Streaming Movies',
+}
+
+
+class PlaybookJobInProgressError(RuntimeError):
+    """Raised when a playbook run is requested while another one is running"""
+
+
+def _bucket_labels(values, dimension):
+    """bucket_label of every value, computed once per distinct value"""
+    uniques, inverse = np.unique(np.asarray(values, dtype=np.float64), return_inverse=True)
+    return np.array([bucket_label(value, dimension) for value in uniques], dtype=object)[inverse]
+
+
+def profile_clusters(df, risk_levels=('High',)):
+    """(profile, customers) for every RecommendationProfile among scored customers, largest first"""
+    df = df[df['risk_level'].isin(risk_levels)]
+    services = np.zeros(len(df), dtype=np.int64)
+    for bit, column in enumerate(SERVICE_COLUMNS):
+        services |= (df[column] == 'Yes').to_numpy().astype(np.int64) << bit
+    fields = pd.DataFrame({
+        'risk_level': df['risk_level'].astype(str).to_numpy(),
+        'tenure_bucket': _bucket_labels(df['tenure'], TENURE_BUCKET),
+        'contract': df['Contract'].astype(str).to_numpy(),
+        'charges_bucket': _bucket_labels(df['MonthlyCharges'], CHARGES_BUCKET),
+        'internet_service': df['InternetService'].astype(str).to_numpy(),
+        'services': services,
+    })
+    counts = fields.groupby(list(fields.columns)).size().sort_values(ascending=False, kind='stable')
+
+    names = list(SERVICE_COLUMNS.values())
+    clusters = []
+    for (risk_level, tenure_bucket, contract, charges_bucket, internet_service, bits), n in counts.items():
+        clusters.append((RecommendationProfile(
+            risk_level=risk_level,
+            tenure_bucket=tenure_bucket,
+            contract=contract,
+            charges_bucket=charges_bucket,
+            internet_service=internet_service,
+            services=tuple(sorted(name for bit, name in enumerate(names) if bits >> bit & 1))
+        ), int(n)))
+    return clusters
+
+
+class PlaybookGenerator:
+    """Generates one recommendation per profile cluster ahead of requests.
+
+    Recommendations go through the RecommendationService, so they land in
+    the same cache /api/ai-recommendations answers from, profiles that are
+    still fresh there are skipped, and a live request for a profile being
+    generated shares the call. At most `concurrency` LLM calls run at once.
+    Runs one at a time in the background.
+    """
+
+    def __init__(self, service, concurrency=4, risk_levels=('High',)):
+        self.service = service
+        self.concurrency = concurrency
+        self.risk_levels = tuple(risk_levels)
+        self.status = {'status': 'idle'}
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self, clusters):
+        """Start generating for clusters from profile_clusters in the background"""
+        if self.running:
+            raise PlaybookJobInProgressError("A playbook run is already in progress")
+        self.status = {
+            'status': 'running',
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'clusters': len(clusters),
+            'customers': sum(n for _, n in clusters),
+        }
+        self._task = asyncio.create_task(self._run(clusters))
+        return self.status
+
+    async def _run(self, clusters):
+        try:
+            summary = await self.run(clusters)
+            self.status.update(summary, status='succeeded')
+        except Exception as e:
+            logger.error(f"Playbook run failed: {e}")
+            self.status.update(status='failed', error=f"{type(e).__name__}: {e}")
+        self.status['finished_at'] = datetime.now(timezone.utc).isoformat()
+
+    async def run(self, clusters):
+        """Make sure every cluster has a fresh recommendation; returns counts"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        counts = {'generated': 0, 'already_cached': 0, 'failed': 0}
+
+        async def ensure(profile, n_customers):
+            async with semaphore:
+                try:
+                    _, _, cached = await self.service.for_profile(profile, {
+                        'source': 'playbook',
+                        'risk_level': profile.risk_level,
+                        'customers': n_customers
+                    })
+                except Exception as e:
+                    logger.error(f"Playbook for {profile.key} failed: {e}")
+                    counts['failed'] += 1
+                    return
+            counts['already_cached' if cached else 'generated'] += 1
+
+        await asyncio.gather(*(ensure(profile, n) for profile, n in clusters))
+        logger.info(f"Playbooks for {len(clusters)} clusters: {counts}")
+        return counts
@@ -0,0 +1,385 @@
+"""
+ChurnGuard Recommendations - AI retention recommendations, cached per customer profile
+"""
+import asyncio
+import bisect
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from llm_client import LLMUnavailableError
+from segments import CHARGES_BUCKET, TENURE_BUCKET
+from storage import as_utc
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = ("You are a customer retention expert for a telecommunications company. "
+                 "Analyze customer profiles and provide personalized retention strategies.")
+
+PROMPT_TEMPLATE = """Customer Profile:
+- Risk Level: {risk_level}
+- Tenure: {tenure_bucket} months
+- Contract Type: {contract}
+- Monthly Charges: {charges_bucket}
+- Internet Service: {internet_service}
+- Additional Services: {services}
+
+Based on this profile, provide:
+1. **Risk Assessment**: Brief analysis of why this customer might churn
+2. **Top 3 Retention Strategies**: Specific, actionable recommendations
+3. **Offer Suggestions**: Personalized offers or discounts
+4. **Expected Impact**: Estimated churn reduction if strategies are implemented
+
+Keep your response concise and actionable. Format with clear headers."""
+
+# Served when the LLM is unavailable and the profile has no earlier recommendation
+FALLBACK_RECOMMENDATION = """**Risk Assessment**
+Personalized recommendations are temporarily unavailable, so this is the standard retention playbook.
+
+**Top 3 Retention Strategies**
+1. Contact the customer personally to review their plan and any open issues
+2. Offer a move to a longer contract with a loyalty discount
+3. Add support or security services the customer does not have yet
+
+**Offer Suggestions**
+A discount or service upgrade in line with the customer's monthly charges.
+
+**Expected Impact**
+Request a recommendation again later for one tailored to this customer."""
+
+
+def bucket_label(value, dimension):
+    """Label of the dimension's bin holding value; values outside the bins go to the nearest end"""
+    position = bisect.bisect_left(dimension.bins, value) - 1
+    return dimension.labels[min(max(position, 0), len(dimension.labels) - 1)]
+
+
+@dataclass(frozen=True)
+class RecommendationProfile:
+    """The coarse customer fields a recommendation depends on.
+
+    Tenure and monthly charges are bucketed like the charts bucket them,
+    so customers with near-identical profiles share one recommendation.
+    """
+    risk_level: str
+    tenure_bucket: str
+    contract: str
+    charges_bucket: str
+    internet_service: str
+    services: tuple
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(
+            risk_level=request.risk_level.strip(),
+            tenure_bucket=bucket_label(request.tenure, TENURE_BUCKET),
+            contract=request.contract.strip(),
+            charges_bucket=bucket_label(request.monthly_charges, CHARGES_BUCKET),
+            internet_service=request.internet_service.strip(),
+            services=tuple(sorted({service.strip() for service in request.services
+                                   if service.strip()}))
+        )
+
+    @property
+    def key(self):
+        return '|'.join([self.risk_level, self.tenure_bucket, self.contract,
+                         self.charges_bucket, self.internet_service, ','.join(self.services)])
+
+    def prompt(self):
+        return PROMPT_TEMPLATE.format(
+            risk_level=self.risk_level,
+            tenure_bucket=self.tenure_bucket,
+            contract=self.contract,
+            charges_bucket=self.charges_bucket,
+            internet_service=self.internet_service,
+            services=', '.join(self.services) or 'None'
+        )
+
+
+class RecommendationCache:
+    """Recommendations by profile key, kept for ttl_seconds.
+
+    The most recently used max_entries live in memory; every generated
+    recommendation is also stored in the collection, so misses fall back
+    to it and the cache survives restarts. Stores go through writer (a
+    WriteBuffer) if given, else straight to the collection.
+    """
+
+    def __init__(self, collection, ttl_seconds=86400, max_entries=10000, writer=None):
+        self.collection = collection
+        self.writer = writer
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        # key -> (expires at, on the monotonic clock, recommendation, generated_at)
+        self._entries = OrderedDict()
+
+    async def get(self, key, stale=False):
+        """(recommendation, generated_at) for key, or None if there is none fresh.
+
+        With stale, the newest stored one is returned however old it is.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, recommendation, generated_at = entry
+            if stale or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return recommendation, generated_at
+            del self._entries[key]
+
+        query = {'profile_key': key}
+        if not stale:
+            cutoff = datetime.now(timezone.utc) - self.ttl
+            query['created_at'] = {'$gte': cutoff}
+        try:
+            doc = await self.collection.find_one(
+                query,
+                {'_id': 0, 'recommendation': 1, 'created_at': 1},
+                sort=[('created_at', -1)]
+            )
+        except Exception as e:
+            # Treated as a miss, so a database outage does not fail requests
+            logger.error(f"Error reading cached recommendation: {e}")
+            return None
+        if doc is None:
+            return None
+        generated_at = as_utc(doc['created_at'])
+        if not stale:
+            self._remember(key, doc['recommendation'], generated_at)
+        return doc['recommendation'], generated_at
+
+    async def put(self, key, recommendation, generated_at, doc):
+        """Cache a freshly generated recommendation and store doc with it"""
+        self._remember(key, recommendation, generated_at)
+        doc = {
+            **doc,
+            'profile_key': key,
+            'recommendation': recommendation,
+            'created_at': generated_at
+        }
+        try:
+            if self.writer is not None:
+                await self.writer.insert(doc)
+            else:
+                await self.collection.insert_one(doc)
+        except Exception as e:
+            # Still cached in memory; only restarts lose it
+            logger.error(f"Error storing recommendation: {e}")
+
+    def _remember(self, key, recommendation, generated_at):
+        age = (datetime.now(timezone.utc) - generated_at).total_seconds()
+        expires_at = time.monotonic() + self.ttl.total_seconds() - age
+        self._entries[key] = (expires_at, recommendation, generated_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _TokenBroadcast:
+    """Tokens of one upstream stream, which any number of readers follow from the start"""
+
+    def __init__(self):
+        self.tokens = []
+        self.finished = False
+        self._changed = asyncio.Event()
+
+    def push(self, token):
+        self.tokens.append(token)
+        self._notify()
+
+    def finish(self):
+        self.finished = True
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self):
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.tokens):
+                yield self.tokens[position]
+                position += 1
+            if self.finished:
+                return
+            await changed.wait()
+
+
+class RecommendationService:
+    """Answers recommendation requests from the cache, generating on a miss.
+
+    generate is an async callable (system_prompt, prompt) -> text and
+    stream_generate, if given, one returning an async iterator of text
+    chunks, so any LLM, or a stub, can back the service. Concurrent
+    requests for the same profile share one upstream call; failed calls
+    are not cached. While the LLM is unavailable (LLMUnavailableError),
+    requests get the profile's last recommendation however old, else
+    FALLBACK_RECOMMENDATION, marked degraded.
+    """
+
+    def __init__(self, generate, cache, stream_generate=None):
+        self.generate = generate
+        self.stream_generate = stream_generate
+        self.cache = cache
+        self._in_flight = {}
+        self._streams = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._degraded = 0
+
+    async def recommend(self, request):
+        """{'recommendation', 'generated_at', 'cached', 'degraded'} for an AIRecommendationRequest"""
+        profile = RecommendationProfile.from_request(request)
+        try:
+            recommendation, generated_at, cached = await self.for_profile(profile, {
+                'customer_id': request.customer_id,
+                'churn_probability': request.churn_probability,
+                'risk_level': request.risk_level
+            })
+        except LLMUnavailableError as e:
+            return await self._degraded_response(profile, e)
+        return self._response(recommendation, generated_at, cached)
+
+    async def for_profile(self, profile, doc):
+        """(recommendation, generated_at, cached) for profile.
+
+        doc holds extra fields stored with the recommendation if it has to
+        be generated.
+        """
+        key = profile.key
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self._hits += 1
+            recommendation, generated_at = cached
+            return recommendation, generated_at, True
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self._misses += 1
+            task = self._start(key, self._generate(profile, doc))
+        else:
+            self._coalesced += 1
+        # Shielded: one caller disconnecting must not cancel the shared call
+        recommendation, generated_at = await asyncio.shield(task)
+        return recommendation, generated_at, False
+
+    async def stream(self, request):
+        """Yield ('token', text) as the recommendation for a request is generated,
+        then ('done', {'generated_at', 'cached', 'degraded'}).
+
+        A cached recommendation comes as a single token. A request joining a
+        stream already under way for its profile replays the tokens so far.
+        """
+        profile = RecommendationProfile.from_request(request)
+        key = profile.key
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self._hits += 1
+            recommendation, generated_at = cached
+            yield 'token', recommendation
+            yield 'done', {'generated_at': generated_at.isoformat(), 'cached': True,
+                           'degraded': False}
+            return
+
+        task = self._in_flight.get(key)
+        broadcast = self._streams.get(key)
+        if task is None:
+            self._misses += 1
+            broadcast = self._streams[key] = _TokenBroadcast()
+            task = self._start(key, self._generate_streaming(profile, {
+                'customer_id': request.customer_id,
+                'churn_probability': request.churn_probability,
+                'risk_level': request.risk_level
+            }, broadcast))
+        else:
+            self._coalesced += 1
+
+        sent = False
+        try:
+            if broadcast is not None:
+                async for token in broadcast.follow():
+                    sent = True
+                    yield 'token', token
+            recommendation, generated_at = await asyncio.shield(task)
+        except LLMUnavailableError as e:
+            if sent:
+                raise
+            response = await self._degraded_response(profile, e)
+            yield 'token', response.pop('recommendation')
+            yield 'done', response
+            return
+        if broadcast is None:
+            # Joined a non-streaming call for the same profile
+            yield 'token', recommendation
+        yield 'done', {'generated_at': generated_at.isoformat(), 'cached': False,
+                       'degraded': False}
+
+    def _start(self, key, generation):
+        task = asyncio.ensure_future(generation)
+        self._in_flight[key] = task
+
+        def finished(_):
+            self._in_flight.pop(key, None)
+            self._streams.pop(key, None)
+        task.add_done_callback(finished)
+        return task
+
+    async def _generate(self, profile, doc):
+        recommendation = await self.generate(SYSTEM_PROMPT, profile.prompt())
+        generated_at = datetime.now(timezone.utc)
+        await self.cache.put(profile.key, recommendation, generated_at, doc)
+        return recommendation, generated_at
+
+    async def _generate_streaming(self, profile, doc, broadcast):
+        """_generate, pushing text to broadcast as it arrives; stored once complete"""
+        try:
+            if self.stream_generate is None:
+                broadcast.push(await self.generate(SYSTEM_PROMPT, profile.prompt()))
+            else:
+                async for token in self.stream_generate(SYSTEM_PROMPT, profile.prompt()):
+                    if token:
+                        broadcast.push(token)
+        finally:
+            broadcast.finish()
+        recommendation = ''.join(broadcast.tokens)
+        generated_at = datetime.now(timezone.utc)
+        await self.cache.put(profile.key, recommendation, generated_at, doc)
+        return recommendation, generated_at
+
+    async def _degraded_response(self, profile, error):
+        self._degraded += 1
+        logger.warning(f"Serving a degraded recommendation for {profile.key}: {error}")
+        stale = await self.cache.get(profile.key, stale=True)
+        if stale is not None:
+            recommendation, generated_at = stale
+            return self._response(recommendation, generated_at, cached=True, degraded=True)
+        return self._response(FALLBACK_RECOMMENDATION, datetime.now(timezone.utc),
+                              cached=False, degraded=True)
+
+    @staticmethod
+    def _response(recommendation, generated_at, cached, degraded=False):
+        return {
+            'recommendation': recommendation,
+            'generated_at': generated_at.isoformat(),
+            'cached': cached,
+            'degraded': degraded
+        }
+
+    def metrics(self):
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'coalesced': self._coalesced,
+            'degraded': self._degraded,
+            'in_flight': len(self._in_flight),
+            'cached_profiles': len(self.cache),
+            'ttl_seconds': self.cache.ttl.total_seconds(),
+            'max_entries': self.cache.max_entries
+        }
@@ -0,0 +1,221 @@
+"""
+ChurnGuard Scalar Predictor - single-customer scoring without pandas, sklearn or a booster call
+"""
+import ctypes
+import ctypes.util
+import json
+import logging
+import math
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows checked against the booster before a TreeEnsemble is trusted
+VERIFY_ROWS = 256
+
+
+def _load_libm():
+    """The C library's expf and logf, which XGBoost's sigmoid uses; None if unavailable"""
+    try:
+        libm = ctypes.CDLL(ctypes.util.find_library('m'))
+        functions = libm.expf, libm.logf
+    except (OSError, TypeError, AttributeError):
+        return None
+    for function in functions:
+        function.restype = ctypes.c_float
+        function.argtypes = [ctypes.c_float]
+    return functions
+
+
+_LIBM = _load_libm()
+
+
+class TreeEnsemble:
+    """A binary:logistic booster's trees as flat NumPy arrays, for scoring one row.
+
+    A booster call costs a couple of hundred microseconds however small the
+    input, almost all of it fixed overhead. Here every tree descends one
+    level per step, all trees at once, so a row takes max_depth vectorized
+    steps. Splits compare float32 values like XGBoost, leaves are summed in
+    tree order in float32 and the sigmoid uses the C library's expf, so
+    results match the booster bit for bit; from_booster() checks that on
+    random rows and returns None for anything it cannot reproduce.
+    """
+
+    def __init__(self, trees, base_score):
+        n_nodes = sum(len(tree['left_children']) for tree in trees)
+        self.roots = np.zeros(len(trees), dtype=np.int64)
+        # Leaves point at themselves, so extra steps leave them in place
+        self.left = np.arange(n_nodes, dtype=np.int64)
+        self.right = np.arange(n_nodes, dtype=np.int64)
+        self.feature = np.zeros(n_nodes, dtype=np.int64)
+        self.threshold = np.full(n_nodes, np.inf, dtype=np.float32)
+        self.value = np.zeros(n_nodes, dtype=np.float32)
+        self.default_left = np.zeros(n_nodes, dtype=bool)
+        self.depth = 0
+
+        offset = 0
+        for i, tree in enumerate(trees):
+            if any(tree['split_type']):
+                raise ValueError("Categorical splits are not supported")
+            left = np.asarray(tree['left_children'], dtype=np.int64)
+            right = np.asarray(tree['right_children'], dtype=np.int64)
+            nodes = slice(offset, offset + len(left))
+            split = left >= 0
+            # Leaves keep their value in split_conditions
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+            self.roots[i] = offset
+            self.left[nodes][split] = left[split] + offset
+            self.right[nodes][split] = right[split] + offset
+            self.feature[nodes] = tree['split_indices']
+            self.threshold[nodes][split] = conditions[split]
+            self.value[nodes] = conditions
+            self.default_left[nodes] = np.asarray(tree['default_left'], dtype=bool)
+            self.depth = max(self.depth, _tree_depth(left, right))
+            offset += len(left)
+
+        # With the right child next to the left one, a split is left + (x >= threshold)
+        self._adjacent = bool(np.all(self.right[self.left != np.arange(n_nodes)]
+                                     == self.left[self.left != np.arange(n_nodes)] + 1))
+        expf, logf = _LIBM
+        self.expf = expf
+        # XGBoost starts every row at the base score's margin, in float32
+        self.base_margin = np.float32(-logf(float(np.float32(1) / np.float32(base_score)
+                                                    - np.float32(1))))
+
+    @classmethod
+    def from_booster(cls, booster, n_features, seed=0):
+        """Ensemble of booster, or None if its output cannot be reproduced exactly"""
+        if _LIBM is None:
+            return None
+        try:
+            model = json.loads(booster.save_raw('json'))['learner']
+            if model['objective']['name'] != 'binary:logistic':
+                return None
+            base_score = json.loads(model['learner_model_param']['base_score'])
+            base_score = base_score[0] if isinstance(base_score, list) else float(base_score)
+            ensemble = cls(model['gradient_booster']['model']['trees'], base_score)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.info(f"Scoring single rows with the booster: {e}")
+            return None
+
+        rng = np.random.default_rng(seed)
+        X = rng.normal(size=(VERIFY_ROWS, n_features))
+        X[rng.random(X.shape) < 0.05] = np.nan
+        expected = booster.inplace_predict(X.astype(np.float32), validate_features=False)
+        if any(ensemble.predict_proba(row) != float(p) for row, p in zip(X, expected)):
+            logger.warning("Tree ensemble does not match the booster; scoring single rows with the booster")
+            return None
+        return ensemble
+
+    def predict_proba(self, x) -> float:
+        """Churn probability of one feature vector"""
+        x = np.asarray(x, dtype=np.float32)
+        node = self.roots
+        if self._adjacent and np.isfinite(x).all():
+            for _ in range(self.depth):
+                node = self.left[node] + (x[self.feature[node]] >= self.threshold[node])
+        else:
+            for _ in range(self.depth):
+                values = x[self.feature[node]]
+                go_left = np.where(np.isnan(values), self.default_left[node],
+                                   values < self.threshold[node])
+                node = np.where(go_left, self.left[node], self.right[node])
+
+        sums = np.empty(len(node) + 1, dtype=np.float32)
+        sums[0] = self.base_margin
+        sums[1:] = self.value[node]
+        # cumsum adds in order, as the booster does
+        margin = float(np.cumsum(sums, dtype=np.float32)[-1])
+        return float(np.float32(1) / (np.float32(self.expf(-margin)) + np.float32(1)))
+
+
+def _tree_depth(left, right):
+    depth, level = 0, [0]
+    while True:
+        level = [child for node in level if left[node] >= 0
+                 for child in (left[node], right[node])]
+        if not level:
+            return depth
+        depth += 1
+
+
+class ScalarPredictor:
+    """Turns one customer record into a scaled feature vector and scores it.
+
+    Categorical features are looked up in tables that already hold the
+    scaled value of every known label; numeric features are scaled with the
+    fitted mean and scale. Both use the same float64 operations as
+    StandardScaler.transform, so the booster sees exactly the vector the
+    DataFrame path would have built. Single vectors are scored by a
+    TreeEnsemble of the booster where one reproduces it, else, like lists
+    of them, by the InferenceEngine.
+    """
+
+    def __init__(self, engine, scaler, codec, feature_columns):
+        self.engine = engine
+        self.feature_columns = list(feature_columns)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(len(feature_columns))
+        scale = scaler.scale_ if scaler.with_std else np.ones(len(feature_columns))
+        self.mean = [float(m) for m in mean]
+        self.scale = [float(s) for s in scale]
+
+        # Scaled value per known label, and the code-0 value used for unseen labels
+        self.tables = {}
+        self.fallbacks = {}
+        for i, col in enumerate(self.feature_columns):
+            if col in codec.classes:
+                classes = codec.classes[col]
+                scaled = (np.arange(len(classes), dtype=np.float64) - mean[i]) / scale[i]
+                self.tables[col] = dict(zip(classes.tolist(), scaled.tolist()))
+                self.fallbacks[col] = float(scaled[0])
+
+        self.ensemble = TreeEnsemble.from_booster(engine.booster, len(self.feature_columns))
+        self._local = threading.local()
+
+    def _buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, len(self.feature_columns)), dtype=np.float64)
+        return buffer
+
+    def vectorize(self, customer_data: dict, out=None) -> np.ndarray:
+        """Fill a (1, n_features) float64 row with the scaled features"""
+        row = self._buffer() if out is None else out
+        tables, fallbacks = self.tables, self.fallbacks
+        for i, col in enumerate(self.feature_columns):
+            value = customer_data[col]
+            table = tables.get(col)
+            if table is not None:
+                try:
+                    row[0, i] = table.get(value, fallbacks[col])
+                except TypeError:
+                    # Unhashable label, cannot be a known class
+                    row[0, i] = fallbacks[col]
+            else:
+                row[0, i] = (_to_float(value) - self.mean[i]) / self.scale[i]
+        return row
+
+    def predict_proba(self, customer_data: dict) -> float:
+        """Churn probability for one customer"""
+        row = self.vectorize(customer_data)
+        if self.ensemble is not None:
+            return self.ensemble.predict_proba(row[0])
+        return float(self.engine.predict_proba(row)[0])
+
+    def predict_proba_many(self, records) -> np.ndarray:
+        """Churn probabilities for a list of customers in one booster call"""
+        X = np.empty((len(records), len(self.feature_columns)), dtype=np.float64)
+        for i, customer_data in enumerate(records):
+            self.vectorize(customer_data, out=X[i:i + 1])
+        return self.engine.predict_proba(X)
+
+
+def _to_float(value):
+    """float() with pd.to_numeric(errors='coerce') semantics for bad input"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
@@ -0,0 +1,215 @@
+"""
+ChurnGuard Segments - grouped business metrics over the scored customer table
+"""
+import copy
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class SegmentDimension:
+    """One way of splitting customers into segments.
+
+    Rows are grouped by the values of column, or by the bins of it when bins
+    is given. Segments are listed in the given order, else in order of first
+    appearance; values outside order and missing values form no segment.
+    """
+    segment_type: str
+    column: str
+    bins: Optional[tuple] = None
+    labels: Optional[tuple] = None
+    order: Optional[tuple] = None
+
+    def values(self, df):
+        """Segment value of every row of df"""
+        values = df[self.column]
+        if self.bins is not None:
+            values = pd.cut(values, bins=list(self.bins), labels=list(self.labels))
+        return values
+
+    def factorize(self, df):
+        """(codes, names) for every row of df; code -1 for rows in no segment"""
+        values = self.values(df)
+        if self.order is not None:
+            return pd.Categorical(values, categories=list(self.order)).codes, list(self.order)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return values.cat.codes.to_numpy(), list(values.cat.categories)
+        codes, uniques = pd.factorize(values)
+        return codes, list(uniques)
+
+
+RISK_LEVEL = SegmentDimension('RiskLevel', 'risk_level', order=('Low', 'Medium', 'High'))
+
+# Segment types reported by /api/segments. Each is one axis of the cube, so
+# adding one (e.g. SegmentDimension('PaymentMethod', 'PaymentMethod') or
+# SegmentDimension('TenureBand', 'tenure', bins=(0, 12, 24, 72),
+# labels=('0-12', '13-24', '25-72'))) costs no extra pass over the table.
+# The dashboard reads its risk counts from the RISK_LEVEL axis.
+SEGMENT_DIMENSIONS = (
+    SegmentDimension('Contract', 'Contract'),
+    SegmentDimension('InternetService', 'InternetService'),
+    RISK_LEVEL,
+)
+
+# Dimensions of the chart cube, named after the filter keys /api/customers
+# uses so chart endpoints can take the same filters
+TENURE_BUCKET = SegmentDimension('tenure_bucket', 'tenure', bins=(0, 12, 24, 36, 48, 60, 72),
+                                 labels=('0-12', '13-24', '25-36', '37-48', '49-60', '61-72'))
+CHARGES_BUCKET = SegmentDimension('charges_bucket', 'MonthlyCharges', bins=(0, 30, 50, 70, 90, 120),
+                                  labels=('$0-30', '$30-50', '$50-70', '$70-90', '$90+'))
+CHART_DIMENSIONS = (
+    TENURE_BUCKET,
+    CHARGES_BUCKET,
+    SegmentDimension('Contract', 'Contract'),
+    SegmentDimension('InternetService', 'InternetService'),
+    SegmentDimension('risk_level', 'risk_level', order=('Low', 'Medium', 'High')),
+    SegmentDimension('Churn', 'Churn', order=('No', 'Yes')),
+)
+
+# Per-row quantities summed in every cell
+MEASURES = ('customers', 'churned', 'monthly_charges', 'tenure', 'clv', 'churn_probability')
+
+MAX_CUBE_CELLS = 1_000_000
+
+
+class SegmentCube:
+    """Measures summed over every combination of segment dimension values.
+
+    Rows are mapped to one combined code across all dimensions and summed
+    with a weighted bincount per measure, so the table is aggregated once
+    however many dimensions there are. Each axis has one extra slot for rows
+    in no segment of that dimension, which keeps those rows in the other
+    dimensions' totals. A dimension's segments are the cube's marginals on
+    its axis.
+    """
+
+    def __init__(self, df, dimensions=SEGMENT_DIMENSIONS):
+        self.dimensions = tuple(dimensions)
+        self.names = []
+        codes = []
+        for dim in self.dimensions:
+            dim_codes, names = dim.factorize(df)
+            self.names.append(names)
+            codes.append(dim_codes)
+        self.cells = self._aggregate(df, codes)
+
+    def _aggregate(self, df, codes):
+        """Measures of df summed into a cube of this cube's shape"""
+        shape = [len(names) + 1 for names in self.names]
+        size = int(np.prod(shape))
+        if size > MAX_CUBE_CELLS:
+            raise ValueError(f"Segment dimensions span {size} cells, more than {MAX_CUBE_CELLS}")
+
+        combined = np.zeros(len(df), dtype=np.int64)
+        for dim_codes, n_slots in zip(codes, shape):
+            combined = combined * n_slots + np.where(dim_codes < 0, n_slots - 1, dim_codes)
+
+        weights = {
+            'customers': None,
+            'churned': (df['Churn'] == 'Yes').to_numpy(dtype=np.float64),
+            'monthly_charges': df['MonthlyCharges'].to_numpy(dtype=np.float64),
+            'tenure': df['tenure'].to_numpy(dtype=np.float64),
+            'clv': df['clv'].to_numpy(dtype=np.float64),
+            'churn_probability': df['churn_probability'].to_numpy(dtype=np.float64),
+        }
+        return np.stack([
+            np.bincount(combined, weights=weights[measure], minlength=size)
+            for measure in MEASURES
+        ]).reshape(len(MEASURES), *shape)
+
+    def updated(self, removed, added):
+        """New cube with the rows of removed taken out and the rows of added put in.
+
+        Used to replace changed rows: removed holds their old values and added
+        the new ones, so the cost follows the number of changed rows. Values
+        not seen before become new segments unless the dimension has a fixed
+        order.
+        """
+        cube = copy.copy(self)
+        cube.names = [list(names) for names in self.names]
+        cells = self.cells
+        values = []
+        for axis, dim in enumerate(self.dimensions):
+            dim_values = [pd.Series(dim.values(frame), dtype=object) for frame in (removed, added)]
+            values.append(dim_values)
+            if dim.order is not None:
+                continue
+            unseen = pd.Index(pd.concat(dim_values).dropna().unique()).difference(
+                cube.names[axis], sort=False)
+            if len(unseen):
+                # New segments go in before the no-segment slot
+                cells = np.insert(cells, [len(cube.names[axis])] * len(unseen), 0, axis=axis + 1)
+                cube.names[axis].extend(unseen)
+
+        indexes = [pd.Index(names, dtype=object) for names in cube.names]
+        removed_codes = [index.get_indexer(v[0]) for index, v in zip(indexes, values)]
+        added_codes = [index.get_indexer(v[1]) for index, v in zip(indexes, values)]
+        cube.cells = (cells - cube._aggregate(removed, removed_codes)
+                      + cube._aggregate(added, added_codes))
+        return cube
+
+    def totals(self):
+        """Measures summed over all rows, in MEASURES order"""
+        return self.cells.reshape(len(MEASURES), -1).sum(axis=1)
+
+    def counts(self, dimension):
+        """Customers per segment of dimension, by segment name"""
+        axis = self.dimensions.index(dimension)
+        return dict(zip(self.names[axis], self.marginal(axis)[MEASURES.index('customers')]))
+
+    def marginal(self, axis):
+        """Measures per segment of the dimension at axis, shape (measures, segments)"""
+        other_axes = tuple(i + 1 for i in range(len(self.dimensions)) if i != axis)
+        return self.cells.sum(axis=other_axes)[:, :-1]
+
+    def aggregate(self, by=(), filters=None):
+        """Measures grouped by the dimensions named in by, over rows matching filters.
+
+        by and the keys of filters are segment types; filters with an empty
+        value are ignored. Returns a dict of measure name to an array with one
+        axis per by dimension, and the segment names along each of them.
+        """
+        types = [dim.segment_type for dim in self.dimensions]
+        cells = self.cells
+        for segment_type, value in (filters or {}).items():
+            if not value:
+                continue
+            axis = types.index(segment_type)
+            keep = np.zeros(cells.shape[axis + 1])
+            if value in self.names[axis]:
+                keep[self.names[axis].index(value)] = 1
+            cells = cells * keep.reshape([-1 if i == axis + 1 else 1 for i in range(cells.ndim)])
+
+        by_axes = [types.index(segment_type) for segment_type in by]
+        cells = cells.sum(axis=tuple(i + 1 for i in range(len(self.dimensions))
+                                     if i not in by_axes))
+        # Put the by axes in the requested order and drop their no-segment slots
+        kept_order = sorted(by_axes)
+        cells = np.moveaxis(cells, [1 + kept_order.index(axis) for axis in by_axes],
+                            range(1, len(by_axes) + 1))
+        cells = cells[(slice(None),) + (slice(None, -1),) * len(by_axes)]
+        return dict(zip(MEASURES, cells)), [self.names[axis] for axis in by_axes]
+
+    def segments(self):
+        """Segment rows in /api/segments format, dimension by dimension"""
+        segments = []
+        for axis, dim in enumerate(self.dimensions):
+            customers, churned, monthly_charges, tenure, clv, _ = self.marginal(axis)
+            for code, name in enumerate(self.names[axis]):
+                n = customers[code]
+                if n == 0:
+                    continue
+                segments.append({
+                    'segment_type': dim.segment_type,
+                    'segment_name': name,
+                    'total_customers': int(n),
+                    'churn_rate': round(float(churned[code] / n * 100), 2),
+                    'avg_monthly_charges': round(float(monthly_charges[code] / n), 2),
+                    'avg_tenure': round(float(tenure[code] / n), 2),
+                    'total_mrr': round(float(monthly_charges[code]), 2),
+                    'avg_clv': round(float(clv[code] / n), 2)
+                })
+        return segments
@@ -1,8 +1,10 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import json
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
@@ -10,18 +12,160 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone
 from ml_model import churn_model
+from data_sources import open_data_source
+from parallel_scoring import ParallelScorer
+from indexes import InvalidCursorError
+from model_registry import ModelRegistry
+from training_jobs import TrainingJobManager, TrainingInProgressError
+from batching import MicroBatcher, BatcherOverloadedError
+from executors import BoundedExecutor, ExecutorOverloadedError
+from batch_scoring import BatchScorer, DuplexStreamingResponse, INPUT_FORMATS
+from exports import EXPORT_FORMATS
+from llm_client import CircuitBreaker, LLMClient
+from recommendations import RecommendationCache, RecommendationService
+from playbooks import PlaybookGenerator, PlaybookJobInProgressError, profile_clusters
+from storage import WriteBuffer, WriteBufferOverloadedError, ensure_indexes, newest_first_page
 import pandas as pd
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; dates come back as aware UTC datetimes
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+    maxIdleTimeMS=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '0')) or None,
+    waitQueueTimeoutMS=int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '0')) or None,
+    serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000'))
+)
 db = client[os.environ['DB_NAME']]
 
+# Status checks and generated recommendations are written behind the
+# request, in batches with one insert_many each
+def write_buffer(collection):
+    return WriteBuffer(
+        collection,
+        max_batch_size=int(os.environ.get('MONGO_WRITE_BATCH_SIZE', '500')),
+        max_wait_ms=float(os.environ.get('MONGO_WRITE_WAIT_MS', '0')),
+        max_queue_size=int(os.environ.get('MONGO_WRITE_QUEUE_SIZE', '10000'))
+    )
+
+status_writer = write_buffer(db.status_checks)
+recommendation_writer = write_buffer(db.ai_recommendations)
+
+# Customer table: 'synthetic' demo data, the embedded 'sample', or a
+# CSV/Parquet/Arrow file path
+churn_model.data_source = open_data_source(os.environ.get('CUSTOMER_DATA_SOURCE'))
+churn_model.max_training_rows = int(os.environ.get('MAX_TRAINING_ROWS', '1000000'))
+# Full-table scoring across worker processes; 1 scores inline, 0 uses every core
+churn_model.scorer = ParallelScorer(
+    workers=int(os.environ.get('SCORING_WORKERS', '1')),
+    shard_size=int(os.environ.get('SCORING_SHARD_SIZE', '100000')),
+    spill_dir=os.environ.get('SCORING_SPILL_DIR')
+)
+
+# Trained model artifacts
+model_registry = ModelRegistry(os.environ.get('MODEL_REGISTRY_DIR', ROOT_DIR / 'model_registry'))
+training_jobs = TrainingJobManager(
+    churn_model, model_registry,
+    min_roc_auc=float(os.environ.get('RETRAIN_MIN_ROC_AUC', '0.5')),
+    keep_versions=int(os.environ.get('MODEL_REGISTRY_KEEP', '5'))
+)
+
+# Concurrent /predict calls are scored together
+predict_batcher = MicroBatcher(
+    churn_model.predict_batch,
+    max_batch_size=int(os.environ.get('PREDICT_BATCH_MAX_SIZE', '64')),
+    max_wait_ms=float(os.environ.get('PREDICT_BATCH_WAIT_MS', '0')),
+    max_queue_size=int(os.environ.get('PREDICT_BATCH_QUEUE_SIZE', '10000'))
+)
+
+# CPU-bound model calls run off the event loop, on a pool per endpoint
+# class: customer lookups on one, whole-table reports, exports, upserts and
+# batch scoring on another, so heavy work never starves the cheap endpoints.
+# Requests beyond a pool's workers plus queue get a 503.
+lookup_executor = BoundedExecutor(
+    'lookup',
+    max_workers=int(os.environ.get('LOOKUP_WORKERS', '4')),
+    max_queue=int(os.environ.get('LOOKUP_QUEUE_SIZE', '64'))
+)
+analytics_executor = BoundedExecutor(
+    'analytics',
+    max_workers=int(os.environ.get('ANALYTICS_WORKERS', '2')),
+    max_queue=int(os.environ.get('ANALYTICS_QUEUE_SIZE', '8'))
+)
+
+# One chat model and pooled HTTP client for every LLM call, with bounded
+# concurrency, per-call deadlines, retries and a circuit breaker
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '8'))
+llm_http_client = httpx.AsyncClient(limits=httpx.Limits(
+    max_connections=LLM_MAX_CONCURRENCY,
+    max_keepalive_connections=LLM_MAX_CONCURRENCY,
+    keepalive_expiry=60
+))
+
+def create_chat_model():
+    return ChatOpenAI(
+        model=os.environ.get('AI_RECOMMENDATION_MODEL', 'gpt-4o'),
+        api_key=os.environ.get('OPENAI_API_KEY'),
+        base_url=os.environ.get('OPENAI_BASE_URL'),
+        temperature=0.7,
+        http_async_client=llm_http_client,
+        # Retries and deadlines are LLMClient's
+        max_retries=0
+    )
+
+llm_client = LLMClient(
+    create_chat_model,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    timeout=float(os.environ.get('LLM_TIMEOUT_SECONDS', '30')),
+    max_retries=int(os.environ.get('LLM_MAX_RETRIES', '2')),
+    backoff=float(os.environ.get('LLM_RETRY_BACKOFF_SECONDS', '0.5')),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('LLM_BREAKER_FAILURES', '5')),
+        reset_timeout=float(os.environ.get('LLM_BREAKER_RESET_SECONDS', '30'))
+    )
+)
+
+def recommendation_messages(system_prompt, user_prompt):
+    return [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)]
+
+async def generate_recommendation(system_prompt, user_prompt):
+    """One LLM completion for a recommendation prompt"""
+    return await llm_client.complete(recommendation_messages(system_prompt, user_prompt))
+
+def stream_recommendation(system_prompt, user_prompt):
+    """The LLM completion for a recommendation prompt, chunk by chunk as it is generated"""
+    return llm_client.stream(recommendation_messages(system_prompt, user_prompt))
+
+# AI recommendations depend only on a coarse customer profile, so they are
+# cached per profile (in memory and in db.ai_recommendations) and
+# concurrent requests for one profile share a single LLM call
+recommendation_service = RecommendationService(
+    generate_recommendation,
+    RecommendationCache(
+        db.ai_recommendations,
+        ttl_seconds=float(os.environ.get('AI_RECOMMENDATION_TTL_SECONDS', '86400')),
+        max_entries=int(os.environ.get('AI_RECOMMENDATION_CACHE_SIZE', '10000')),
+        writer=recommendation_writer
+    ),
+    stream_generate=stream_recommendation
+)
+
+# Recommendations pre-generated for every profile cluster of at-risk
+# customers, so the recommendation endpoint rarely has to call the LLM live
+playbook_generator = PlaybookGenerator(
+    recommendation_service,
+    concurrency=int(os.environ.get('AI_PLAYBOOK_CONCURRENCY', '4')),
+    risk_levels=os.environ.get('AI_PLAYBOOK_RISK_LEVELS', 'High').split(',')
+)
+
 # Create the main app without a prefix
 app = FastAPI(title="ChurnGuard AI API")
 
@@ -31,6 +175,8 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    # The /api/status page cursor
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Create a router with the /api prefix
@@ -65,6 +211,10 @@ class CustomerPredictionRequest(BaseModel):
     MonthlyCharges: float = 50.0
     TotalCharges: float = 600.0
 
+class CustomerRecord(CustomerPredictionRequest):
+    customerID: str
+    Churn: str = "No"
+
 class AIRecommendationRequest(BaseModel):
     customer_id: Optional[str] = None
     churn_probability: float
@@ -87,15 +237,37 @@ class StatusCheckCreate(BaseModel):
 # Initialize model on startup
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Training ChurnGuard ML model...")
+    await predict_batcher.start()
+    await status_writer.start()
+    await recommendation_writer.start()
     try:
-        metrics = churn_model.train()
-        logger.info(f"Model trained successfully. Metrics: {metrics}")
+        await ensure_indexes(db)
     except Exception as e:
-        logger.error(f"Failed to train model: {e}")
+        logger.error(f"Failed to create indexes: {e}")
+    logger.info("Loading ChurnGuard ML model...")
+    force_retrain = os.environ.get('FORCE_RETRAIN', 'false').lower() in ('1', 'true', 'yes')
+    try:
+        artifacts = None if force_retrain else model_registry.load_latest()
+        if artifacts is not None:
+            churn_model.load_artifacts(artifacts)
+            logger.info(f"Model {churn_model.artifact_version} loaded. Metrics: {churn_model.metrics}")
+        else:
+            # Serve (and answer health checks) while the first model trains
+            job = training_jobs.submit()
+            logger.info(f"No model artifact to load, started training job {job.id}")
+    except Exception as e:
+        logger.error(f"Failed to load model: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await predict_batcher.stop()
+    await status_writer.stop()
+    await recommendation_writer.stop()
+    training_jobs.shutdown()
+    churn_model.scorer.shutdown()
+    lookup_executor.shutdown()
+    analytics_executor.shutdown()
+    await llm_http_client.aclose()
     client.close()
 
 # API Routes
@@ -107,8 +279,10 @@ async def root():
 async def get_dashboard_stats():
     """Get overall dashboard statistics"""
     try:
-        stats = churn_model.get_dashboard_stats()
+        stats = await analytics_executor.run(churn_model.get_dashboard_stats)
         return stats
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting dashboard stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -121,35 +295,35 @@ async def get_customers(
     contract: Optional[str] = Query(None),
     internet_service: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
+    search_prefix: bool = Query(False),
     sort_by: str = Query("churn_probability"),
-    sort_order: str = Query("desc")
+    sort_order: str = Query("desc"),
+    cursor: Optional[str] = Query(None)
 ):
-    """Get paginated list of customers with predictions"""
+    """Get paginated list of customers with predictions.
+
+    Every page carries a next_cursor; passing it back as cursor (with the
+    same filters and sort) fetches the following page without counting
+    through the ones before it.
+    """
     try:
-        df = churn_model.get_customers_with_predictions()
-        
-        # Apply filters
-        if risk_level:
-            df = df[df['risk_level'] == risk_level]
-        if contract:
-            df = df[df['Contract'] == contract]
-        if internet_service:
-            df = df[df['InternetService'] == internet_service]
-        if search:
-            df = df[df['customerID'].str.contains(search, case=False)]
-        
-        # Sort
-        ascending = sort_order == "asc"
-        if sort_by in df.columns:
-            df = df.sort_values(by=sort_by, ascending=ascending)
-        
-        # Paginate
-        total = len(df)
-        start = (page - 1) * limit
-        end = start + limit
-        df_page = df.iloc[start:end]
-        
-        customers = df_page.to_dict('records')
+        filters = {
+            'risk_level': risk_level,
+            'Contract': contract,
+            'InternetService': internet_service,
+        }
+        start = 0 if cursor else (page - 1) * limit
+        total, customers, next_cursor = await lookup_executor.run(
+            churn_model.query_customers,
+            filters=filters,
+            search=search,
+            search_prefix=search_prefix,
+            sort_by=sort_by,
+            descending=sort_order != "asc",
+            offset=start,
+            limit=limit,
+            cursor=cursor
+        )
         
         # Clean up for JSON serialization
         for customer in customers:
@@ -162,23 +336,38 @@ async def get_customers(
             'total': total,
             'page': page,
             'limit': limit,
-            'total_pages': (total + limit - 1) // limit
+            'total_pages': (total + limit - 1) // limit,
+            'next_cursor': next_cursor
         }
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting customers: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/customers")
+async def upsert_customers(customers: List[CustomerRecord]):
+    """Add new customers or update existing ones by customerID"""
+    try:
+        df = pd.DataFrame([customer.model_dump() for customer in customers])
+        return await analytics_executor.run(churn_model.upsert_customers, df)
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error upserting customers: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/customers/{customer_id}")
 async def get_customer(customer_id: str):
     """Get single customer details"""
     try:
-        df = churn_model.get_customers_with_predictions()
-        customer_df = df[df['customerID'] == customer_id]
+        customer = await lookup_executor.run(churn_model.get_customer, customer_id)
         
-        if len(customer_df) == 0:
+        if customer is None:
             raise HTTPException(status_code=404, detail="Customer not found")
         
-        customer = customer_df.iloc[0].to_dict()
         customer['churn_probability'] = round(float(customer['churn_probability']), 4)
         customer['clv'] = round(float(customer['clv']), 2)
         customer['risk_level'] = str(customer['risk_level'])
@@ -186,6 +375,8 @@ async def get_customer(customer_id: str):
         return customer
     except HTTPException:
         raise
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting customer: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -195,22 +386,70 @@ async def predict_churn(request: CustomerPredictionRequest):
     """Predict churn for a new customer"""
     try:
         customer_data = request.model_dump()
-        prediction = churn_model.predict(customer_data)
+        prediction = await predict_batcher.submit(customer_data)
         return prediction
+    except BatcherOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error predicting churn: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+BATCH_MEDIA_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+# Longer /predict/batch lines (CSV records) come back as error rows
+BATCH_MAX_LINE_LENGTH = int(os.environ.get('BATCH_MAX_LINE_LENGTH', str(1 << 20)))
+
+@api_router.post("/predict/batch")
+async def predict_churn_batch(
+    request: Request,
+    input_format: Optional[str] = Query(None),
+    output_format: Optional[str] = Query(None),
+    chunk_size: int = Query(10000, ge=1, le=100000)
+):
+    """Score a streamed CSV or NDJSON body of customers, streaming results back"""
+    if input_format is None:
+        content_type = request.headers.get('content-type', '')
+        input_format = 'csv' if 'csv' in content_type else 'ndjson'
+    output_format = output_format or input_format
+    if input_format not in INPUT_FORMATS or output_format not in INPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formats must be one of {list(INPUT_FORMATS)}")
+    if churn_model.model is None:
+        raise HTTPException(status_code=503, detail="Model not trained")
+    try:
+        # Held until the response ends: every chunk is scored under it
+        lease = analytics_executor.admit()
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    scorer = BatchScorer(churn_model, CustomerPredictionRequest, lease=lease,
+                         max_line_length=BATCH_MAX_LINE_LENGTH)
+    return DuplexStreamingResponse(
+        lease.hold(scorer.stream(request.stream(), input_format, output_format, chunk_size)),
+        media_type=BATCH_MEDIA_TYPES[output_format]
+    )
+
+@api_router.get("/predict/metrics")
+async def get_predict_metrics():
+    """Get micro-batching queue and batch statistics for /predict"""
+    return predict_batcher.metrics()
+
+@api_router.get("/executors/metrics")
+async def get_executor_metrics():
+    """Get load and rejection counts of the endpoint executors"""
+    return {executor.name: executor.metrics()
+            for executor in (lookup_executor, analytics_executor)}
+
 @api_router.get("/segments")
 async def get_segments(segment_type: Optional[str] = Query(None)):
     """Get customer segmentation analysis"""
     try:
-        segments = churn_model.get_segment_analysis()
+        segments = await analytics_executor.run(churn_model.get_segment_analysis)
         
         if segment_type:
             segments = [s for s in segments if s['segment_type'] == segment_type]
         
         return {'segments': segments}
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting segments: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -220,48 +459,68 @@ async def get_model_metrics():
     """Get ML model performance metrics"""
     return {
         'metrics': churn_model.metrics,
-        'feature_importance': churn_model.feature_importance
+        'feature_importance': churn_model.feature_importance,
+        'artifact_version': churn_model.artifact_version,
+        'model_version': churn_model.model_version,
+        'data_version': churn_model.data_version
     }
 
+@api_router.post("/model/retrain", status_code=202)
+async def retrain_model():
+    """Start retraining the model in the background"""
+    try:
+        job = training_jobs.submit()
+    except TrainingInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return job.to_dict()
+
+@api_router.get("/model/retrain")
+async def list_retrain_jobs():
+    """List recent retraining jobs, newest first"""
+    return {'jobs': [job.to_dict() for job in training_jobs.list()]}
+
+@api_router.get("/model/retrain/{job_id}")
+async def get_retrain_job(job_id: str):
+    """Get progress and status of a retraining job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job.to_dict()
+
 @api_router.get("/charts/tenure-churn")
-async def get_tenure_churn_chart():
+async def get_tenure_churn_chart(
+    risk_level: Optional[str] = Query(None),
+    contract: Optional[str] = Query(None),
+    internet_service: Optional[str] = Query(None)
+):
     """Get data for tenure vs churn chart"""
     try:
-        df = churn_model.get_customers_with_predictions()
-        
-        # Group by tenure buckets
-        df['tenure_bucket'] = pd.cut(df['tenure'], bins=[0, 12, 24, 36, 48, 60, 72], 
-                                     labels=['0-12', '13-24', '25-36', '37-48', '49-60', '61-72'])
-        
-        chart_data = df.groupby('tenure_bucket').agg({
-            'customerID': 'count',
-            'churn_probability': 'mean',
-            'Churn': lambda x: (x == 'Yes').mean() * 100
-        }).reset_index()
-        
-        chart_data.columns = ['tenure_bucket', 'customers', 'avg_churn_prob', 'actual_churn_rate']
-        chart_data['avg_churn_prob'] = (chart_data['avg_churn_prob'] * 100).round(2)
-        chart_data['actual_churn_rate'] = chart_data['actual_churn_rate'].round(2)
-        
-        return chart_data.to_dict('records')
+        return await analytics_executor.run(churn_model.get_tenure_churn_chart, filters={
+            'risk_level': risk_level,
+            'Contract': contract,
+            'InternetService': internet_service,
+        })
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting chart data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
 @api_router.get("/charts/monthly-charges-distribution")
-async def get_monthly_charges_chart():
+async def get_monthly_charges_chart(
+    risk_level: Optional[str] = Query(None),
+    contract: Optional[str] = Query(None),
+    internet_service: Optional[str] = Query(None)
+):
     """Get monthly charges distribution by churn"""
     try:
-        df = churn_model.get_customers_with_predictions()
-        
-        df['charges_bucket'] = pd.cut(df['MonthlyCharges'], bins=[0, 30, 50, 70, 90, 120],
-                                      labels=['$0-30', '$30-50', '$50-70', '$70-90', '$90+'])
-        
-        chart_data = df.groupby(['charges_bucket', 'Churn']).size().unstack(fill_value=0)
-        chart_data = chart_data.reset_index()
-        chart_data.columns = ['charges_bucket', 'retained', 'churned']
-        
-        return chart_data.to_dict('records')
+        return await analytics_executor.run(churn_model.get_monthly_charges_chart, filters={
+            'risk_level': risk_level,
+            'Contract': contract,
+            'InternetService': internet_service,
+        })
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting chart data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -270,130 +529,155 @@ async def get_monthly_charges_chart():
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
-    doc = status_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    _ = await db.status_checks.insert_one(doc)
+    try:
+        await status_writer.insert(status_obj.model_dump())
+    except WriteBufferOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
+async def get_status_checks(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None)
+):
+    """Status checks, newest first.
+
+    When there are more, the X-Next-Cursor header holds a cursor; passing
+    it back as cursor fetches the following page.
+    """
+    try:
+        status_checks, next_cursor = await newest_first_page(
+            db.status_checks, limit, cursor=cursor,
+            projection={'_id': 0, 'id': 1, 'client_name': 1, 'timestamp': 1}
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
     return status_checks
 
 
 @api_router.post("/ai-recommendations")
 async def get_ai_recommendations(request: AIRecommendationRequest):
     """Get AI-powered retention recommendations using GPT-5.2"""
+    if not os.environ.get('OPENAI_API_KEY'):
+        raise HTTPException(status_code=500, detail="AI service not configured")
     try:
-        api_key = os.environ.get('OPENAI_API_KEY')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="AI service not configured")
-        
-        # Build context for AI
-        services_str = ", ".join(request.services) if request.services else "None"
-        
-        prompt = f"""You are a customer retention expert for a telecommunications company. Analyze this customer and provide personalized retention strategies.
-
-            Customer Profile:
-            - Customer ID: {request.customer_id or 'New Customer'}
-            - Churn Probability: {request.churn_probability * 100:.1f}%
-            - Risk Level: {request.risk_level}
-            - Tenure: {request.tenure} months
-            - Contract Type: {request.contract}
-            - Monthly Charges: ${request.monthly_charges:.2f}
-            - Internet Service: {request.internet_service}
-            - Additional Services: {services_str}
-
-            Based on this profile, provide:
-            1. **Risk Assessment**: Brief analysis of why this customer might churn
-            2. **Top 3 Retention Strategies**: Specific, actionable recommendations
-            3. **Offer Suggestions**: Personalized offers or discounts
-            4. **Expected Impact**: Estimated churn reduction if strategies are implemented
-
-            Keep your response concise and actionable. Format with clear headers."""
-
-
-        
-        chat_instance = ChatOpenAI(
-        model="gpt-4o",   # or gpt-4.1
-        api_key=OPENAI_API_KEY,
-        temperature=0.7
-         )
-
-        messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_prompt)
-         ]
-
-        response = await chat_instance.ainvoke(messages)
-        response_text = response.content
-
+        return await recommendation_service.recommend(request)
     except Exception as e:
-        logging.error(f"Error calling LLM: {e}")
-        response_text = (
-        "I apologize, but I encountered an error processing your request. "
-        f"Please try again. Error: {str(e)}"
-        )
-
-        
-        # Store recommendation in DB
-        recommendation_doc = {
-            'id': str(uuid.uuid4()),
-            'customer_id': request.customer_id,
-            'churn_probability': request.churn_probability,
-            'risk_level': request.risk_level,
-            'recommendation': response_text,
-            'created_at': datetime.now(timezone.utc).isoformat()
-        }
-        await db.ai_recommendations.insert_one(recommendation_doc)
-        
+        logger.error(f"Error calling LLM: {e}")
+        # Not cached, so the next request for this profile tries again
         return {
-            'recommendation': response_text,
-            'generated_at': datetime.now(timezone.utc).isoformat()
+            'recommendation': (
+                "I apologize, but I encountered an error processing your request. "
+                f"Please try again. Error: {str(e)}"
+            ),
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'cached': False
         }
-    except HTTPException:
-        raise
+
+def sse_event(event, data):
+    """One Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_router.post("/ai-recommendations/stream")
+async def stream_ai_recommendations(request: AIRecommendationRequest):
+    """Get AI-powered retention recommendations as Server-Sent Events.
+
+    Sends a `token` event ({"text": ...}) per chunk as the model generates
+    it, then `done` ({"generated_at", "cached"}), or `error` ({"detail"}) if
+    the model call fails part way.
+    """
+    if not os.environ.get('OPENAI_API_KEY'):
+        raise HTTPException(status_code=500, detail="AI service not configured")
+
+    async def events():
+        try:
+            async for event, data in recommendation_service.stream(request):
+                if event == 'token':
+                    yield sse_event('token', {'text': data})
+                else:
+                    yield sse_event(event, data)
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {e}")
+            yield sse_event('error', {'detail': str(e)})
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api_router.get("/ai-recommendations/metrics")
+async def get_ai_recommendation_metrics():
+    """Get cache, coalescing and LLM client statistics for /ai-recommendations"""
+    return {**recommendation_service.metrics(), 'llm': llm_client.metrics(),
+            'writes': recommendation_writer.metrics()}
+
+@api_router.post("/ai-recommendations/playbooks", status_code=202)
+async def generate_playbooks():
+    """Start pre-generating recommendations for the profile clusters of at-risk customers"""
+    if playbook_generator.running:
+        raise HTTPException(status_code=409, detail="A playbook run is already in progress")
+    try:
+        with analytics_executor.admit() as lease:
+            df = await lease.call(churn_model.get_customers_with_predictions)
+            clusters = await lease.call(profile_clusters, df, playbook_generator.risk_levels)
+        return playbook_generator.start(clusters)
+    except PlaybookJobInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"Error getting AI recommendations: {e}")
-        raise HTTPException(status_code=500, detail=str(e)) 
+        logger.error(f"Error starting playbook run: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/ai-recommendations/playbooks")
+async def get_playbook_status():
+    """Get progress and counts of the latest playbook run"""
+    return playbook_generator.status
 
 @api_router.get("/export/customers")
 async def export_customers(
     format: str = Query("csv"),
-    risk_level: Optional[str] = Query(None)
+    risk_level: Optional[str] = Query(None),
+    compression: Optional[str] = Query(None),
+    chunk_size: int = Query(10000, ge=1, le=100000)
 ):
-    """Export customer data"""
+    """Export customer data, streamed in chunks as CSV, JSON, Parquet or Arrow"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of {list(EXPORT_FORMATS)}")
+    if compression not in (None, 'gzip'):
+        raise HTTPException(status_code=400, detail="Compression must be gzip")
     try:
-        from fastapi.responses import StreamingResponse
-        import io
-        
-        df = churn_model.get_customers_with_predictions()
-        
-        if risk_level:
-            df = df[df['risk_level'] == risk_level]
-        
-        # Select relevant columns
-        export_cols = ['customerID', 'gender', 'tenure', 'Contract', 'MonthlyCharges', 
-                       'TotalCharges', 'InternetService', 'churn_probability', 'risk_level', 'clv', 'Churn']
-        df_export = df[export_cols]
-        
-        if format == "csv":
-            stream = io.StringIO()
-            df_export.to_csv(stream, index=False)
-            response = StreamingResponse(
-                iter([stream.getvalue()]),
-                media_type="text/csv",
-                headers={"Content-Disposition": "attachment; filename=customers_export.csv"}
-            )
-            return response
-        else:
-            return {"data": df_export.to_dict('records')}
+        # One slot for the snapshot and every chunk, held until the body ends
+        lease = analytics_executor.admit()
+    except ExecutorOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        exporter = await lease.call(churn_model.customer_exporter,
+                                    filters={'risk_level': risk_level},
+                                    chunk_size=chunk_size)
+        # Chunks are encoded on the analytics pool, not the shared threadpool
+        body = await analytics_executor.stream(exporter.stream(format, gzip=compression == 'gzip'),
+                                               lease=lease)
     except Exception as e:
+        lease.release()
         logger.error(f"Error exporting customers: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"customers_export.{extension}"
+    if compression:
+        media_type = 'application/gzip'
+        filename += '.gz'
+    headers = {}
+    if format != 'json' or compression:
+        headers['Content-Disposition'] = f"attachment; filename={filename}"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers=headers
+    )
 
 
 # Include the router in the main app
@@ -0,0 +1,213 @@
+"""
+ChurnGuard Storage - buffered MongoDB writes, startup indexes and keyset paging
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from batching import collect_batch
+from indexes import InvalidCursorError, pack_cursor, unpack_cursor
+
+logger = logging.getLogger(__name__)
+
+# Indexes every collection needs, created at startup; creating an index that
+# already exists is a no-op
+COLLECTION_INDEXES = {
+    # /api/status pages newest first, ties broken by id
+    'status_checks': [
+        [('timestamp', -1), ('id', -1)],
+    ],
+    'ai_recommendations': [
+        [('profile_key', 1), ('created_at', -1)],
+        [('customer_id', 1), ('created_at', -1)],
+    ],
+}
+
+# Fields written as ISO strings before they were stored as BSON dates
+DATE_FIELDS = {
+    'status_checks': 'timestamp',
+    'ai_recommendations': 'created_at',
+}
+
+
+class WriteBufferOverloadedError(RuntimeError):
+    """Raised when a write buffer has no room for another document"""
+
+
+class WriteBuffer:
+    """Write-behind buffer that stores documents with one insert_many per batch.
+
+    insert() queues a document and returns straight away. A single worker
+    takes the first queued document, then keeps collecting until
+    max_batch_size is reached or max_wait_ms has passed, like MicroBatcher:
+    with max_wait_ms=0 an idle server writes each document at once while a
+    busy one writes everything that arrived during the previous insert as
+    one batch. Failed batches are retried max_retries times, then dropped
+    and logged. stop() writes whatever is still queued.
+
+    Documents are only readable once written, so reads may briefly miss the
+    latest writes.
+    """
+
+    def __init__(self, collection, max_batch_size=500, max_wait_ms=0.0,
+                 max_queue_size=10000, max_retries=2):
+        self.collection = collection
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self._queue = None
+        self._worker = None
+        # Taken off the queue, not yet written
+        self._pending = []
+        self._writing = None
+        self._batches = 0
+        self._written = 0
+        self._dropped = 0
+        self._largest_batch = 0
+        self._total_write_time = 0.0
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker after writing every queued document"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            if self._writing is not None:
+                await self._writing
+            while self._pending or not self._queue.empty():
+                batch, self._pending = self._pending, []
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                await self._write(batch)
+
+    async def insert(self, doc):
+        """Queue doc to be written with the next batch"""
+        if self._worker is None:
+            raise RuntimeError("Write buffer is not running")
+        try:
+            self._queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            raise WriteBufferOverloadedError(
+                f"Write queue for {self.collection.name} is full")
+
+    def metrics(self):
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'batches': self._batches,
+            'written': self._written,
+            'dropped': self._dropped,
+            'avg_batch_size': round(self._written / self._batches, 2) if self._batches else 0,
+            'largest_batch': self._largest_batch,
+            'avg_write_ms': round(self._total_write_time / self._batches * 1000, 3) if self._batches else 0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_window_ms': self.max_wait * 1000
+        }
+
+    async def _run(self):
+        while True:
+            # Collected into _pending, so stop() still writes a batch cut short
+            batch = await collect_batch(self._queue, self._pending, self.max_batch_size,
+                                        self.max_wait)
+            self._pending = []
+            # Shielded: stop() cancelling the worker must not interrupt a write
+            self._writing = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._writing)
+            self._writing = None
+
+    async def _write(self, batch):
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Unordered, so one bad document does not hold back the rest
+                await self.collection.insert_many(batch, ordered=False)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Dropped {len(batch)} documents for {self.collection.name}: {e}")
+                    self._dropped += len(batch)
+                    return
+                logger.warning(f"Writing {len(batch)} documents to {self.collection.name} failed: {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        self._batches += 1
+        self._written += len(batch)
+        self._largest_batch = max(self._largest_batch, len(batch))
+        self._total_write_time += time.perf_counter() - started
+
+
+async def ensure_indexes(db):
+    """Create COLLECTION_INDEXES and convert ISO string dates left by older versions"""
+    for name, indexes in COLLECTION_INDEXES.items():
+        for keys in indexes:
+            await db[name].create_index(keys)
+    for name, field in DATE_FIELDS.items():
+        result = await db[name].update_many(
+            {field: {'$type': 'string'}},
+            [{'$set': {field: {'$toDate': f'${field}'}}}]
+        )
+        if result.modified_count:
+            logger.info(f"Converted {result.modified_count} {name}.{field} values to dates")
+
+
+def as_utc(value):
+    """A stored timestamp as an aware UTC datetime.
+
+    BSON dates come back naive unless the client is tz_aware; older
+    documents hold ISO strings.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def encode_page_cursor(timestamp, doc_id) -> str:
+    """Opaque cursor for resuming a newest-first page after one document"""
+    return pack_cursor(as_utc(timestamp).isoformat(), doc_id)
+
+
+def decode_page_cursor(cursor: str):
+    """(timestamp, id) from encode_page_cursor()"""
+    timestamp, doc_id = unpack_cursor(cursor, 2)
+    try:
+        return as_utc(timestamp), doc_id
+    except (ValueError, TypeError, AttributeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}")
+
+
+async def newest_first_page(collection, limit, cursor=None, time_field='timestamp',
+                            projection=None):
+    """(documents, next_cursor) for one page of collection, newest first.
+
+    Pages follow the (time_field, id) index instead of skipping, so every
+    page costs the same however deep it is. next_cursor is None on the
+    last page.
+    """
+    query = {}
+    if cursor is not None:
+        timestamp, doc_id = decode_page_cursor(cursor)
+        query = {'$or': [
+            {time_field: {'$lt': timestamp}},
+            {time_field: timestamp, 'id': {'$lt': doc_id}},
+        ]}
+    docs = await collection.find(query, projection) \
+        .sort([(time_field, -1), ('id', -1)]) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_page_cursor(docs[-1][time_field], docs[-1]['id'])
+    for doc in docs:
+        doc[time_field] = as_utc(doc[time_field])
+    return docs, next_cursor
@@ -0,0 +1,212 @@
+"""
+ChurnGuard Training Jobs - retrain in a separate process and hot-swap the served model
+"""
+import logging
+import multiprocessing
+import queue
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+import joblib
+import numpy as np
+
+from ml_model import ChurnModel
+
+logger = logging.getLogger(__name__)
+
+# Share of the progress bar covered by the worker process; the rest is
+# loading, validating and swapping the new artifact
+TRAINING_PROGRESS_SHARE = 0.9
+
+
+class TrainingInProgressError(RuntimeError):
+    """Raised when a retrain is requested while another one is running"""
+
+
+@dataclass
+class TrainingJob:
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = 'queued'
+    stage: str = 'queued'
+    progress: float = 0.0
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+    artifact_version: Optional[str] = None
+    metrics: dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'artifact_version': self.artifact_version,
+            'metrics': self.metrics,
+            'error': self.error
+        }
+
+
+def _train_worker(candidate_path, data_source, max_training_rows, events):
+    """Entry point of the training process: train and write the candidate artifact.
+
+    The candidate is only registered once the API process has validated it,
+    so a rejected model never becomes the latest version.
+    """
+    try:
+        model = ChurnModel(data_source, max_training_rows)
+        # The worker only fits; it never serves the customer table
+        metrics = model.train(
+            progress=lambda stage, fraction: events.put(('progress', stage, fraction)),
+            reload_data=False
+        )
+        joblib.dump(model.get_artifacts(), candidate_path)
+        events.put(('done', metrics))
+    except Exception as e:
+        events.put(('error', f"{type(e).__name__}: {e}"))
+
+
+def validate_artifacts(churn_model, artifacts, min_roc_auc):
+    """Check a freshly trained artifact before it is allowed to serve traffic"""
+    current_columns = churn_model.feature_columns
+    if current_columns and artifacts['feature_columns'] != current_columns:
+        raise ValueError("Feature columns differ from the serving model")
+
+    roc_auc = artifacts['metrics'].get('roc_auc', 0)
+    if roc_auc < min_roc_auc:
+        raise ValueError(f"ROC AUC {roc_auc} is below the minimum {min_roc_auc}")
+
+    # Score a sample of the live customer base with the candidate
+    if churn_model.df is None:
+        churn_model.load_data()
+    sample = churn_model.df.head(1000)
+    processed = churn_model.preprocess_data(sample, is_training=False,
+                                            label_encoders=artifacts['label_encoders'])
+    X_scaled = artifacts['scaler'].transform(processed[artifacts['feature_columns']])
+    probabilities = artifacts['model'].predict_proba(X_scaled)[:, 1]
+    if not np.all(np.isfinite(probabilities)) or probabilities.min() < 0 or probabilities.max() > 1:
+        raise ValueError("Candidate model produced invalid probabilities")
+
+
+class TrainingJobManager:
+    """Runs at most one retrain at a time and swaps the result into churn_model.
+
+    Training happens in a spawned process so the CPU-bound fit never holds
+    the API process's GIL; this process only loads and validates the
+    candidate, and registers and publishes it if it passes. After a swap
+    the registry is pruned to the newest keep_versions artifacts.
+    """
+
+    def __init__(self, churn_model, registry, min_roc_auc=0.5, max_history=20,
+                 keep_versions=5):
+        self.churn_model = churn_model
+        self.registry = registry
+        self.min_roc_auc = min_roc_auc
+        self.max_history = max_history
+        self.keep_versions = keep_versions
+        self._jobs = {}
+        self._active = None
+        self._process = None
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context('spawn')
+
+    def submit(self) -> TrainingJob:
+        with self._lock:
+            if self._active is not None:
+                raise TrainingInProgressError(f"Training job {self._active.id} is already running")
+            job = TrainingJob()
+            self._active = job
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs
+            for job_id in list(self._jobs)[:-self.max_history]:
+                del self._jobs[job_id]
+
+        threading.Thread(target=self._run, args=(job,), name=f"training-{job.id}",
+                         daemon=True).start()
+        return job
+
+    def get(self, job_id) -> Optional[TrainingJob]:
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return list(reversed(self._jobs.values()))
+
+    def shutdown(self):
+        process = self._process
+        if process is not None and process.is_alive():
+            process.terminate()
+
+    def _run(self, job):
+        job.status = 'running'
+        candidate_path = None
+        try:
+            candidate_path = self.registry.candidate_path(job.id)
+            job.metrics = self._train_in_subprocess(job, candidate_path)
+
+            job.status = job.stage = 'validating'
+            job.progress = 0.95
+            artifacts = joblib.load(candidate_path)
+            validate_artifacts(self.churn_model, artifacts, self.min_roc_auc)
+
+            version = self.registry.save(artifacts)
+            artifacts['version'] = job.artifact_version = version
+            self.churn_model.load_artifacts(artifacts)
+            # Warm the snapshot so the first request after the swap stays fast
+            self.churn_model.get_snapshot()
+
+            job.status = job.stage = 'succeeded'
+            job.progress = 1.0
+            logger.info(f"Training job {job.id} swapped in model {version}")
+            self._prune()
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error(f"Training job {job.id} failed: {e}")
+        finally:
+            if candidate_path is not None:
+                candidate_path.unlink(missing_ok=True)
+            job.finished_at = datetime.now(timezone.utc)
+            with self._lock:
+                self._active = None
+                self._process = None
+
+    def _prune(self):
+        try:
+            # The version just swapped in is the newest, so it is always kept
+            self.registry.prune(keep=self.keep_versions)
+        except Exception as e:
+            logger.error(f"Pruning the model registry failed: {e}")
+
+    def _train_in_subprocess(self, job, candidate_path):
+        events = self._context.Queue()
+        process = self._context.Process(
+            target=_train_worker,
+            args=(str(candidate_path), self.churn_model.data_source,
+                  self.churn_model.max_training_rows, events),
+            daemon=True
+        )
+        self._process = process
+        process.start()
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=0.5)
+                except queue.Empty:
+                    if not process.is_alive():
+                        raise RuntimeError(f"Training process exited with code {process.exitcode}")
+                    continue
+
+                if event[0] == 'progress':
+                    _, job.stage, fraction = event
+                    job.progress = fraction * TRAINING_PROGRESS_SHARE
+                elif event[0] == 'done':
+                    return event[1]
+                else:
+                    raise RuntimeError(event[1])
+        finally:
+            process.join(timeout=5)
@@ -150,6 +150,10 @@ class ChurnGuardAPITester:
         }
         return self.run_test("Churn Prediction", "POST", "/predict", data=test_customer)
 
+    def test_predict_metrics(self):
+        """Test prediction micro-batching metrics endpoint"""
+        return self.run_test("Predict Batching Metrics", "GET", "/predict/metrics")
+
     def test_segments_analysis(self):
         """Test segments analysis endpoint"""
         return self.run_test("Segments Analysis", "GET", "/segments")
@@ -163,6 +167,13 @@ class ChurnGuardAPITester:
         """Test model metrics endpoint"""
         return self.run_test("Model Metrics", "GET", "/model/metrics")
 
+    def test_model_retrain(self):
+        """Test background model retraining job"""
+        success, job = self.run_test("Start Model Retrain", "POST", "/model/retrain", expected_status=202)
+        if success and job.get('job_id'):
+            return self.run_test("Model Retrain Status", "GET", f"/model/retrain/{job['job_id']}")
+        return False, {}
+
     def test_ai_recommendations(self):
         """Test AI recommendations endpoint (GPT-5.2)"""
         recommendation_data = {
@@ -240,7 +251,9 @@ class ChurnGuardAPITester:
         print("\n🤖 MACHINE LEARNING")
         print("-" * 40)
         self.test_churn_prediction()
+        self.test_predict_metrics()
         self.test_model_metrics()
+        self.test_model_retrain()
         
         # Analytics Tests
         print("\n📈 ANALYTICS & REPORTING")
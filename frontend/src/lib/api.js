@@ -20,6 +20,37 @@ export const api = {
   
   // AI Recommendations
   getAIRecommendations: (data) => axios.post(`${API}/ai-recommendations`, data),
+  // Server-Sent Events: calls onToken(text) as the model writes, resolves with
+  // the final { generated_at, cached } payload
+  streamAIRecommendations: async (data, onToken) => {
+    const response = await fetch(`${API}/ai-recommendations/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(data),
+    });
+    if (!response.ok) {
+      throw new Error(`Request failed with status code ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let result = null;
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const messages = buffer.split("\n\n");
+      buffer = messages.pop();
+      for (const message of messages) {
+        const event = message.match(/^event: (.*)$/m)?.[1];
+        const payload = JSON.parse(message.match(/^data: (.*)$/m)?.[1] ?? "{}");
+        if (event === "token") onToken(payload.text);
+        else if (event === "done") result = payload;
+        else if (event === "error") throw new Error(payload.detail);
+      }
+    }
+    return result;
+  },
   
   // Charts
   getTenureChurnChart: () => axios.get(`${API}/charts/tenure-churn`),
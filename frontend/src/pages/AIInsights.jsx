@@ -30,6 +30,7 @@ export default function AIInsights() {
   const [selectedCustomer, setSelectedCustomer] = useState(null);
   const [recommendation, setRecommendation] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [customInput, setCustomInput] = useState({
     churn_probability: 0.65,
     risk_level: "High",
@@ -61,6 +62,7 @@ export default function AIInsights() {
 
   const handleGetRecommendation = async () => {
     setLoading(true);
+    setStreaming(true);
     setRecommendation(null);
 
     try {
@@ -82,14 +84,21 @@ export default function AIInsights() {
           }
         : customInput;
 
-      const response = await api.getAIRecommendations(requestData);
-      setRecommendation(response.data);
+      // Show the text as it streams in instead of waiting for all of it
+      let text = "";
+      const result = await api.streamAIRecommendations(requestData, (token) => {
+        text += token;
+        setLoading(false);
+        setRecommendation({ recommendation: text, generated_at: null });
+      });
+      setRecommendation({ recommendation: text, generated_at: result?.generated_at });
       toast.success("AI recommendation generated successfully");
     } catch (error) {
       console.error("Error getting recommendation:", error);
       toast.error("Failed to generate AI recommendation");
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -306,10 +315,10 @@ export default function AIInsights() {
           <Button
             className="btn-ai-magic w-full"
             onClick={handleGetRecommendation}
-            disabled={loading || (mode === "customer" && !selectedCustomer)}
+            disabled={streaming || (mode === "customer" && !selectedCustomer)}
             data-testid="generate-recommendation-btn"
           >
-            {loading ? (
+            {streaming ? (
               <>
                 <Loader2 className="w-4 h-4 mr-2 animate-spin" />
                 Generating with GPT-5.2...
@@ -337,10 +346,10 @@ export default function AIInsights() {
                     variant="ghost" 
                     size="sm" 
                     onClick={handleGetRecommendation}
-                    disabled={loading}
+                    disabled={streaming}
                     data-testid="refresh-recommendation-btn"
                   >
-                    <RefreshCw className={`w-4 h-4 ${loading ? 'animate-spin' : ''}`} />
+                    <RefreshCw className={`w-4 h-4 ${streaming ? 'animate-spin' : ''}`} />
                   </Button>
                 )}
               </CardTitle>
@@ -388,11 +397,13 @@ export default function AIInsights() {
                   </div>
 
                   {/* Timestamp */}
-                  <div className="mt-8 pt-4 border-t border-gray-100">
-                    <p className="text-xs text-gray-400">
-                      Generated at {new Date(recommendation.generated_at).toLocaleString()} by GPT-5.2
-                    </p>
-                  </div>
+                  {recommendation.generated_at && (
+                    <div className="mt-8 pt-4 border-t border-gray-100">
+                      <p className="text-xs text-gray-400">
+                        Generated at {new Date(recommendation.generated_at).toLocaleString()} by GPT-5.2
+                      </p>
+                    </div>
+                  )}
                 </motion.div>
               ) : (
                 <div className="flex flex-col items-center justify-center py-24 text-center">
@@ -0,0 +1,71 @@
+import os
+import sys
+from pathlib import Path
+
+import mongomock
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+
+class AsyncCursor:
+    """Motor-style cursor over a mongomock cursor"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._cursor)[:length]
+
+
+class AsyncCollection:
+    """Motor-style coroutine methods over a mongomock collection"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, db):
+        self._db = db
+
+    def __getitem__(self, name):
+        return AsyncCollection(self._db[name])
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+@pytest.fixture
+def mongo_db():
+    return AsyncDatabase(mongomock.MongoClient(tz_aware=True)['test'])
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """The server module, importable without a database; nothing connects until used"""
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'churnguard_test')
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    import server
+    return server
@@ -0,0 +1,81 @@
+import asyncio
+import csv
+import io
+import random
+
+from pydantic import BaseModel
+
+from batch_scoring import OVERSIZED_LINE, BatchScorer, iter_lines
+
+
+def split_lines(data, chunk_sizes, **kwargs):
+    async def chunks():
+        position = 0
+        for size in chunk_sizes:
+            yield data[position:position + size]
+            position += size
+        yield data[position:]
+
+    async def collect():
+        return [line async for line in iter_lines(chunks(), **kwargs)]
+    return asyncio.run(collect())
+
+
+CSV_TEXT = (
+    'customerID,note,tenure\r\n'
+    'A1,"two\nlines",3\r\n'
+    'A2,"say ""hi""\r\nthere",4\n'
+    'A3,5\'10" tall,5\n'
+    'A4,"",6\n'
+    'A5,"é,\n""\n",7'
+)
+
+
+def test_quoted_newlines_stay_in_one_record():
+    expected = list(csv.reader(io.StringIO(CSV_TEXT, newline='')))
+    data = CSV_TEXT.encode('utf-8')
+    rng = random.Random(0)
+    for _ in range(200):
+        sizes = [rng.randint(0, 6) for _ in range(len(data) // 2)]
+        lines = split_lines(data, sizes, quoted=True)
+        assert [next(csv.reader([line])) for line in lines] == expected
+
+
+def test_lines_over_the_limit_are_replaced():
+    data = b'a,b\n' + b'x' * 5000 + b'\n1,2\n' + b'y' * 5000
+    lines = split_lines(data, [7] * 1500, quoted=True, max_line_length=100)
+    assert lines == ['a,b', OVERSIZED_LINE, '1,2', OVERSIZED_LINE]
+
+
+class Schema(BaseModel):
+    tenure: int = 12
+    note: str = ''
+
+
+class FakeModel:
+    def predict_frame(self, df):
+        return df['tenure'].to_numpy() / 100
+
+    def risk_level(self, probability):
+        return 'Low'
+
+
+def test_rows_keep_their_numbers_around_quoted_newlines_and_long_lines():
+    body = ('customerID,note,tenure\n'
+            'A1,"multi\nline",10\n'
+            + 'A2,' + 'z' * 500 + ',20\n'
+            'A3,plain,30\n').encode('utf-8')
+    scorer = BatchScorer(FakeModel(), Schema, max_line_length=200)
+
+    async def body_chunks():
+        for i in range(0, len(body), 16):
+            yield body[i:i + 16]
+
+    async def collect():
+        return ''.join([part async for part in scorer.stream(body_chunks(), 'csv', 'csv', 2)])
+    rows = list(csv.DictReader(io.StringIO(asyncio.run(collect()))))
+
+    assert [(row['row'], row['customerID']) for row in rows] == [('0', 'A1'), ('1', ''), ('2', 'A3')]
+    assert rows[0]['churn_probability'] == '0.1'
+    assert rows[1]['error'] == 'Line is longer than 200 characters'
+    assert rows[2]['churn_probability'] == '0.3'
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+
+from batching import BatcherOverloadedError, MicroBatcher
+
+
+class RecordingScorer:
+    """score_fn stand-in that records its batches and can be held open"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.proceed = threading.Event()
+        self.proceed.set()
+
+    def __call__(self, payloads):
+        self.proceed.wait(5)
+        self.batches.append(list(payloads))
+        if self.fail:
+            raise ValueError('model failed')
+        return [payload * 10 for payload in payloads]
+
+
+def test_concurrent_submits_share_one_call_and_get_their_own_result():
+    async def scenario():
+        scorer = RecordingScorer()
+        batcher = MicroBatcher(scorer, max_batch_size=64, max_wait_ms=50)
+        await batcher.start()
+
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+
+        assert results == [i * 10 for i in range(20)]
+        assert scorer.batches == [list(range(20))]
+        assert batcher.metrics()['batches'] == 1 and batcher.metrics()['requests'] == 20
+        await batcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_batches_are_capped_at_max_batch_size():
+    async def scenario():
+        scorer = RecordingScorer()
+        batcher = MicroBatcher(scorer, max_batch_size=8, max_wait_ms=0)
+        await batcher.start()
+
+        assert await asyncio.gather(*(batcher.submit(i) for i in range(20))) == \
+            [i * 10 for i in range(20)]
+        assert [len(batch) for batch in scorer.batches] == [8, 8, 4]
+        assert batcher.metrics()['largest_batch'] == 8
+        await batcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_a_failed_batch_fails_every_waiter():
+    async def scenario():
+        batcher = MicroBatcher(RecordingScorer(fail=True), max_wait_ms=50)
+        await batcher.start()
+
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)),
+                                       return_exceptions=True)
+
+        assert len(results) == 5
+        assert all(isinstance(result, ValueError) for result in results)
+        # The worker keeps serving after a failure
+        batcher.score_fn = RecordingScorer()
+        assert await batcher.submit(1) == 10
+        await batcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_submits_beyond_the_queue_are_rejected():
+    async def scenario():
+        scorer = RecordingScorer()
+        scorer.proceed.clear()
+        batcher = MicroBatcher(scorer, max_batch_size=1, max_queue_size=2)
+        await batcher.start()
+
+        # One payload is being scored, two wait in the queue
+        first = asyncio.ensure_future(batcher.submit(0))
+        await asyncio.sleep(0.05)
+        queued = [asyncio.ensure_future(batcher.submit(i)) for i in (1, 2)]
+        await asyncio.sleep(0)
+        with pytest.raises(BatcherOverloadedError):
+            await batcher.submit(3)
+
+        scorer.proceed.set()
+        assert await asyncio.gather(first, *queued) == [0, 10, 20]
+        await batcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_submit_requires_a_running_batcher():
+    async def scenario():
+        batcher = MicroBatcher(RecordingScorer())
+        with pytest.raises(RuntimeError):
+            await batcher.submit(1)
+
+    asyncio.run(scenario())
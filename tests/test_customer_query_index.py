@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_sources import compact_customers, widen_categories
+from indexes import (CustomerQueryIndex, InvalidCursorError, decode_cursor, encode_cursor,
+                     pack_cursor)
+
+
+def customers(n_rows=500, seed=1):
+    rng = np.random.default_rng(seed)
+    return compact_customers(pd.DataFrame({
+        'customerID': [f'C{i:04d}' for i in rng.permutation(n_rows)],
+        # First appearance deliberately differs from alphabetical order
+        'Contract': rng.choice(['Two year', 'Month-to-month', 'One year'], n_rows),
+        'PaymentMethod': rng.choice(['Mailed check', 'Electronic check', None], n_rows),
+        'gender': rng.choice(['Male', 'Female'], n_rows),
+        'tenure': rng.integers(0, 5, n_rows),
+        'risk_level': rng.choice(['High', 'Low', 'Medium'], n_rows),
+        'InternetService': rng.choice(['DSL', 'No'], n_rows),
+    }))
+
+
+def expected_order(df, column, descending):
+    keys = df[column].astype(object)
+    present = df[keys.notna()]
+    ordered = present.assign(key=keys[keys.notna()]).sort_values(
+        ['key', 'customerID'], ascending=[not descending, True])
+    missing = df[keys.isna()].sort_values('customerID')
+    return ordered['customerID'].tolist() + missing['customerID'].tolist()
+
+
+def paged(index, df, column, descending, limit):
+    ids, after = [], None
+    sort_order = index.sort_order(column, descending)
+    while True:
+        page, has_more = index.page(None, column, descending, 0, limit, after=after)
+        ids += df['customerID'].iloc[page].tolist()
+        if not has_more:
+            return ids
+        after = index.cursor_for(page[-1], column)
+        # Cursors resume right after the row they were taken from
+        assert sort_order.after(*after) == len(ids)
+
+
+@pytest.mark.parametrize('column', ['Contract', 'PaymentMethod', 'gender', 'tenure'])
+@pytest.mark.parametrize('descending', [False, True])
+def test_text_columns_sort_by_label_across_cursor_pages(column, descending):
+    df = customers()
+    assert list(df['Contract'].cat.categories) != sorted(df['Contract'].cat.categories)
+    index = CustomerQueryIndex(df)
+
+    assert paged(index, df, column, descending, limit=37) == expected_order(df, column, descending)
+
+
+def test_labels_added_after_load_sort_in_place():
+    df = customers()
+    added = compact_customers(pd.DataFrame({
+        'customerID': ['Z0001', 'Z0002'], 'Contract': ['Annual', 'Three year'],
+        'PaymentMethod': ['Bank transfer', None], 'gender': ['Female', 'Male'],
+        'tenure': [1, 2], 'risk_level': ['Low', 'High'], 'InternetService': ['No', 'DSL'],
+    }), like=df)
+    df = pd.concat([widen_categories(df, added), added], ignore_index=True)
+    index = CustomerQueryIndex(df)
+
+    for descending in (False, True):
+        assert paged(index, df, 'Contract', descending, limit=50) == \
+            expected_order(df, 'Contract', descending)
+
+
+@pytest.mark.parametrize('sort_by, key', [
+    (None, 'x'), (None, -1), (None, True), (None, 1.5),
+    ('tenure', 'x'), ('tenure', True), ('Contract', 3), ('Contract', False),
+])
+def test_tampered_cursor_keys_are_rejected(sort_by, key):
+    df = customers()
+    index = CustomerQueryIndex(df)
+    _, _, after_key, customer_id = decode_cursor(
+        encode_cursor(sort_by, True, key, 'C0001'))
+
+    with pytest.raises(InvalidCursorError):
+        index.page(None, sort_by, True, 0, 10, after=(after_key, customer_id))
+    with pytest.raises(InvalidCursorError):
+        index.page(np.arange(10), sort_by, True, 0, 10, after=(after_key, customer_id))
+
+
+@pytest.mark.parametrize('values', [
+    [None, True, 'x'], [None, True, 0, 7], [5, True, 0, 'C0001'], [None, True, [0], 'C0001'],
+])
+def test_malformed_cursors_do_not_decode(values):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(pack_cursor(*values))
+
+
+def test_valid_cursor_keys_still_resume():
+    df = customers()
+    index = CustomerQueryIndex(df)
+    page, _ = index.page(None, None, True, 0, 10, after=(4, 'C0001'))
+    assert page.tolist() == list(range(5, 15))
+    # A number on a numeric column and a missing key are fine
+    index.sort_order('tenure', False).after(2, 'C0001')
+    index.sort_order('PaymentMethod', False).after(None, 'C0001')
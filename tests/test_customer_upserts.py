@@ -0,0 +1,111 @@
+import logging
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_sources import SyntheticSource
+from ml_model import ChurnModel
+
+
+@pytest.fixture(scope='module')
+def trained():
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.INFO)
+    model = ChurnModel(SyntheticSource(n_rows=3000), max_training_rows=3000)
+    model.train()
+    return model
+
+
+def fresh_model(trained):
+    model = ChurnModel(SyntheticSource(n_rows=3000))
+    model.load_artifacts(trained.get_artifacts())
+    model.get_snapshot()
+    return model
+
+
+def plain(df):
+    """Rows of a customer frame as text, independent of storage dtypes"""
+    return df.astype(object).astype(str).reset_index(drop=True)
+
+
+def customers(model, ids, **changes):
+    """Rows for ids copied from the first customer, with changes applied"""
+    rows = model.df.iloc[[0] * len(ids)].reset_index(drop=True).astype(object)
+    return rows.assign(customerID=ids, **changes)
+
+
+def test_upserts_match_rewriting_the_table(trained):
+    model = fresh_model(trained)
+    expected = plain(model.df)
+
+    batches = [
+        customers(model, ['CUST-00001', 'NEW-1'], tenure=[5, 6]),
+        customers(model, ['NEW-1', 'NEW-2', 'CUST-00002'], PaymentMethod='Crypto'),
+        customers(model, ['CUST-00001'], MonthlyCharges=12.5, Contract='Two year'),
+    ]
+    for batch in batches:
+        model.upsert_customers(batch)
+        rows = plain(batch[expected.columns])
+        for i, customer_id in enumerate(rows['customerID']):
+            matches = np.flatnonzero(expected['customerID'] == customer_id)
+            if len(matches):
+                expected.iloc[matches[0]] = rows.iloc[i]
+            else:
+                expected = pd.concat([expected, rows.iloc[[i]]], ignore_index=True)
+
+    pd.testing.assert_frame_equal(plain(model.df), expected)
+    assert model.df['PaymentMethod'].dtype == 'category'
+
+
+def test_lookups_after_upserts_match_the_rebuilt_snapshot(trained):
+    model = fresh_model(trained)
+    model.upsert_customers(customers(model, ['CUST-00003', 'NEW-9'], tenure=[1, 70],
+                                     PaymentMethod=['Crypto', 'Mailed check']))
+    model.upsert_customers(customers(model, ['NEW-9'], MonthlyCharges=99.0))
+
+    looked_up = {cid: model.get_customer(cid) for cid in ['CUST-00003', 'NEW-9', 'CUST-00004']}
+    # Served without rebuilding the snapshot
+    assert model._snapshot.data_version < model.data_version
+
+    snapshot = model.get_snapshot()
+    for customer_id, row in looked_up.items():
+        assert row == snapshot.row(snapshot.position(customer_id))
+    rescored = model._score_customers(model.df, model._serving_state())
+    pd.testing.assert_frame_equal(plain(snapshot.df), plain(rescored))
+    assert looked_up['NEW-9']['MonthlyCharges'] == 99.0
+    assert looked_up['CUST-00003']['PaymentMethod'] == 'Crypto'
+    assert model.get_customer('MISSING') is None
+
+
+class RebuildOnFirstLock:
+    """_data_lock stand-in that publishes a new snapshot just before it is first taken"""
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = model._data_lock
+        self.pending = True
+
+    def __enter__(self):
+        if self.pending:
+            self.pending = False
+            self.model.get_snapshot()
+        return self.lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.lock.__exit__(*exc_info)
+
+
+def test_lookup_racing_a_snapshot_rebuild_sees_the_latest_row(trained):
+    model = fresh_model(trained)
+    model.upsert_customers(customers(model, ['CUST-00005', 'NEW-7'], tenure=[2, 3],
+                                     PaymentMethod='Crypto'))
+    stale = model._snapshot
+    model._data_lock = RebuildOnFirstLock(model)
+
+    added, changed = model.get_customer('NEW-7'), model.get_customer('CUST-00005')
+
+    assert model._snapshot is not stale
+    assert added['customerID'] == 'NEW-7' and added['tenure'] == 3
+    assert changed['PaymentMethod'] == 'Crypto' and changed['tenure'] == 2
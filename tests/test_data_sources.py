@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+from data_sources import DataSource, EmbeddedSampleSource
+
+
+def test_source_without_iter_chunks_cannot_be_created():
+    class Incomplete(DataSource):
+        def read(self):
+            return pd.DataFrame()
+
+    with pytest.raises(TypeError, match='iter_chunks'):
+        Incomplete()
+
+
+def test_read_and_sample_are_built_on_iter_chunks():
+    source = EmbeddedSampleSource()
+    chunks = list(source.iter_chunks(chunk_size=7))
+    table = source.read()
+
+    assert [len(chunk) for chunk in chunks] == [7, 7, 6]
+    pd.testing.assert_frame_equal(table, pd.concat(chunks, ignore_index=True))
+    sample = source.sample(5, chunk_size=7)
+    assert len(sample) == 5
+    assert sample['customerID'].isin(table['customerID']).all()
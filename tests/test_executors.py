@@ -0,0 +1,93 @@
+import asyncio
+import gc
+import threading
+
+import pytest
+
+from executors import BoundedExecutor, ExecutorOverloadedError
+
+
+def test_streamed_requests_keep_their_slot_until_the_body_ends():
+    async def scenario():
+        executor = BoundedExecutor('test', max_workers=2, max_queue=8)
+        bodies = []
+        rejected = 0
+        for _ in range(40):
+            try:
+                bodies.append(await executor.stream(iter(range(3))))
+            except ExecutorOverloadedError:
+                rejected += 1
+        assert (len(bodies), rejected) == (10, 30)
+        assert executor.metrics()['admitted'] == 10
+
+        assert [item async for item in bodies[0]] == [0, 1, 2]
+        assert executor.metrics()['admitted'] == 9
+        await bodies[1].aclose()
+        assert executor.metrics()['admitted'] == 8
+        executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_every_call_of_a_lease_runs_under_one_slot():
+    async def scenario():
+        executor = BoundedExecutor('test', max_workers=1, max_queue=0)
+        with executor.admit() as lease:
+            assert await lease.call(sum, [1, 2]) == 3
+            with pytest.raises(ExecutorOverloadedError):
+                executor.admit()
+            assert await lease.call(max, [1, 2]) == 2
+        assert await executor.run(min, [1, 2]) == 1
+        with pytest.raises(RuntimeError, match='released'):
+            await lease.call(sum, [1])
+        assert executor.metrics()['admitted'] == 0
+        executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_held_body_releases_after_its_last_pool_call():
+    async def scenario():
+        executor = BoundedExecutor('test', max_workers=1, max_queue=1)
+        lease = executor.admit()
+        started = threading.Event()
+        proceed = threading.Event()
+
+        def slow_chunk():
+            started.set()
+            proceed.wait(5)
+            return 'chunk'
+
+        async def body():
+            yield await lease.call(slow_chunk)
+
+        items = asyncio.ensure_future(_collect(lease.hold(body())))
+        await asyncio.to_thread(started.wait, 5)
+        # The chunk is running, so the request still holds its slot
+        assert executor.metrics()['admitted'] == 1
+        proceed.set()
+        assert await items == ['chunk']
+        assert executor.metrics()['admitted'] == 0
+        executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_unreleased_lease_is_released_when_collected():
+    executor = BoundedExecutor('test', max_workers=1, max_queue=0)
+    lease = executor.admit()
+    body = lease.hold(_empty())
+    del lease, body
+    gc.collect()
+    assert executor.metrics()['admitted'] == 0
+    executor.admit().release()
+    executor.shutdown()
+
+
+async def _collect(body):
+    return [item async for item in body]
+
+
+async def _empty():
+    return
+    yield
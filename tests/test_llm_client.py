@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from llm_client import CircuitBreaker, LLMClient, LLMUnavailableError
+
+MESSAGES = [HumanMessage(content='How do we keep this customer?')]
+
+
+class MockOpenAI(ThreadingHTTPServer):
+    """An OpenAI-compatible chat completions endpoint on a local port.
+
+    The next `failures` requests get a 503; every request takes `delay`
+    seconds. Counts requests and the most handled at once.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), MockOpenAIHandler)
+        self.failures = 0
+        self.delay = 0.0
+        self.tokens = ['Offer ', 'a ', 'discount']
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/v1'
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            fail = server.failures > 0
+            server.failures -= fail
+        try:
+            time.sleep(server.delay)
+            if fail:
+                self._send(503, 'application/json',
+                           json.dumps({'error': {'message': 'overloaded'}}))
+            elif body.get('stream'):
+                self._send(200, 'text/event-stream', ''.join(
+                    f'data: {json.dumps(_chunk(token))}\n\n' for token in server.tokens
+                ) + 'data: [DONE]\n\n')
+            else:
+                self._send(200, 'application/json', json.dumps({
+                    'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0,
+                    'model': 'gpt-4o',
+                    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {
+                        'role': 'assistant', 'content': ''.join(server.tokens)}}],
+                }))
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send(self, status, content_type, text):
+        payload = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _chunk(token):
+    return {'id': 'chatcmpl-1', 'object': 'chat.completion.chunk', 'created': 0,
+            'model': 'gpt-4o',
+            'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+
+
+@pytest.fixture
+def mock_openai():
+    server = MockOpenAI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(mock_openai, **kwargs):
+    def chat_factory():
+        # Retries are LLMClient's, as in the server
+        return ChatOpenAI(model='gpt-4o', api_key='test-key', base_url=mock_openai.base_url,
+                          max_retries=0)
+    kwargs.setdefault('backoff', 0.01)
+    return LLMClient(chat_factory, **kwargs)
+
+
+def test_calls_beyond_max_concurrency_wait(mock_openai):
+    mock_openai.delay = 0.2
+    client = make_client(mock_openai, max_concurrency=2)
+
+    async def scenario():
+        return await asyncio.gather(*(client.complete(MESSAGES) for _ in range(6)))
+
+    assert asyncio.run(scenario()) == ['Offer a discount'] * 6
+    assert mock_openai.requests == 6
+    assert mock_openai.max_active == 2
+
+
+def test_transient_errors_are_retried_with_backoff(mock_openai, monkeypatch):
+    mock_openai.failures = 2
+    client = make_client(mock_openai, max_retries=2, backoff=0.05)
+    waits = []
+    monkeypatch.setattr('llm_client.random.uniform', lambda low, high: waits.append(high) or 0)
+
+    assert asyncio.run(client.complete(MESSAGES)) == 'Offer a discount'
+    assert mock_openai.requests == 3
+    assert waits == [0.05, 0.1]
+    assert client.metrics()['retries'] == 2
+    assert client.metrics()['circuit'] == 'closed'
+
+
+def test_streams_are_retried_until_the_first_chunk(mock_openai):
+    mock_openai.failures = 1
+    client = make_client(mock_openai, max_retries=1)
+
+    async def scenario():
+        return [token async for token in client.stream(MESSAGES) if token]
+
+    assert asyncio.run(scenario()) == ['Offer ', 'a ', 'discount']
+    assert mock_openai.requests == 2
+
+
+def test_exhausted_retries_raise_llm_unavailable(mock_openai):
+    mock_openai.failures = 10
+    client = make_client(mock_openai, max_retries=1)
+
+    with pytest.raises(LLMUnavailableError, match='LLM call failed'):
+        asyncio.run(client.complete(MESSAGES))
+    assert mock_openai.requests == 2
+    assert client.metrics()['failures'] == 2
+
+
+def test_circuit_opens_then_lets_one_trial_through(mock_openai):
+    mock_openai.failures = 3
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    client = make_client(mock_openai, max_retries=0, breaker=breaker)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(LLMUnavailableError):
+                await client.complete(MESSAGES)
+        assert breaker.state == 'open'
+        # Open: calls fail fast without reaching the provider
+        with pytest.raises(LLMUnavailableError, match='circuit is open'):
+            await client.complete(MESSAGES)
+        assert mock_openai.requests == 2
+
+        await asyncio.sleep(0.25)
+        assert breaker.state == 'half_open'
+        # A failed trial re-opens the circuit straight away
+        with pytest.raises(LLMUnavailableError):
+            await client.complete(MESSAGES)
+        assert breaker.state == 'open'
+
+        await asyncio.sleep(0.25)
+        assert await client.complete(MESSAGES) == 'Offer a discount'
+        assert breaker.state == 'closed'
+
+    asyncio.run(scenario())
+    assert mock_openai.requests == 4
+    assert client.metrics()['rejected'] == 1
+
+
+def test_half_open_circuit_admits_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    # A trial that never reports back makes way for another
+    time.sleep(0.06)
+    assert breaker.allow()
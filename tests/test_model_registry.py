@@ -0,0 +1,27 @@
+from model_registry import ARTIFACT_KEYS, ModelRegistry
+
+
+def artifacts(tag):
+    return {key: f"{key}-{tag}" for key in ARTIFACT_KEYS} | {'metrics': {'tag': tag}}
+
+
+def test_resaving_a_version_makes_it_latest(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    first = registry.save(artifacts('a'))
+    second = registry.save(artifacts('b'))
+    assert registry.load_latest()['version'] == second
+
+    assert registry.save(artifacts('a')) == first
+    assert registry.load_latest()['version'] == first
+    assert [m['version'] for m in registry.list_versions()] == [first, second]
+
+
+def test_prune_keeps_the_newest_versions(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    versions = [registry.save(artifacts(tag)) for tag in 'abcd']
+
+    registry.prune(keep=2)
+    assert [m['version'] for m in registry.list_versions()] == versions[:1:-1]
+
+    registry.prune(keep=0)
+    assert [m['version'] for m in registry.list_versions()] == [versions[-1]]
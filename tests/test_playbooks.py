@@ -0,0 +1,104 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from playbooks import PlaybookGenerator, PlaybookJobInProgressError, profile_clusters
+from recommendations import RecommendationCache, RecommendationService
+
+
+def make_customers():
+    rows = [
+        # Two high-risk customers sharing one profile
+        ('High', 3, 'Month-to-month', 75.0, 'Fiber optic', 'Yes', 'No'),
+        ('High', 8, 'Month-to-month', 85.0, 'Fiber optic', 'Yes', 'No'),
+        ('High', 40, 'One year', 25.0, 'DSL', 'No', 'Yes'),
+        ('Medium', 3, 'Month-to-month', 75.0, 'Fiber optic', 'Yes', 'No'),
+        ('Low', 70, 'Two year', 20.0, 'No', 'No', 'No'),
+    ]
+    df = pd.DataFrame(rows, columns=['risk_level', 'tenure', 'Contract', 'MonthlyCharges',
+                                     'InternetService', 'OnlineSecurity', 'TechSupport'])
+    df['StreamingTV'] = 'No'
+    df['StreamingMovies'] = 'No'
+    return df
+
+
+class FakeLLM:
+    """generate() stand-in that fails for prompts mentioning fail_on"""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.prompts = []
+
+    async def __call__(self, system_prompt, prompt):
+        self.prompts.append(prompt)
+        if self.fail_on is not None and self.fail_on in prompt:
+            raise RuntimeError('upstream error')
+        return f'Playbook {len(self.prompts)}'
+
+
+def test_clusters_group_high_risk_customers_by_profile():
+    clusters = profile_clusters(make_customers())
+
+    assert [n for _, n in clusters] == [2, 1]
+    largest, _ = clusters[0]
+    assert (largest.risk_level, largest.tenure_bucket, largest.contract,
+            largest.charges_bucket, largest.services) == \
+        ('High', '0-12', 'Month-to-month', '$70-90', ('Online Security',))
+    assert clusters[1][0].services == ('Tech Support',)
+
+    by_risk = profile_clusters(make_customers(), risk_levels=('High', 'Medium'))
+    assert sorted(profile.risk_level for profile, _ in by_risk) == ['High', 'High', 'Medium']
+
+
+def test_run_generates_each_cluster_once_and_reruns_skip_them(mongo_db):
+    async def scenario():
+        llm = FakeLLM()
+        service = RecommendationService(llm, RecommendationCache(mongo_db['recs']))
+        generator = PlaybookGenerator(service, concurrency=2)
+        clusters = profile_clusters(make_customers())
+
+        assert await generator.run(clusters) == {'generated': 2, 'already_cached': 0, 'failed': 0}
+        assert await generator.run(clusters) == {'generated': 0, 'already_cached': 2, 'failed': 0}
+        assert len(llm.prompts) == 2
+
+        # Generated playbooks answer live requests for the same profile
+        profile, _ = clusters[0]
+        recommendation, _, cached = await service.for_profile(profile, {})
+        assert cached and recommendation.startswith('Playbook')
+
+    asyncio.run(scenario())
+
+
+def test_one_failing_cluster_does_not_abort_the_run(mongo_db):
+    async def scenario():
+        llm = FakeLLM(fail_on='DSL')
+        service = RecommendationService(llm, RecommendationCache(mongo_db['recs']))
+        generator = PlaybookGenerator(service)
+        clusters = profile_clusters(make_customers())
+
+        assert await generator.run(clusters) == {'generated': 1, 'already_cached': 0, 'failed': 1}
+        # The failure was not cached, so the next run retries it
+        llm.fail_on = None
+        assert await generator.run(clusters) == {'generated': 1, 'already_cached': 1, 'failed': 0}
+
+    asyncio.run(scenario())
+
+
+def test_background_run_reports_status(mongo_db):
+    async def scenario():
+        service = RecommendationService(FakeLLM(), RecommendationCache(mongo_db['recs']))
+        generator = PlaybookGenerator(service)
+        clusters = profile_clusters(make_customers())
+
+        status = generator.start(clusters)
+        assert status['status'] == 'running' and status['customers'] == 3
+        with pytest.raises(PlaybookJobInProgressError):
+            generator.start(clusters)
+        await generator._task
+
+        assert not generator.running
+        assert generator.status['status'] == 'succeeded'
+        assert generator.status['generated'] == 2
+
+    asyncio.run(scenario())
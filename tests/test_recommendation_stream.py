@@ -0,0 +1,146 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from llm_client import LLMUnavailableError
+from recommendations import (FALLBACK_RECOMMENDATION, RecommendationCache,
+                             RecommendationProfile, RecommendationService)
+
+TOKENS = ['Call ', 'the ', 'customer']
+
+REQUEST = dict(customer_id='C-1', churn_probability=0.8, risk_level='High', tenure=5,
+               contract='Month-to-month', monthly_charges=80.0,
+               internet_service='Fiber optic', services=['Streaming TV'])
+
+
+class StubStream:
+    """stream_generate() stand-in: yields tokens, pausing after the first
+    until resume is set, and raises error once they run out, if given"""
+
+    def __init__(self, tokens=TOKENS, error=None):
+        self.tokens = tokens
+        self.error = error
+        self.calls = 0
+        self.resume = asyncio.Event()
+        self.resume.set()
+
+    async def __call__(self, system_prompt, prompt):
+        self.calls += 1
+        for i, token in enumerate(self.tokens):
+            yield token
+            if i == 0:
+                await self.resume.wait()
+        if self.error is not None:
+            raise self.error
+
+
+async def unused_generate(system_prompt, prompt):
+    raise AssertionError('generate() should not be called when streaming')
+
+
+def make_service(mongo_db, stream):
+    return RecommendationService(unused_generate, RecommendationCache(mongo_db['recs']),
+                                 stream_generate=stream)
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+def parse_sse(body):
+    events = []
+    for message in body.strip().split('\n\n'):
+        event, data = message.split('\n')
+        events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+
+def test_tokens_arrive_in_order_then_done(mongo_db):
+    async def scenario():
+        service = make_service(mongo_db, StubStream())
+        events = await collect(service.stream(SimpleNamespace(**REQUEST)))
+
+        assert events[:-1] == [('token', token) for token in TOKENS]
+        event, data = events[-1]
+        assert event == 'done' and data['cached'] is False and data['degraded'] is False
+
+        # Stored once complete, and then served whole from the cache
+        again = await collect(service.stream(SimpleNamespace(**REQUEST)))
+        assert again[0] == ('token', ''.join(TOKENS))
+        assert again[1][1]['cached'] is True
+
+    asyncio.run(scenario())
+
+
+def test_second_client_replays_an_in_flight_stream(mongo_db):
+    async def scenario():
+        stream = StubStream()
+        stream.resume.clear()
+        service = make_service(mongo_db, stream)
+
+        first = service.stream(SimpleNamespace(**REQUEST))
+        assert await first.__anext__() == ('token', 'Call ')
+        second = asyncio.ensure_future(collect(service.stream(SimpleNamespace(**REQUEST))))
+        await asyncio.sleep(0)
+        stream.resume.set()
+        first_events = [('token', 'Call ')] + await collect(first)
+        second_events = await second
+
+        assert stream.calls == 1
+        assert service.metrics()['coalesced'] == 1
+        assert [e for e in first_events if e[0] == 'token'] == \
+            [e for e in second_events if e[0] == 'token'] == [('token', t) for t in TOKENS]
+
+    asyncio.run(scenario())
+
+
+def test_unavailable_llm_before_any_token_degrades(mongo_db):
+    async def scenario():
+        service = make_service(mongo_db, StubStream(tokens=[],
+                                                    error=LLMUnavailableError('circuit open')))
+        events = await collect(service.stream(SimpleNamespace(**REQUEST)))
+        assert events[0] == ('token', FALLBACK_RECOMMENDATION)
+        assert events[1][1]['degraded'] is True and events[1][1]['cached'] is False
+
+        # An expired recommendation for the profile beats the fallback
+        key = RecommendationProfile.from_request(SimpleNamespace(**REQUEST)).key
+        await service.cache.collection.insert_one({
+            'profile_key': key, 'recommendation': 'old advice',
+            'created_at': datetime(2020, 1, 1, tzinfo=timezone.utc)})
+        events = await collect(service.stream(SimpleNamespace(**REQUEST)))
+        assert events[0] == ('token', 'old advice')
+        assert events[1][1] == {**events[1][1], 'degraded': True, 'cached': True}
+
+    asyncio.run(scenario())
+
+
+def test_sse_endpoint_streams_tokens_then_done(server, mongo_db, monkeypatch):
+    monkeypatch.setattr(server, 'recommendation_service', make_service(mongo_db, StubStream()))
+    response = TestClient(server.app).post('/api/ai-recommendations/stream', json=REQUEST)
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = parse_sse(response.text)
+    assert events[:-1] == [('token', {'text': token}) for token in TOKENS]
+    assert events[-1][0] == 'done' and events[-1][1]['degraded'] is False
+
+
+def test_sse_endpoint_degrades_or_reports_errors(server, mongo_db, monkeypatch):
+    client = TestClient(server.app)
+    unavailable = LLMUnavailableError('LLM stream failed')
+
+    monkeypatch.setattr(server, 'recommendation_service',
+                        make_service(mongo_db, StubStream(tokens=[], error=unavailable)))
+    events = parse_sse(client.post('/api/ai-recommendations/stream', json=REQUEST).text)
+    assert events == [('token', {'text': FALLBACK_RECOMMENDATION}),
+                      ('done', {**events[1][1], 'degraded': True})]
+
+    # Tokens already sent cannot be replaced, so a later failure is an error event
+    monkeypatch.setattr(server, 'recommendation_service',
+                        make_service(mongo_db, StubStream(error=unavailable)))
+    events = parse_sse(client.post('/api/ai-recommendations/stream', json=REQUEST).text)
+    assert events[:-1] == [('token', {'text': token}) for token in TOKENS]
+    assert events[-1] == ('error', {'detail': 'LLM stream failed'})
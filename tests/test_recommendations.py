@@ -0,0 +1,129 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from recommendations import RecommendationCache, RecommendationProfile, RecommendationService
+
+
+def make_request(**overrides):
+    fields = dict(customer_id='C-1', churn_probability=0.8, risk_level='High', tenure=5,
+                  contract='Month-to-month', monthly_charges=80.0,
+                  internet_service='Fiber optic', services=['Streaming TV'])
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+class StubGenerate:
+    """generate() stand-in that counts calls and can be held open"""
+
+    def __init__(self, text='Offer a loyalty discount'):
+        self.text = text
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, system_prompt, prompt):
+        self.calls += 1
+        await self.release.wait()
+        return self.text
+
+
+class FailingCollection:
+    name = 'ai_recommendations'
+
+    async def find_one(self, *args, **kwargs):
+        raise ConnectionError('database is down')
+
+
+def test_second_request_is_a_cache_hit(mongo_db):
+    async def scenario():
+        generate = StubGenerate()
+        service = RecommendationService(generate, RecommendationCache(mongo_db['recs']))
+
+        first = await service.recommend(make_request())
+        second = await service.recommend(make_request(customer_id='C-2', tenure=6))
+
+        assert first['cached'] is False and second['cached'] is True
+        assert first['recommendation'] == second['recommendation'] == generate.text
+        assert generate.calls == 1
+        assert service.metrics()['hits'] == 1 and service.metrics()['misses'] == 1
+
+    asyncio.run(scenario())
+
+
+def test_stored_recommendation_survives_a_new_cache(mongo_db):
+    async def scenario():
+        generate = StubGenerate()
+        await RecommendationService(generate, RecommendationCache(mongo_db['recs'])) \
+            .recommend(make_request())
+
+        service = RecommendationService(generate, RecommendationCache(mongo_db['recs']))
+        response = await service.recommend(make_request())
+        assert response['cached'] is True
+        assert generate.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_expired_entries_are_generated_again(mongo_db):
+    async def scenario():
+        generate = StubGenerate()
+        cache = RecommendationCache(mongo_db['recs'], ttl_seconds=60)
+        service = RecommendationService(generate, cache)
+        key = RecommendationProfile.from_request(make_request()).key
+        # BSON dates keep milliseconds
+        old = (datetime.now(timezone.utc) - timedelta(seconds=120)).replace(microsecond=0)
+        await cache.put(key, 'old advice', old, {})
+
+        assert await cache.get(key) is None
+        assert await cache.get(key, stale=True) == ('old advice', old)
+        response = await service.recommend(make_request())
+        assert response == {**response, 'recommendation': generate.text, 'cached': False}
+        assert generate.calls == 1
+
+        key, (_, recommendation, generated_at) = next(iter(cache._entries.items()))
+        cache._entries[key] = (time.monotonic() - 1, recommendation, generated_at)
+        # An expired memory entry falls back to the store, still within the TTL
+        stored, stored_at = await cache.get(key)
+        assert stored == recommendation
+        assert abs(stored_at - generated_at) < timedelta(milliseconds=1)
+        assert cache._entries[key][0] > time.monotonic()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_identical_requests_share_one_call(mongo_db):
+    async def scenario():
+        generate = StubGenerate()
+        generate.release.clear()
+        service = RecommendationService(generate, RecommendationCache(mongo_db['recs']))
+
+        requests = [asyncio.ensure_future(service.recommend(make_request(customer_id=f'C-{i}')))
+                    for i in range(5)]
+        await asyncio.sleep(0)
+        generate.release.set()
+        responses = await asyncio.gather(*requests)
+
+        assert generate.calls == 1
+        assert {response['recommendation'] for response in responses} == {generate.text}
+        assert service.metrics()['coalesced'] == 4
+        assert service.metrics()['in_flight'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failing_cache_read_counts_as_a_miss():
+    async def scenario():
+        generate = StubGenerate()
+        cache = RecommendationCache(FailingCollection())
+        assert await cache.get('key') is None
+        assert await cache.get('key', stale=True) is None
+
+        async def insert_one(doc):
+            pass
+        cache.collection.insert_one = insert_one
+        response = await RecommendationService(generate, cache).recommend(make_request())
+        assert response['recommendation'] == generate.text
+
+    asyncio.run(scenario())
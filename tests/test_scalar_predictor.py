@@ -0,0 +1,70 @@
+import logging
+import warnings
+
+import numpy as np
+import pytest
+
+from data_sources import SyntheticSource
+from ml_model import ChurnModel
+from scalar_predictor import TreeEnsemble
+
+
+@pytest.fixture(scope='module')
+def trained():
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.INFO)
+    model = ChurnModel(SyntheticSource(n_rows=3000), max_training_rows=3000)
+    model.train()
+    return model
+
+
+def records(model, n_rows=500):
+    rows = model.df.drop(columns=['customerID', 'Churn']).head(n_rows).to_dict('records')
+    for row in rows[::7]:
+        row['PaymentMethod'] = 'Crypto'
+    for row in rows[::11]:
+        row['TotalCharges'] = 'not a number'
+    return rows
+
+
+def test_fast_path_matches_predict_bit_for_bit(trained):
+    state = trained._serving_state()
+    assert state.scalar_predictor.ensemble is not None
+
+    for record in records(trained):
+        assert trained.predict_fast(record) == trained.predict(record)
+
+
+def test_ensemble_matches_the_booster_on_edge_values(trained):
+    state = trained._serving_state()
+    ensemble = state.scalar_predictor.ensemble
+    n_features = len(state.feature_columns)
+    rng = np.random.default_rng(7)
+    X = rng.normal(scale=3, size=(2000, n_features)).astype(np.float32)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    X[rng.random(X.shape) < 0.02] = np.inf
+    X[rng.random(X.shape) < 0.02] = -np.inf
+    # Values exactly on split thresholds go right, as in XGBoost
+    splits = ensemble.left != np.arange(len(ensemble.left))
+    X[np.arange(100), ensemble.feature[splits][:100]] = ensemble.threshold[splits][:100]
+
+    expected = state.engine.predict_proba(X)
+    assert [ensemble.predict_proba(row) for row in X] == expected.tolist()
+
+
+def test_booster_scores_single_rows_without_an_ensemble(trained):
+    predictor = trained._serving_state().scalar_predictor
+    record = records(trained, 1)[0]
+    expected = predictor.predict_proba(record)
+
+    ensemble, predictor.ensemble = predictor.ensemble, None
+    try:
+        assert predictor.predict_proba(record) == expected
+    finally:
+        predictor.ensemble = ensemble
+
+
+def test_unsupported_objectives_are_not_compiled(trained):
+    booster = trained._serving_state().engine.booster.copy()
+    booster.set_param({'objective': 'reg:squarederror'})
+    assert TreeEnsemble.from_booster(booster, len(trained.feature_columns)) is None
@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from indexes import InvalidCursorError, decode_cursor, encode_cursor
+from storage import (COLLECTION_INDEXES, WriteBuffer, decode_page_cursor, encode_page_cursor,
+                     ensure_indexes)
+
+
+def test_full_batches_are_written_without_waiting(mongo_db):
+    async def scenario():
+        collection = mongo_db['status_checks']
+        writer = WriteBuffer(collection, max_batch_size=3, max_wait_ms=10000)
+        await writer.start()
+        for i in range(3):
+            await writer.insert({'id': str(i)})
+        await asyncio.wait_for(_until(lambda: writer.metrics()['written'] == 3), 1)
+
+        assert await collection.count_documents({}) == 3
+        assert writer.metrics()['batches'] == 1
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_partial_batches_are_written_after_the_wait(mongo_db):
+    async def scenario():
+        collection = mongo_db['status_checks']
+        writer = WriteBuffer(collection, max_batch_size=100, max_wait_ms=50)
+        await writer.start()
+        await writer.insert({'id': '1'})
+        await asyncio.sleep(0.01)
+        await writer.insert({'id': '2'})
+        assert await collection.count_documents({}) == 0
+
+        await asyncio.wait_for(_until(lambda: writer.metrics()['written'] == 2), 1)
+        assert writer.metrics()['batches'] == 1
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stop_writes_everything_still_queued(mongo_db):
+    async def scenario():
+        collection = mongo_db['status_checks']
+        writer = WriteBuffer(collection, max_batch_size=4, max_wait_ms=10000)
+        await writer.start()
+        for i in range(10):
+            await writer.insert({'id': str(i)})
+        await asyncio.sleep(0)
+        await writer.stop()
+
+        assert await collection.count_documents({}) == 10
+        assert writer.metrics()['dropped'] == 0
+        with pytest.raises(RuntimeError):
+            await writer.insert({'id': 'late'})
+
+    asyncio.run(scenario())
+
+
+def test_ensure_indexes_creates_the_paging_indexes(mongo_db):
+    async def scenario():
+        await ensure_indexes(mongo_db)
+        # Creating them again at the next startup is a no-op
+        await ensure_indexes(mongo_db)
+        for name, indexes in COLLECTION_INDEXES.items():
+            info = await mongo_db[name].index_information()
+            assert sorted(index['key'] for index in info.values()) == \
+                sorted([[('_id', 1)]] + indexes)
+
+    asyncio.run(scenario())
+
+
+def test_cursors_share_one_encoding():
+    timestamp = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+    assert decode_page_cursor(encode_page_cursor(timestamp, 'abc')) == (timestamp, 'abc')
+    assert decode_cursor(encode_cursor('tenure', 1, 12, 'C-1')) == ('tenure', True, 12, 'C-1')
+    # A cursor for one kind of query does not decode as the other
+    with pytest.raises(InvalidCursorError):
+        decode_page_cursor(encode_cursor('tenure', True, 12, 'C-1'))
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(encode_page_cursor(timestamp, 'abc'))
+    with pytest.raises(InvalidCursorError):
+        decode_page_cursor('not a cursor')
+
+
+def test_status_pages_are_complete_with_tied_timestamps(server, mongo_db, monkeypatch):
+    monkeypatch.setattr(server, 'db', mongo_db)
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    # Three documents per timestamp, inserted out of order
+    docs = [{'id': f'{i:02d}', 'client_name': 'probe',
+             'timestamp': start + timedelta(seconds=i // 3)} for i in range(10)]
+    asyncio.run(mongo_db.status_checks.insert_many(docs[::-1][::2] + docs[::-1][1::2]))
+
+    client = TestClient(server.app)
+    ids, cursor, pages = [], None, 0
+    while True:
+        params = {'limit': 4} | ({'cursor': cursor} if cursor else {})
+        response = client.get('/api/status', params=params)
+        assert response.status_code == 200
+        ids += [doc['id'] for doc in response.json()]
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+
+    expected = sorted(docs, key=lambda doc: (doc['timestamp'], doc['id']), reverse=True)
+    assert ids == [doc['id'] for doc in expected]
+    assert pages == 3
+    assert client.get('/api/status', params={'cursor': 'garbage'}).status_code == 400
+
+
+async def _until(condition):
+    while not condition():
+        await asyncio.sleep(0.005)
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import joblib
+
+import training_jobs
+from model_registry import ARTIFACT_KEYS, ModelRegistry
+from training_jobs import TrainingJobManager
+
+
+def artifacts(tag, roc_auc):
+    return {key: f"{key}-{tag}" for key in ARTIFACT_KEYS} | {'metrics': {'roc_auc': roc_auc}}
+
+
+class StubModel:
+    """The parts of ChurnModel a training job touches"""
+
+    feature_columns = None
+    data_source = None
+    max_training_rows = None
+
+    def __init__(self):
+        self.loaded = []
+
+    def load_artifacts(self, artifacts):
+        self.loaded.append(artifacts['version'])
+
+    def get_snapshot(self):
+        pass
+
+
+def run_job(manager, candidate):
+    """Run one job in this thread, with training replaced by writing candidate"""
+    def train(job, candidate_path):
+        joblib.dump(candidate, candidate_path)
+        return candidate['metrics']
+    manager._train_in_subprocess = train
+    job = training_jobs.TrainingJob()
+    manager._run(job)
+    return job
+
+
+def test_rejected_candidate_is_never_registered(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    validated = registry.save(artifacts('served', 0.995))
+    model = StubModel()
+    manager = TrainingJobManager(model, registry, min_roc_auc=0.99)
+
+    job = run_job(manager, artifacts('candidate', 0.6324))
+
+    assert job.status == 'failed' and 'below the minimum' in job.error
+    assert job.artifact_version is None
+    assert registry.load_latest()['version'] == validated
+    assert [m['version'] for m in registry.list_versions()] == [validated]
+    assert model.loaded == []
+    assert not any(registry.candidate_path(job.id).parent.iterdir())
+
+
+def test_validated_candidate_is_registered_and_served(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_jobs, 'validate_artifacts', lambda *args: None)
+    registry = ModelRegistry(tmp_path)
+    registry.save(artifacts('served', 0.995))
+    model = StubModel()
+    manager = TrainingJobManager(model, registry, min_roc_auc=0.99)
+
+    job = run_job(manager, artifacts('candidate', 0.996))
+
+    assert job.status == 'succeeded'
+    assert registry.load_latest()['version'] == job.artifact_version
+    assert model.loaded == [job.artifact_version]
+    assert job.metrics == {'roc_auc': 0.996}
+    assert not any(registry.candidate_path(job.id).parent.iterdir())